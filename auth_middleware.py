@@ -0,0 +1,67 @@
+"""
+JWT authentication as a plain ASGI middleware.
+
+Unlike an `@app.middleware("http")` function, this does not wrap requests and
+responses in a BaseHTTPMiddleware task and memory stream: authenticated
+requests are handed straight to the app, so streamed responses pass through
+untouched. Exempt paths are matched against a precomputed set and prefix tuple.
+"""
+import json
+from typing import Callable, Dict, Any, Iterable
+
+import jwt
+
+
+class JWTAuthMiddleware:
+    """Reject requests without a valid bearer token; store the claims in request.state.user"""
+
+    def __init__(self, app, verify: Callable[[str], Dict[str, Any]],
+                 exempt_paths: Iterable[str] = (), exempt_prefixes: Iterable[str] = ()):
+        """Initialize the middleware
+
+        Args:
+            app: The wrapped ASGI app
+            verify: Returns a token's claims, raising jwt.InvalidTokenError for bad tokens
+            exempt_paths: Paths served without authentication
+            exempt_prefixes: Path prefixes served without authentication
+        """
+        self.app = app
+        self.verify = verify
+        self.exempt_paths = frozenset(exempt_paths)
+        self.exempt_prefixes = tuple(exempt_prefixes)
+
+    def is_exempt(self, path: str) -> bool:
+        return path in self.exempt_paths or path.startswith(self.exempt_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.is_exempt(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        auth_header = b""
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                auth_header = value
+                break
+        if not auth_header.startswith(b"Bearer "):
+            await self._unauthorized(send, "Authentication token missing")
+            return
+
+        try:
+            payload = self.verify(auth_header[7:].decode("latin-1"))
+        except jwt.InvalidTokenError:
+            await self._unauthorized(send, "Invalid token")
+            return
+
+        scope.setdefault("state", {})["user"] = payload
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _unauthorized(send, detail: str) -> None:
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 401,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        })
+        await send({"type": "http.response.body", "body": body})
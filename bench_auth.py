@@ -0,0 +1,67 @@
+"""
+Benchmark for per-request JWT verification cost.
+
+Compares the previous auth path (jwt.decode in the middleware and again in
+get_current_user) with one VerifiedTokenCache lookup per request, then measures
+end-to-end requests to /api/user/profile with the token cache on and off.
+
+Usage:
+    python bench_auth.py [--iterations 20000] [--requests 2000]
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+import jwt
+
+import main
+from token_cache import VerifiedTokenCache
+
+
+def per_call_us(func, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def bench_auth_path(iterations: int):
+    token = main.create_access_token({"sub": "12345", "role": "user"})
+    cache = VerifiedTokenCache(main.JWT_SECRET, [main.JWT_ALGORITHM])
+    cache.verify(token)
+
+    def double_decode():
+        jwt.decode(token, main.JWT_SECRET, algorithms=[main.JWT_ALGORITHM])
+        jwt.decode(token, main.JWT_SECRET, algorithms=[main.JWT_ALGORITHM])
+
+    before = per_call_us(double_decode, iterations)
+    after = per_call_us(lambda: cache.verify(token), iterations)
+    print(f"{'auth path':<24} before {before:>7.2f} us/request  after {after:>7.2f} us/request  ({before / after:.1f}x)")
+
+
+async def bench_requests(requests: int, cache_size: int) -> float:
+    main.token_cache = VerifiedTokenCache(main.JWT_SECRET, [main.JWT_ALGORITHM], max_size=cache_size)
+    token = main.create_access_token({"sub": "12345", "role": "user"})
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(app=main.app, base_url="http://bench") as client:
+        await client.get("/api/user/profile", headers=headers)
+        start = time.perf_counter()
+        for _ in range(requests):
+            await client.get("/api/user/profile", headers=headers)
+        return requests / (time.perf_counter() - start)
+
+
+async def bench_endpoint(requests: int):
+    uncached = await bench_requests(requests, cache_size=0)
+    cached = await bench_requests(requests, cache_size=10000)
+    print(f"{'/api/user/profile':<24} cache off {uncached:>7.0f} req/s  cache on {cached:>7.0f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    bench_auth_path(args.iterations)
+    asyncio.run(bench_endpoint(args.requests))
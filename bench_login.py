@@ -0,0 +1,75 @@
+"""
+Benchmark for login verification.
+
+Sends bursts of concurrent logins through three setups and reports logins per
+second together with the longest event-loop stall seen by a ticker task:
+
+- inline: the password hash is checked on the event loop
+- pool: LoginVerifier with its success cache disabled
+- pool+cache: LoginVerifier with the success cache, where most logins repeat
+  recent credentials (clients re-authenticating)
+
+Usage:
+    python bench_login.py [--logins 200] [--concurrency 50] [--users 10] [--iterations 600000]
+"""
+import argparse
+import asyncio
+import time
+
+from user_store import LoginVerifier, UserRecord, UserStore, hash_password, verify_password
+
+
+async def ticker(lags, interval=0.005):
+    """Record how late the event loop wakes a sleeping task"""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run(authenticate, credentials, concurrency):
+    lags = []
+    tick = asyncio.create_task(ticker(lags))
+    await asyncio.sleep(0)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login(username, password):
+        async with semaphore:
+            assert await authenticate(username, password) is not None
+
+    start = time.perf_counter()
+    await asyncio.gather(*(login(username, password) for username, password in credentials))
+    elapsed = time.perf_counter() - start
+    # Let the ticker record a stall that lasted until the end of the burst
+    await asyncio.sleep(0.01)
+    tick.cancel()
+    return len(credentials) / elapsed, max(lags, default=0.0)
+
+
+async def main(args):
+    store = UserStore(UserRecord(str(n), f"user{n}", "user", hash_password(f"password{n}", args.iterations))
+                      for n in range(args.users))
+    credentials = [(f"user{n % args.users}", f"password{n % args.users}") for n in range(args.logins)]
+
+    async def inline(username, password):
+        user = store.get(username)
+        return user if verify_password(password, user.password_hash) else None
+
+    setups = {
+        "inline": inline,
+        "pool": LoginVerifier(store, workers=args.workers, cache_ttl=0, iterations=args.iterations).authenticate,
+        "pool+cache": LoginVerifier(store, workers=args.workers, iterations=args.iterations).authenticate,
+    }
+    for name, authenticate in setups.items():
+        rate, lag = await run(authenticate, credentials, args.concurrency)
+        print(f"{name:<11} {rate:>8.1f} logins/s  max event loop stall {lag * 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=10, help="distinct accounts logging in")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--iterations", type=int, default=600000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,134 @@
+"""
+Benchmark for the authentication middleware.
+
+Serves a small JSON response and a streamed response (many small chunks)
+behind the previous `@app.middleware("http")` JWT check and behind
+JWTAuthMiddleware, and reports requests per second for each.
+
+Then measures the real main.app (every middleware, Hasura replaced by
+in-memory rows) as shipped and with the previous `@app.middleware("http")`
+deadline function wrapped around it again.
+
+Usage:
+    python bench_middleware.py [--requests 2000] [--chunks 200]
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+import jwt
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from auth_middleware import JWTAuthMiddleware
+from token_cache import VerifiedTokenCache
+
+SECRET = "bench-secret"
+EXEMPT_PATHS = ("/token", "/health")
+EXEMPT_PREFIXES = ("/docs", "/openapi", "/health/")
+
+
+def add_routes(app: FastAPI, chunks: int) -> FastAPI:
+    @app.get("/small")
+    async def small(request: Request):
+        return {"user": request.state.user["sub"]}
+
+    @app.get("/stream")
+    async def stream():
+        async def body():
+            for n in range(chunks):
+                yield f'{{"n":{n}}}\n'
+        return StreamingResponse(body(), media_type="application/x-ndjson")
+
+    return app
+
+
+def decorator_app(cache: VerifiedTokenCache, chunks: int) -> FastAPI:
+    """The previous setup: a BaseHTTPMiddleware function"""
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def validate_jwt_middleware(request: Request, call_next):
+        path = request.url.path
+        if path.startswith("/docs") or path.startswith("/openapi") or path == "/token" or path == "/health" or path.startswith("/health/"):
+            return await call_next(request)
+        auth_header = request.headers.get("Authorization", "")
+        if not auth_header.startswith("Bearer "):
+            return JSONResponse(status_code=401, content={"detail": "Authentication token missing"})
+        try:
+            request.state.user = cache.verify(auth_header.replace("Bearer ", ""))
+        except jwt.InvalidTokenError:
+            return JSONResponse(status_code=401, content={"detail": "Invalid token"})
+        return await call_next(request)
+
+    return add_routes(app, chunks)
+
+
+def asgi_app(cache: VerifiedTokenCache, chunks: int) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(JWTAuthMiddleware, verify=cache.verify, exempt_paths=EXEMPT_PATHS, exempt_prefixes=EXEMPT_PREFIXES)
+    return add_routes(app, chunks)
+
+
+async def throughput(app: FastAPI, path: str, requests: int, headers) -> float:
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        await client.get(path, headers=headers)
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = await client.get(path, headers=headers)
+            assert response.status_code == 200
+        return requests / (time.perf_counter() - start)
+
+
+def real_apps(chunks: int):
+    """main.app as shipped, and with the previous BaseHTTPMiddleware deadline function around it"""
+    import deadlines
+    import main
+
+    rows = [{"id": f"id-{n:05d}", "status": "created", "user_id": "12345", "details": {}, "created_at": "2024-01-01T00:00:00"}
+            for n in range(chunks)]
+
+    async def execute_read(query, variables=None, headers=None):
+        return {"orders": rows[:variables["limit"]]}
+
+    async def request_deadline_middleware(request, call_next):
+        token = deadlines.set_deadline(main.request_budget(request))
+        try:
+            return await call_next(request)
+        finally:
+            deadlines.reset_deadline(token)
+
+    main.execute_read = execute_read
+    main.ORDERS_STREAM_PAGE_SIZE = chunks
+    main.app.dependency_overrides = {}
+    app = main.app.build_middleware_stack()
+    token = main.create_access_token({"sub": "12345", "role": "user"})
+    apps = {"http middleware": BaseHTTPMiddleware(app, dispatch=request_deadline_middleware), "ASGI middleware": app}
+    return apps, {"Authorization": f"Bearer {token}"}
+
+
+async def main(args):
+    cache = VerifiedTokenCache(SECRET, ["HS256"])
+    token = jwt.encode({"sub": "12345", "exp": time.time() + 3600}, SECRET, algorithm="HS256")
+    headers = {"Authorization": f"Bearer {token}"}
+    apps = {"http middleware": decorator_app(cache, args.chunks), "ASGI middleware": asgi_app(cache, args.chunks)}
+
+    for path in ("/small", "/stream"):
+        results = {name: await throughput(app, path, args.requests, headers) for name, app in apps.items()}
+        before, after = results.values()
+        print(f"{path:<8} http middleware {before:>7.0f} req/s  ASGI middleware {after:>7.0f} req/s  ({after / before:.2f}x)")
+
+    apps, headers = real_apps(args.chunks)
+    for path in ("/health", "/api/orders/stream"):
+        results = {name: await throughput(app, path, args.requests, headers) for name, app in apps.items()}
+        before, after = results.values()
+        print(f"main.app {path:<18} deadline as http middleware {before:>7.0f} req/s  as ASGI middleware {after:>7.0f} req/s  ({after / before:.2f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--chunks", type=int, default=200, help="chunks per streamed response")
+    asyncio.run(main(parser.parse_args()))
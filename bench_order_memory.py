@@ -0,0 +1,85 @@
+"""
+Memory benchmark for order records.
+
+Stores N orders, each taken through pending -> processing -> completed, in the
+previous layout (a dict per order with the payload and a list of history
+dicts) and in MemoryOrderStore, and reports the memory held per order as
+measured by tracemalloc. Half of the orders are left in processing, so both
+the open and the finished record shapes are measured.
+
+Usage:
+    python bench_order_memory.py [--orders 1000000]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from order_processor import OrderStatus
+from order_store import MemoryOrderStore
+
+
+def make_order(n: int):
+    return {
+        "order_id": f"ORD-{n:08d}",
+        "user_id": f"user-{n % 1000}",
+        "items": [{"product_id": "prod-1", "name": "Product", "quantity": 1, "price": 9.99}],
+        "total": 9.99,
+        "shipping_address": None
+    }
+
+
+class DictStore:
+    """The previous layout of OrderProcessor.orders"""
+
+    def __init__(self):
+        self.orders = {}
+
+    def create(self, order_id, data, status, timestamp, message):
+        self.orders[order_id] = {
+            "order_id": order_id,
+            "data": data,
+            "status": status,
+            "created_at": timestamp,
+            "updated_at": timestamp,
+            "history": [
+                {"status": status, "timestamp": timestamp, "message": message}
+            ]
+        }
+
+    def transition(self, order_id, status, timestamp, message):
+        order = self.orders[order_id]
+        order["status"] = status
+        order["updated_at"] = timestamp
+        order["history"].append({"status": status, "timestamp": timestamp, "message": message})
+
+
+def measure(store, orders: int) -> float:
+    """Bytes held per order"""
+    gc.collect()
+    tracemalloc.start()
+    for n in range(orders):
+        order_id = f"ORD-{n:08d}"
+        now = time.time()
+        store.create(order_id, make_order(n), OrderStatus.PENDING, now, "Order received")
+        store.transition(order_id, OrderStatus.PROCESSING, time.time(), "Order processing started")
+        if n % 2:
+            store.transition(order_id, OrderStatus.COMPLETED, time.time(), "Order completed successfully")
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return held / orders
+
+
+def main(args):
+    for name, factory in (("dict records", DictStore),
+                          ("slotted records", lambda: MemoryOrderStore(max_finished=args.orders, finished_ttl=None))):
+        store = factory()
+        per_order = measure(store, args.orders)
+        print(f"{name:<16} {per_order:>7.0f} bytes/order  {per_order * args.orders / 2**20:>8.1f} MiB for {args.orders} orders")
+        del store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=1000000)
+    main(parser.parse_args())
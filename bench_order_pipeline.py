@@ -0,0 +1,86 @@
+"""
+Benchmark for the order processing pipeline.
+
+Submits a burst of orders and, while they are processed, calls a small API
+endpoint on the same event loop every 5 ms. Compares the previous stages
+(time.sleep, one background task per order) with the queue and worker pool,
+reporting orders per second and the API latency seen during processing.
+
+Usage:
+    python bench_order_pipeline.py [--orders 40] [--workers 8] [--scale 0.05]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from order_processor import DEFAULT_STAGE_DELAYS, OrderProcessor
+
+
+class BlockingOrderProcessor(OrderProcessor):
+    """The previous behaviour: every stage sleeps on the event loop"""
+
+    async def _stage(self, stage, order_id, order_data):
+        time.sleep(self.stage_delays[stage])
+
+
+def make_order(n: int):
+    return {"order_id": f"ORD-{n}", "items": [{"product_id": "p", "quantity": 1, "price": 5}], "total": 5}
+
+
+async def run(processor: OrderProcessor, submit, orders: int):
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    latencies = []
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        await client.get("/ping")
+        start = time.perf_counter()
+        for n in range(orders):
+            await submit(make_order(n))
+        # A client calls every 5 ms; latency counts from when the call was due, so
+        # time the event loop spends blocked shows up as waiting
+        due = start
+        while processor.stats["completed"] + processor.stats["failed"] < orders:
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            await client.get("/ping")
+            latencies.append(time.perf_counter() - due)
+            due = max(due + 0.005, time.perf_counter() - 0.005)
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return orders / elapsed, latencies
+
+
+async def main(args):
+    delays = {stage: delay * args.scale for stage, delay in DEFAULT_STAGE_DELAYS.items()}
+
+    blocking = BlockingOrderProcessor(stage_delays=delays)
+    pending = []
+
+    async def submit_blocking(order):
+        pending.append(asyncio.ensure_future(blocking.process_order(order)))
+
+    results = {"blocking stages": await run(blocking, submit_blocking, args.orders)}
+
+    pooled = OrderProcessor(workers=args.workers, stage_delays=delays)
+    results[f"queue, {args.workers} workers"] = await run(pooled, pooled.submit, args.orders)
+    await pooled.stop()
+
+    for name, (rate, latencies) in results.items():
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{name:<18} {rate:>7.1f} orders/s  API latency p50 {statistics.median(latencies) * 1000:>7.1f} ms"
+              f"  p99 {p99 * 1000:>7.1f} ms  max {latencies[-1] * 1000:>7.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--scale", type=float, default=0.05, help="fraction of the default stage delays")
+    asyncio.run(main(parser.parse_args()))
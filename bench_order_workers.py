@@ -0,0 +1,128 @@
+"""
+Benchmark for order processing spread over several consumers of one stream.
+
+Runs 1, 2, 4, ... OrderProcessor instances (standing in for uvicorn worker
+processes) that share a LocalOrderStream and an order store, submits a burst
+of orders through the first one and reports orders per second until all are
+completed, plus how the orders were split between consumers.
+
+With --redis, every consumer is a separate process with its own Redis
+connection, reading a RedisOrderStream and writing a RedisOrderStore the way
+`uvicorn --workers N` does, and orders are submitted from the parent process.
+
+Usage:
+    python bench_order_workers.py [--orders 200] [--consumers 1,2,4,8] [--workers 4] [--scale 0.02]
+                                  [--redis redis://localhost:6379/15]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import time
+import uuid
+
+import redis
+
+from order_processor import DEFAULT_STAGE_DELAYS, OrderProcessor
+from order_store import MemoryOrderStore, RedisOrderStore
+from order_stream import LocalOrderStream, RedisOrderStream
+
+
+def stage_delays(args):
+    return {stage: delay * args.scale for stage, delay in DEFAULT_STAGE_DELAYS.items()}
+
+
+def redis_backends(url: str, prefix: str, max_backlog: int):
+    client = redis.Redis.from_url(url)
+    return (RedisOrderStore(client, prefix=prefix + "order:"),
+            RedisOrderStream(client, stream=prefix + "intake", max_backlog=max_backlog))
+
+
+def consume(url: str, prefix: str, consumer: str, args, ready, completed, done) -> None:
+    """Worker process: take orders from the shared stream until `done` is set"""
+    async def work():
+        store, stream = redis_backends(url, prefix, args.orders)
+        processor = OrderProcessor(workers=args.workers, stage_delays=stage_delays(args), store=store, stream=stream,
+                                   consumer=consumer, read_block_ms=50)
+        processor.start()
+        await asyncio.to_thread(ready.wait)
+        while not done.is_set():
+            completed.value = processor.stats["completed"]
+            await asyncio.sleep(0.005)
+        await processor.stop()
+        completed.value = processor.stats["completed"]
+
+    asyncio.run(work())
+
+
+async def run_processes(consumers: int, args, url: str) -> list:
+    """Process `args.orders` orders with consumer processes; returns the orders each completed"""
+    prefix = f"bench:{uuid.uuid4().hex[:8]}:"
+    context = multiprocessing.get_context("spawn")
+    ready, done = context.Barrier(consumers + 1), context.Event()
+    completed = [context.Value("i", 0) for _ in range(consumers)]
+    store, stream = redis_backends(url, prefix, args.orders)
+    processes = [context.Process(target=consume, args=(url, prefix, f"worker-{n}", args, ready, completed[n], done))
+                 for n in range(consumers)]
+    for process in processes:
+        process.start()
+    # Submits only, like an API process with no workers of its own
+    front = OrderProcessor(workers=0, store=store, stream=stream)
+    try:
+        await asyncio.to_thread(ready.wait)
+        start = time.perf_counter()
+        for _ in range(args.orders):
+            await front.submit({"items": [{"product_id": "p", "quantity": 1, "price": 5}], "total": 5})
+        while sum(value.value for value in completed) < args.orders:
+            await asyncio.sleep(0.005)
+        elapsed = time.perf_counter() - start
+    finally:
+        done.set()
+        await front.stop()
+        for process in processes:
+            process.join()
+        keys = list(stream.client.scan_iter(match=prefix + "*"))
+        if keys:
+            stream.client.delete(*keys)
+    split = [value.value for value in completed]
+    print(f"{consumers:>2} processes x {args.workers} workers  {args.orders / elapsed:>8.1f} orders/s  "
+          f"split {'/'.join(map(str, split))}")
+    return split
+
+
+async def run(consumers: int, args) -> None:
+    delays = stage_delays(args)
+    stream, store = LocalOrderStream(max_backlog=args.orders), MemoryOrderStore(max_finished=args.orders)
+    processors = [OrderProcessor(workers=args.workers, stage_delays=delays, store=store, stream=stream,
+                                 consumer=f"worker-{n}", read_block_ms=50) for n in range(consumers)]
+    for processor in processors:
+        processor.start()
+
+    start = time.perf_counter()
+    for _ in range(args.orders):
+        await processors[0].submit({"items": [{"product_id": "p", "quantity": 1, "price": 5}], "total": 5})
+    while sum(processor.stats["completed"] for processor in processors) < args.orders:
+        await asyncio.sleep(0.005)
+    elapsed = time.perf_counter() - start
+
+    for processor in processors:
+        await processor.stop()
+    split = "/".join(str(processor.stats["completed"]) for processor in processors)
+    print(f"{consumers:>2} consumers x {args.workers} workers  {args.orders / elapsed:>8.1f} orders/s  split {split}")
+
+
+async def main(args):
+    for consumers in args.consumers:
+        if args.redis:
+            await run_processes(consumers, args, args.redis)
+        else:
+            await run(consumers, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--consumers", type=lambda value: [int(n) for n in value.split(",")], default=[1, 2, 4, 8])
+    parser.add_argument("--workers", type=int, default=4, help="worker tasks per consumer")
+    parser.add_argument("--scale", type=float, default=0.02, help="fraction of the default stage delays")
+    parser.add_argument("--redis", help="Redis URL; runs each consumer as its own process over Redis")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,77 @@
+"""
+Benchmark for batched payment authorization.
+
+Starts a PaymentGatewayStandIn that takes a fixed time per call plus a little
+per payment, then runs a burst of orders through OrderProcessor with payments
+sent one per call (batch size 1) and in windowed batches, over the same
+connection pool. Reports orders per second, gateway calls and the payment
+latency seen by each order.
+
+Usage:
+    python bench_payment_batching.py [--orders 500] [--workers 100] [--latency fixed:100]
+                                     [--per-item-ms 0.5] [--pool-size 4] [--window-ms 20]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from order_processor import OrderProcessor
+from payment_gateway import HTTPPaymentGateway, PaymentBatcher
+from payment_gateway_stand_in import PaymentGatewayStandIn
+
+
+class TimedBatcher(PaymentBatcher):
+    """Records how long each authorization waited"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+
+    async def authorize(self, order_id, amount, currency="USD"):
+        start = time.perf_counter()
+        try:
+            return await super().authorize(order_id, amount, currency)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+
+async def run(name: str, batch_size: int, args) -> None:
+    stand_in = PaymentGatewayStandIn(args.latency, args.per_item_ms, seed=1)
+    gateway = HTTPPaymentGateway(await stand_in.start(), pool_size=args.pool_size, timeout=60)
+    batcher = TimedBatcher(gateway, window_ms=args.window_ms if batch_size > 1 else 0, max_batch_size=batch_size)
+    processor = OrderProcessor(workers=args.workers, queue_size=args.orders,
+                               stage_delays={"validate": 0, "finalize": 0}, payments=batcher)
+
+    start = time.perf_counter()
+    for _ in range(args.orders):
+        await processor.submit({"items": [{"product_id": "p", "quantity": 1, "price": 5}], "total": 5})
+    while processor.stats["completed"] + processor.stats["failed"] < args.orders:
+        await asyncio.sleep(0.005)
+    elapsed = time.perf_counter() - start
+
+    await processor.stop()
+    await gateway.close()
+    await stand_in.stop()
+    latencies = sorted(batcher.latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{name:<10} {args.orders / elapsed:>8.1f} orders/s  {stand_in.stats['requests']:>5} gateway calls  "
+          f"payment p50 {statistics.median(latencies) * 1000:>7.1f} ms  p99 {p99 * 1000:>7.1f} ms  "
+          f"failed {processor.stats['failed']}")
+
+
+async def main(args):
+    await run("unbatched", 1, args)
+    await run("batched", args.max_batch_size, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=100, help="orders processed concurrently")
+    parser.add_argument("--latency", default="fixed:100", help="gateway time per call")
+    parser.add_argument("--per-item-ms", type=float, default=0.5, help="gateway time per payment")
+    parser.add_argument("--pool-size", type=int, default=4, help="connections to the gateway")
+    parser.add_argument("--window-ms", type=float, default=20)
+    parser.add_argument("--max-batch-size", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,92 @@
+"""
+Benchmark for request rate limiting.
+
+Reports the cost of one RateLimiter check against the in-process backend (and
+against Redis when REDIS_HOST is reachable), then the per-request latency of a
+small authenticated endpoint with and without RateLimitMiddleware.
+
+Usage:
+    python bench_rate_limit.py [--checks 100000] [--requests 3000] [--users 1000]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+import jwt
+import redis
+from fastapi import FastAPI, Request
+
+from auth_middleware import JWTAuthMiddleware
+from rate_limiter import LocalRateLimitBackend, RateLimitMiddleware, RateLimiter, RedisRateLimitBackend, parse_rate_limits
+from token_cache import VerifiedTokenCache
+
+SECRET = "bench-secret"
+# Generous limits so every request is checked and allowed
+RULES = parse_rate_limits('{"/small": {"*": "1000000/second"}, "/api/*": {"*": "10/second"}}')
+
+
+async def check_cost(limiter: RateLimiter, checks: int, users: int) -> float:
+    """Microseconds per check"""
+    start = time.perf_counter()
+    for n in range(checks):
+        await limiter.check("/small", "user", str(n % users))
+    return (time.perf_counter() - start) / checks * 1e6
+
+
+def make_app(limiter) -> FastAPI:
+    app = FastAPI()
+    if limiter is not None:
+        app.add_middleware(RateLimitMiddleware, limiter=lambda: limiter)
+    app.add_middleware(JWTAuthMiddleware, verify=VerifiedTokenCache(SECRET, ["HS256"]).verify)
+
+    @app.get("/small")
+    async def small(request: Request):
+        return {"user": request.state.user["sub"]}
+
+    return app
+
+
+async def request_cost(app: FastAPI, requests: int, tokens) -> float:
+    """Microseconds per request"""
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        headers = [{"Authorization": f"Bearer {token}"} for token in tokens]
+        await client.get("/small", headers=headers[0])
+        start = time.perf_counter()
+        for n in range(requests):
+            response = await client.get("/small", headers=headers[n % len(headers)])
+            assert response.status_code == 200
+        return (time.perf_counter() - start) / requests * 1e6
+
+
+async def main(args):
+    local = RateLimiter(RULES, LocalRateLimitBackend())
+    print(f"check, local backend   {await check_cost(local, args.checks, args.users):>8.2f} us")
+
+    client = redis.Redis(host=os.getenv("REDIS_HOST", "localhost"), port=int(os.getenv("REDIS_PORT", "6379")))
+    try:
+        client.ping()
+    except redis.ConnectionError:
+        print("check, redis backend   skipped (Redis unreachable)")
+    else:
+        shared = RateLimiter(RULES, RedisRateLimitBackend(client, prefix="bench:ratelimit:"))
+        print(f"check, redis backend   {await check_cost(shared, args.checks // 20, args.users):>8.2f} us")
+
+    tokens = [jwt.encode({"sub": str(n), "role": "user", "exp": time.time() + 3600}, SECRET, algorithm="HS256")
+              for n in range(min(args.users, 100))]
+    apps = (make_app(None), make_app(RateLimiter(RULES, LocalRateLimitBackend())))
+    # Alternate the two apps and keep the best round of each to damp noise
+    rounds = [[await request_cost(app, args.requests, tokens) for app in apps] for _ in range(args.rounds)]
+    without, limited = (min(costs) for costs in zip(*rounds))
+    print(f"request, no limiter    {without:>8.1f} us")
+    print(f"request, limiter       {limited:>8.1f} us  (+{limited - without:.1f} us)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checks", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--users", type=int, default=1000, help="distinct callers")
+    asyncio.run(main(parser.parse_args()))
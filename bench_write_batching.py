@@ -0,0 +1,89 @@
+"""
+Benchmark for server-side micro-batching of order inserts.
+
+Compares one insert_orders_one round-trip per order with the InsertBatcher,
+against a simulated Hasura that charges a fixed cost per round-trip, a small
+cost per row and serves a limited number of concurrent requests.
+
+Usage:
+    python bench_write_batching.py [--orders 2000] [--clients 200] [--rtt-ms 20]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from order_queries import INSERT_ORDERS_MUTATION
+from query_batcher import InsertBatcher
+
+
+class SimulatedHasura:
+    """Executor with per-round-trip latency, per-row cost and a connection cap"""
+
+    def __init__(self, rtt_ms: float, row_ms: float, connections: int):
+        self.rtt = rtt_ms / 1000
+        self.row = row_ms / 1000
+        self.connections = asyncio.Semaphore(connections)
+        self.round_trips = 0
+
+    async def __call__(self, document, variables=None, headers=None):
+        async with self.connections:
+            self.round_trips += 1
+            if "objects" in variables:
+                objects = variables["objects"]
+                await asyncio.sleep(self.rtt + self.row * len(objects))
+                return {"insert_orders": {"returning": [{"id": i} for i in range(len(objects))]}}
+            await asyncio.sleep(self.rtt + self.row)
+            return {"insert_orders_one": {"id": 0}}
+
+
+async def run_clients(insert, orders: int, clients: int):
+    """Issue `orders` inserts from `clients` concurrent callers, returning latencies"""
+    latencies = []
+    remaining = iter(range(orders))
+
+    async def client(client_id):
+        headers = {"x-hasura-role": "user", "x-hasura-user-id": str(client_id % 10)}
+        for n in remaining:
+            start = time.perf_counter()
+            await insert({"user_id": headers["x-hasura-user-id"], "details": {"n": n}}, headers)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    return time.perf_counter() - start, latencies
+
+
+def report(name: str, elapsed: float, latencies, round_trips: int):
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"{name:<10} {len(latencies) / elapsed:>10.0f} orders/s  "
+          f"p50 {statistics.median(ordered) * 1000:>7.1f} ms  p99 {p99 * 1000:>7.1f} ms  "
+          f"round-trips {round_trips}")
+
+
+async def main(args):
+    direct_hasura = SimulatedHasura(args.rtt_ms, args.row_ms, args.connections)
+
+    async def direct_insert(obj, headers):
+        return await direct_hasura(None, {"input": obj}, headers)
+
+    elapsed, latencies = await run_clients(direct_insert, args.orders, args.clients)
+    report("direct", elapsed, latencies, direct_hasura.round_trips)
+
+    batched_hasura = SimulatedHasura(args.rtt_ms, args.row_ms, args.connections)
+    batcher = InsertBatcher(batched_hasura, INSERT_ORDERS_MUTATION, window_ms=args.window_ms, max_batch_size=args.batch_size)
+    elapsed, latencies = await run_clients(batcher.insert, args.orders, args.clients)
+    report("batched", elapsed, latencies, batched_hasura.round_trips)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--rtt-ms", type=float, default=20)
+    parser.add_argument("--row-ms", type=float, default=0.2)
+    parser.add_argument("--connections", type=int, default=20, help="concurrent requests Hasura serves")
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--batch-size", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,198 @@
+"""
+Change feed for the orders table over Hasura GraphQL subscriptions.
+
+A background task keeps a streaming subscription on orders open and reports
+the user ids of changed rows, so cached listings can be invalidated as soon as
+Hasura sees a change, including writes made by n8n workflows or the console.
+The graphql-transport-ws protocol is spoken directly over aiohttp.
+
+updated_at is set when a transaction starts, so a change committed late can be
+stamped before the resume point. Reconnects resume `resume_overlap` seconds
+earlier and report the overlap again; invalidating twice is harmless.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional, Callable, Awaitable, Iterable
+
+import aiohttp
+
+from circuit_breaker import backoff_delay
+
+# Setup logging
+logger = logging.getLogger("fastapi-hasura")
+
+ORDER_CHANGES_SUBSCRIPTION = '''
+    subscription OrderChanges($since: timestamptz!, $batch_size: Int!) {
+        orders_stream(cursor: {initial_value: {updated_at: $since}, ordering: ASC}, batch_size: $batch_size) {
+            id
+            user_id
+            updated_at
+        }
+    }
+'''
+
+ChangeHandler = Callable[[Iterable[str]], Awaitable[None]]
+
+
+class ChangeFeedError(Exception):
+    """Raised when the subscription is rejected by the server"""
+
+
+def websocket_url(http_url: str) -> str:
+    """Derive the GraphQL websocket URL from the HTTP endpoint"""
+    if http_url.startswith("https://"):
+        return "wss://" + http_url[len("https://"):]
+    if http_url.startswith("http://"):
+        return "ws://" + http_url[len("http://"):]
+    return http_url
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse a timestamptz as Hasura returns it, treating a missing offset as UTC"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class OrderChangeFeed:
+    """Background subscriber that reports changed orders and reconnects on failure"""
+
+    def __init__(self, url: str, headers: Dict[str, str], on_change: ChangeHandler,
+                 batch_size: int = 100, reconnect_base_delay: float = 0.5, reconnect_max_delay: float = 30,
+                 resume_overlap: float = 5):
+        """Initialize the feed
+
+        Args:
+            url: GraphQL websocket endpoint
+            headers: Connection headers sent in the connection_init payload
+            on_change: Coroutine called with the user ids of each batch of changed orders
+            batch_size: Maximum rows per streamed batch
+            reconnect_base_delay: First reconnect delay, doubled per failed attempt
+            reconnect_max_delay: Cap on the reconnect delay
+            resume_overlap: Seconds before the newest change seen to resume from, for late commits
+        """
+        self.url = url
+        self.headers = headers
+        self.on_change = on_change
+        self.batch_size = batch_size
+        self.reconnect_base_delay = reconnect_base_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self.resume_overlap = resume_overlap
+        # Resume point: updated_at of the newest change seen so far
+        self.last_seen: Optional[str] = None
+        self.stats = {
+            "connected": False,
+            "reconnects": 0,
+            "events": 0,
+            "last_event_at": None,
+            "last_error": None
+        }
+        self._attempt = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the subscriber task"""
+        if self._task is None or self._task.done():
+            if self.last_seen is None:
+                self.last_seen = datetime.now(timezone.utc).isoformat()
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop the subscriber task"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.stats["connected"] = False
+
+    async def run(self) -> None:
+        """Consume the subscription forever, reconnecting with jittered backoff"""
+        while True:
+            try:
+                await self._consume()
+                logger.info("Order change feed completed by server, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["last_error"] = str(e)
+                logger.warning(f"Order change feed disconnected: {e}")
+
+            self.stats["connected"] = False
+            delay = backoff_delay(self._attempt, self.reconnect_base_delay, self.reconnect_max_delay)
+            self._attempt += 1
+            self.stats["reconnects"] += 1
+            await asyncio.sleep(delay)
+
+    async def _consume(self) -> None:
+        """Open one websocket connection and process messages until it ends"""
+        async with aiohttp.ClientSession() as session:
+            async with session.ws_connect(self.url, protocols=["graphql-transport-ws"], heartbeat=30) as ws:
+                await ws.send_json({"type": "connection_init", "payload": {"headers": self.headers}})
+                ack = await ws.receive_json(timeout=10)
+                if ack.get("type") != "connection_ack":
+                    raise ChangeFeedError(f"Unexpected handshake reply: {ack}")
+
+                self._attempt = 0
+                self.stats["connected"] = True
+                since = self._resume_from()
+                logger.info(f"Order change feed connected, resuming after {since}")
+
+                await ws.send_json({
+                    "id": "orders",
+                    "type": "subscribe",
+                    "payload": {
+                        "query": ORDER_CHANGES_SUBSCRIPTION,
+                        "variables": {"since": since, "batch_size": self.batch_size}
+                    }
+                })
+
+                async for message in ws:
+                    if message.type != aiohttp.WSMsgType.TEXT:
+                        if message.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                            break
+                        continue
+
+                    data = message.json()
+                    message_type = data.get("type")
+                    if message_type == "ping":
+                        await ws.send_json({"type": "pong"})
+                    elif message_type == "next":
+                        await self._handle_changes(data.get("payload") or {})
+                    elif message_type == "error":
+                        raise ChangeFeedError(f"Subscription error: {data.get('payload')}")
+                    elif message_type == "complete":
+                        return
+
+    async def _handle_changes(self, payload: Dict[str, Any]) -> None:
+        """Report the users affected by a batch of changed orders"""
+        if payload.get("errors"):
+            raise ChangeFeedError(f"Subscription error: {payload['errors']}")
+
+        rows = (payload.get("data") or {}).get("orders_stream") or []
+        if not rows:
+            return
+
+        user_ids = {row["user_id"] for row in rows if row.get("user_id")}
+        # Compared as times: Hasura's text form varies in precision and offset
+        newest = max((row["updated_at"] for row in rows if row.get("updated_at")), key=parse_timestamp, default=None)
+
+        await self.on_change(user_ids)
+
+        # Only advance the resume point once the batch has been handled
+        if newest and (self.last_seen is None or parse_timestamp(newest) > parse_timestamp(self.last_seen)):
+            self.last_seen = newest
+        self.stats["events"] += len(rows)
+        self.stats["last_event_at"] = time.time()
+
+    def _resume_from(self) -> str:
+        """Subscription cursor for a new connection, overlapping the last changes seen"""
+        return (parse_timestamp(self.last_seen) - timedelta(seconds=self.resume_overlap)).isoformat()
+
+    def get_state(self) -> Dict[str, Any]:
+        """Get the feed state for health endpoints"""
+        return {**self.stats, "last_seen": self.last_seen}
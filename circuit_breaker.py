@@ -0,0 +1,131 @@
+"""
+Circuit breaker and retry policy for outbound Hasura calls.
+
+The breaker opens after a run of consecutive infrastructure failures, makes
+calls fail fast while open and lets a single half-open probe through once the
+reset timeout has passed. The probe gets its own timeout, so a hung call cannot
+hold the circuit half-open.
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, Any
+
+import aiohttp
+from gql.transport.exceptions import TransportServerError, TransportClosed
+
+# Setup logging
+logger = logging.getLogger("fastapi-hasura")
+
+
+class CircuitState:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_in:.1f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Tracks consecutive failures of a dependency and fails fast while it is down"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30, probe_timeout: float = 10):
+        """Initialize the breaker
+
+        Args:
+            name: Dependency name used in logs and errors
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds to stay open before allowing a half-open probe
+            probe_timeout: Seconds a half-open probe may take before it counts as a failure
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+        self.stats = {"opened": 0, "rejected": 0}
+
+    def allow_request(self) -> bool:
+        """Check whether a call may go out, claiming the half-open probe if due"""
+        if self.state == CircuitState.CLOSED:
+            return True
+
+        if self.state == CircuitState.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = CircuitState.HALF_OPEN
+            self.probe_in_flight = False
+            logger.info(f"Circuit '{self.name}' half-open, sending probe")
+
+        if self.state == CircuitState.HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+
+        self.stats["rejected"] += 1
+        return False
+
+    def record_success(self) -> None:
+        """Close the circuit after a successful call"""
+        if self.state != CircuitState.CLOSED:
+            logger.info(f"Circuit '{self.name}' closed after successful probe")
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Give up a half-open probe that ended without a verdict, e.g. when cancelled"""
+        self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """Count a failure and open the circuit when the threshold is reached"""
+        self.consecutive_failures += 1
+        if self.state == CircuitState.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != CircuitState.OPEN:
+                self.stats["opened"] += 1
+                logger.warning(f"Circuit '{self.name}' opened after {self.consecutive_failures} consecutive failures")
+            self.state = CircuitState.OPEN
+            self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+    def retry_in(self) -> float:
+        """Seconds until a half-open probe will be allowed"""
+        if self.state != CircuitState.OPEN:
+            return 0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def get_state(self) -> Dict[str, Any]:
+        """Get the breaker state for health and metrics endpoints"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "retry_in": round(self.retry_in(), 3),
+            "opened": self.stats["opened"],
+            "rejected": self.stats["rejected"]
+        }
+
+
+def is_retryable(error: Exception) -> bool:
+    """Check whether an error is worth retrying
+
+    Connection problems, timeouts, 429 and 5xx responses are transient.
+    GraphQL errors and other 4xx responses fail the same way on every attempt.
+    """
+    if isinstance(error, TransportServerError):
+        return error.code is None or error.code == 429 or error.code >= 500
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError, TransportClosed, ConnectionError))
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Exponential backoff with full jitter for the given zero-based attempt"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
@@ -0,0 +1,173 @@
+"""
+Adaptive concurrency limit for outbound Hasura calls.
+
+The limit follows the gradient between the no-load latency (the minimum
+observed) and the current latency: while calls are about as fast as the
+baseline it grows by roughly sqrt(limit), and when latency rises it shrinks in
+proportion, so a slow Hasura receives fewer concurrent calls instead of a
+growing pile of them. Calls over the limit wait in a short FIFO queue and are
+rejected when the queue is full or the wait times out.
+"""
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Dict, Any, Callable, Awaitable, Optional
+
+import deadlines
+from deadlines import DeadlineExceeded
+
+# Setup logging
+logger = logging.getLogger("fastapi-hasura")
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """Raised when a call cannot get a concurrency slot in time"""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        super().__init__(f"Too many concurrent {name} calls (limit {limit})")
+
+
+class AdaptiveLimiter:
+    """Gradient-based concurrency limiter with a bounded wait queue"""
+
+    def __init__(self, name: str, initial_limit: int = 20, min_limit: int = 1, max_limit: int = 200,
+                 tolerance: float = 1.5, smoothing: float = 0.2, backoff_ratio: float = 0.9,
+                 baseline_reset: float = 60, queue_size: int = 100, queue_timeout: float = 0.2):
+        """Initialize the limiter
+
+        Args:
+            name: Name used in errors and logs
+            initial_limit: Concurrent calls allowed before any latency is measured
+            min_limit, max_limit: Bounds of the adaptive limit
+            tolerance: Latency increase over the baseline accepted without shrinking
+            smoothing: Weight of each new limit estimate
+            backoff_ratio: Multiplicative decrease applied when a call times out or fails to connect
+            baseline_reset: Seconds after which the minimum latency is measured afresh,
+                so the baseline follows lasting changes in Hasura's speed
+            queue_size: Calls allowed to wait for a slot; beyond that calls are rejected
+            queue_timeout: Seconds a call may wait for a slot
+        """
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.backoff_ratio = backoff_ratio
+        self.baseline_reset = baseline_reset
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.min_rtt: Optional[float] = None
+        self._baseline_expires = 0.0
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self.stats = {"calls": 0, "queued": 0, "rejected": 0, "timed_out": 0, "drops": 0}
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    def _grant(self) -> None:
+        """Hand free slots to waiting calls in arrival order"""
+        while self._waiters and self.in_flight < self.current_limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def acquire(self) -> None:
+        """Take a slot, waiting briefly in the queue when the limit is reached"""
+        self.stats["calls"] += 1
+        if self.in_flight < self.current_limit and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            self.stats["rejected"] += 1
+            raise ConcurrencyLimitExceeded(self.name, self.current_limit)
+
+        self.stats["queued"] += 1
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, deadlines.timeout(self.queue_timeout))
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was granted as the wait ended; give it back
+                self._release()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                if deadlines.expired():
+                    raise DeadlineExceeded()
+                self.stats["timed_out"] += 1
+                raise ConcurrencyLimitExceeded(self.name, self.current_limit)
+            raise
+
+    def _release(self) -> None:
+        self.in_flight = max(0, self.in_flight - 1)
+        self._grant()
+
+    def release(self, rtt: Optional[float] = None, dropped: bool = False) -> None:
+        """Give a slot back, updating the limit from the call's latency
+
+        `rtt` is None when the call ended without a usable measurement (e.g. cancelled).
+        """
+        if dropped:
+            self.stats["drops"] += 1
+            self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+        elif rtt is not None:
+            self._update(rtt, self.in_flight)
+        self._release()
+
+    def _update(self, rtt: float, in_flight: int) -> None:
+        rtt = max(rtt, 1e-6)
+        now = time.monotonic()
+        if self.min_rtt is None or now >= self._baseline_expires:
+            self.min_rtt = rtt
+            self._baseline_expires = now + self.baseline_reset
+        else:
+            self.min_rtt = min(self.min_rtt, rtt)
+
+        # A mostly idle limiter says nothing about how much more Hasura can take
+        if in_flight < self.limit / 2:
+            return
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.min_rtt / rtt))
+        new_limit = self.limit * gradient + math.sqrt(self.limit)
+        self.limit = min(self.max_limit, max(self.min_limit,
+                                             self.limit * (1 - self.smoothing) + new_limit * self.smoothing))
+
+    async def run(self, call: Callable[[], Awaitable[Any]], is_drop: Callable[[Exception], bool] = lambda e: False) -> Any:
+        """Run a call inside a slot; `is_drop` marks errors that indicate overload"""
+        await self.acquire()
+        start = time.perf_counter()
+        try:
+            result = await call()
+        except Exception as e:
+            if is_drop(e):
+                self.release(dropped=True)
+            else:
+                self.release(time.perf_counter() - start)
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.release(time.perf_counter() - start)
+        return result
+
+    def get_state(self) -> Dict[str, Any]:
+        """Current limit, load and counters for the metrics endpoint"""
+        return {
+            "limit": self.current_limit,
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+            "latency_baseline_ms": round(self.min_rtt * 1000, 2) if self.min_rtt is not None else None,
+            **self.stats
+        }
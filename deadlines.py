@@ -0,0 +1,133 @@
+"""
+Per-request deadlines shared by every downstream call.
+
+The deadline is held in a context variable, so cache, Hasura and n8n helpers
+can bound their own timeouts and retry loops by whatever budget the current
+request has left without threading it through every signature.
+"""
+import asyncio
+import contextvars
+import time
+from functools import wraps
+from typing import Optional, Awaitable, Any, Callable, Dict
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the current request has used up its time budget"""
+
+    def __init__(self, message: str = "Request deadline exceeded"):
+        super().__init__(message)
+
+
+def set_deadline(seconds: Optional[float]) -> contextvars.Token:
+    """Give the current context `seconds` from now; None removes the deadline"""
+    return _deadline.set(None if seconds is None else time.monotonic() + seconds)
+
+
+def set_deadline_at(deadline: Optional[float]) -> contextvars.Token:
+    """Set an absolute monotonic deadline for the current context"""
+    return _deadline.set(deadline)
+
+
+def reset_deadline(token: contextvars.Token) -> None:
+    _deadline.reset(token)
+
+
+def get_deadline() -> Optional[float]:
+    """Absolute monotonic deadline of the current context, if any"""
+    return _deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline, or None without a deadline"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check() -> None:
+    """Raise DeadlineExceeded if the budget is used up"""
+    if expired():
+        raise DeadlineExceeded()
+
+
+def timeout(default: Optional[float]) -> Optional[float]:
+    """Timeout for a downstream call: the smaller of `default` and the time left"""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded()
+    return left if default is None else min(default, left)
+
+
+async def bounded(awaitable: Awaitable[Any]) -> Any:
+    """Await with the remaining budget as timeout, raising DeadlineExceeded when it runs out"""
+    left = remaining()
+    if left is None:
+        return await awaitable
+    if left <= 0:
+        # Close coroutines we are not going to await
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded()
+    try:
+        return await asyncio.wait_for(awaitable, left)
+    except asyncio.TimeoutError:
+        if expired():
+            raise DeadlineExceeded()
+        raise
+
+
+def detached(func):
+    """Wrap a coroutine function so it runs without the caller's deadline
+
+    Used for background tasks, which finish after the response and must not be
+    cut short by the request's budget.
+    """
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = _deadline.set(None)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _deadline.reset(token)
+
+    return wrapper
+
+
+class DeadlineMiddleware:
+    """Give each HTTP request a deadline read by every downstream call
+
+    A plain ASGI middleware, so the deadline covers the whole response without
+    BaseHTTPMiddleware's extra task and memory stream.
+    """
+
+    def __init__(self, app, budget: Callable[[Dict[str, Any]], Optional[float]]):
+        """Initialize the middleware
+
+        Args:
+            app: The wrapped ASGI app
+            budget: Seconds allowed for a request, given its ASGI scope; None for no deadline
+        """
+        self.app = app
+        self.budget = budget
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = set_deadline(self.budget(scope))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reset_deadline(token)
@@ -0,0 +1,137 @@
+"""
+Latency-aware routing of read queries across several GraphQL endpoints.
+
+Every endpoint keeps an EWMA of its latency and error rate. Reads go to the
+endpoint with the lowest expected cost, and endpoints that keep failing are
+ejected for a while before they are tried again. The error rate only moves when
+an endpoint gets traffic, so it is halved when an ejection ends; otherwise a
+recovered endpoint would stay scored as failing and never win traffic back.
+"""
+import logging
+import time
+from typing import Dict, Any, List, Optional
+
+# Setup logging
+logger = logging.getLogger("fastapi-hasura")
+
+
+class Endpoint:
+    """Observed behaviour of one GraphQL endpoint"""
+
+    __slots__ = ("url", "ewma_latency", "error_rate", "consecutive_failures", "ejected_until",
+                 "in_flight", "requests", "errors", "ejections")
+
+    def __init__(self, url: str):
+        self.url = url
+        self.ewma_latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.ejections = 0
+
+    def is_ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+    def score(self, default_latency: float) -> float:
+        """Expected cost of sending the next request here; lower is better
+
+        Endpoints never tried are tried first so they get a latency estimate.
+        Endpoints that have only ever failed are scored at `default_latency`, so
+        their error rate keeps them behind healthy endpoints.
+        """
+        latency = self.ewma_latency
+        if latency is None:
+            if not self.errors:
+                return 0.0
+            latency = default_latency
+        return latency * (1 + self.in_flight) / max(0.05, 1 - self.error_rate)
+
+
+class EndpointRouter:
+    """Chooses read endpoints by EWMA latency and error rate"""
+
+    def __init__(self, urls: List[str], alpha: float = 0.3, eject_after: int = 3, ejection_seconds: float = 30):
+        """Initialize the router
+
+        Args:
+            urls: Read endpoint URLs
+            alpha: EWMA weight of the newest observation
+            eject_after: Consecutive failures that eject an endpoint
+            ejection_seconds: How long an ejected endpoint receives no traffic
+        """
+        if not urls:
+            raise ValueError("At least one endpoint is required")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.alpha = alpha
+        self.eject_after = eject_after
+        self.ejection_seconds = ejection_seconds
+
+    def choose(self) -> Endpoint:
+        """Pick the available endpoint with the lowest score"""
+        now = time.monotonic()
+        for endpoint in self.endpoints:
+            if endpoint.ejected_until and not endpoint.is_ejected(now):
+                self._readmit(endpoint)
+        available = [endpoint for endpoint in self.endpoints if not endpoint.is_ejected(now)]
+        if not available:
+            # Everything is ejected: fail open to the endpoint that comes back first
+            return min(self.endpoints, key=lambda endpoint: endpoint.ejected_until)
+        measured = [endpoint.ewma_latency for endpoint in self.endpoints if endpoint.ewma_latency is not None]
+        default_latency = sum(measured) / len(measured) if measured else 1.0
+        return min(available, key=lambda endpoint: endpoint.score(default_latency))
+
+    def _readmit(self, endpoint: Endpoint) -> None:
+        """Return an endpoint whose ejection has ended to the rotation"""
+        endpoint.ejected_until = 0.0
+        endpoint.error_rate /= 2
+        logger.info(f"Read endpoint {endpoint.url} back in rotation")
+
+    def start(self, endpoint: Endpoint) -> None:
+        """Mark a request as sent to an endpoint"""
+        endpoint.in_flight += 1
+        endpoint.requests += 1
+
+    def record(self, endpoint: Endpoint, latency: float, ok: bool) -> None:
+        """Fold a finished request into the endpoint's statistics"""
+        endpoint.in_flight = max(0, endpoint.in_flight - 1)
+        endpoint.error_rate += self.alpha * ((0.0 if ok else 1.0) - endpoint.error_rate)
+
+        if ok:
+            if endpoint.ewma_latency is None:
+                endpoint.ewma_latency = latency
+            else:
+                endpoint.ewma_latency += self.alpha * (latency - endpoint.ewma_latency)
+            endpoint.consecutive_failures = 0
+            return
+
+        endpoint.errors += 1
+        endpoint.consecutive_failures += 1
+        if endpoint.consecutive_failures >= self.eject_after:
+            endpoint.ejected_until = time.monotonic() + self.ejection_seconds
+            endpoint.ejections += 1
+            logger.warning(f"Read endpoint {endpoint.url} ejected for {self.ejection_seconds}s after "
+                           f"{endpoint.consecutive_failures} consecutive failures")
+
+    def release(self, endpoint: Endpoint) -> None:
+        """Forget a request that ended without a verdict, e.g. when cancelled"""
+        endpoint.in_flight = max(0, endpoint.in_flight - 1)
+
+    def get_state(self) -> List[Dict[str, Any]]:
+        """Get per-endpoint statistics for health and metrics endpoints"""
+        now = time.monotonic()
+        return [
+            {
+                "url": endpoint.url,
+                "ewma_latency_ms": round(endpoint.ewma_latency * 1000, 2) if endpoint.ewma_latency is not None else None,
+                "error_rate": round(endpoint.error_rate, 3),
+                "ejected": endpoint.is_ejected(now),
+                "in_flight": endpoint.in_flight,
+                "requests": endpoint.requests,
+                "errors": endpoint.errors,
+                "ejections": endpoint.ejections
+            }
+            for endpoint in self.endpoints
+        ]
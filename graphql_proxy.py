@@ -0,0 +1,172 @@
+"""
+Helpers for the generic GraphQL passthrough endpoint.
+
+Incoming documents are reduced to the selected operation with fragments
+inlined, and a canonical form (fields, arguments and variable definitions
+sorted, whitespace normalized by the printer) is hashed into the cache key, so
+equivalent documents written differently share one cache entry.
+
+Operation names are chosen by the client, so an allow-list entry shared by a
+whole role is bound to the hash of its registered document: a different
+document sent under the same name is cached per user only.
+"""
+import hashlib
+import json
+from typing import Dict, Any, Optional, Iterable, Set
+
+from graphql import (
+    parse, print_ast, GraphQLSyntaxError, DocumentNode, OperationDefinitionNode, FragmentDefinitionNode,
+    SelectionSetNode, FieldNode, FragmentSpreadNode, InlineFragmentNode, OperationType
+)
+
+CACHE_SCOPES = ("user", "role")
+
+
+class InvalidOperationError(ValueError):
+    """Raised for documents the proxy cannot execute"""
+
+
+def _replace(node, **changes):
+    """Copy an AST node with some attributes replaced"""
+    values = {key: getattr(node, key) for key in node.keys if key != "loc"}
+    values.update(changes)
+    return node.__class__(**values)
+
+
+def _inline_fragments(selection_set: Optional[SelectionSetNode], fragments: Dict[str, FragmentDefinitionNode],
+                      seen: Set[str]) -> Optional[SelectionSetNode]:
+    """Replace fragment spreads with equivalent inline fragments"""
+    if selection_set is None:
+        return None
+    selections = []
+    for selection in selection_set.selections:
+        if isinstance(selection, FragmentSpreadNode):
+            name = selection.name.value
+            if name not in fragments:
+                raise InvalidOperationError(f"Unknown fragment {name}")
+            if name in seen:
+                raise InvalidOperationError(f"Fragment {name} spreads itself")
+            fragment = fragments[name]
+            selections.append(InlineFragmentNode(
+                type_condition=fragment.type_condition,
+                directives=selection.directives,
+                selection_set=_inline_fragments(fragment.selection_set, fragments, seen | {name})
+            ))
+        else:
+            selections.append(_replace(
+                selection,
+                selection_set=_inline_fragments(selection.selection_set, fragments, seen)
+            ))
+    return _replace(selection_set, selections=tuple(selections))
+
+
+def select_operation(source: str, operation_name: Optional[str] = None) -> DocumentNode:
+    """Parse a document and return only the selected operation, with fragments inlined"""
+    try:
+        document = parse(source)
+    except GraphQLSyntaxError as e:
+        raise InvalidOperationError(e.message)
+
+    operations = [d for d in document.definitions if isinstance(d, OperationDefinitionNode)]
+    fragments = {d.name.value: d for d in document.definitions if isinstance(d, FragmentDefinitionNode)}
+    if operation_name is not None:
+        operations = [op for op in operations if op.name is not None and op.name.value == operation_name]
+        if not operations:
+            raise InvalidOperationError(f"Unknown operation {operation_name}")
+    if len(operations) != 1:
+        raise InvalidOperationError("Document must contain exactly one operation or name one with operationName")
+
+    operation = operations[0]
+    operation = _replace(operation, selection_set=_inline_fragments(operation.selection_set, fragments, set()))
+    return DocumentNode(definitions=(operation,))
+
+
+def operation_type(document: DocumentNode) -> OperationType:
+    return document.definitions[0].operation
+
+
+def operation_name(document: DocumentNode) -> Optional[str]:
+    name = document.definitions[0].name
+    return name.value if name is not None else None
+
+
+def _selection_key(selection) -> tuple:
+    if isinstance(selection, FieldNode):
+        return (0, (selection.alias or selection.name).value, print_ast(selection))
+    return (1, "", print_ast(selection))
+
+
+def _sorted_selection_set(selection_set: Optional[SelectionSetNode]) -> Optional[SelectionSetNode]:
+    """Sort selections and arguments so field order does not change the canonical form"""
+    if selection_set is None:
+        return None
+    selections = []
+    for selection in selection_set.selections:
+        changes = {"selection_set": _sorted_selection_set(selection.selection_set)}
+        if isinstance(selection, FieldNode):
+            changes["arguments"] = tuple(sorted(selection.arguments or (), key=lambda arg: arg.name.value))
+        selections.append(_replace(selection, **changes))
+    return _replace(selection_set, selections=tuple(sorted(selections, key=_selection_key)))
+
+
+def canonical_form(document: DocumentNode) -> str:
+    """Printed canonical form of a document returned by select_operation"""
+    operation = document.definitions[0]
+    operation = _replace(
+        operation,
+        variable_definitions=tuple(sorted(operation.variable_definitions or (), key=lambda d: d.variable.name.value)),
+        selection_set=_sorted_selection_set(operation.selection_set)
+    )
+    return print_ast(operation)
+
+
+def document_hash(document: DocumentNode) -> str:
+    """Hash of the canonical document alone, identifying it whatever its variables"""
+    return hashlib.sha256(canonical_form(document).encode()).hexdigest()
+
+
+def canonical_hash(document: DocumentNode, variables: Optional[Dict[str, Any]] = None) -> str:
+    """Hash of the canonical document together with its variables"""
+    payload = canonical_form(document) + "\n" + json.dumps(variables or {}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def parse_cache_allowlist(raw: str, tag_families: Iterable[str] = ()) -> Dict[str, Dict[str, Any]]:
+    """Parse the cacheable operation allow-list
+
+    `raw` is a JSON object mapping operation names to a TTL in seconds, or to an
+    object with "ttl", "scope" ("user", the default, or "role"), "tags"
+    (invalidation tag families, e.g. ["orders"]) and "document". Entries scoped
+    to a role must give the registered document; only that document is shared
+    across the role.
+    """
+    policies = {}
+    for name, entry in json.loads(raw or "{}").items():
+        if not isinstance(entry, dict):
+            entry = {"ttl": entry}
+        policy = {"ttl": int(entry["ttl"]), "scope": entry.get("scope", "user"), "tags": list(entry.get("tags", []))}
+        if policy["scope"] not in CACHE_SCOPES:
+            raise ValueError(f"Invalid cache scope {policy['scope']!r} for operation {name}")
+        if "document" in entry:
+            try:
+                document = select_operation(entry["document"], name)
+            except InvalidOperationError as e:
+                raise ValueError(f"Invalid document for operation {name}: {e}")
+            policy["document_hash"] = document_hash(document)
+        elif policy["scope"] == "role":
+            raise ValueError(f"Operation {name} is shared across a role, so its document must be registered")
+        unknown = set(policy["tags"]) - set(tag_families)
+        if unknown:
+            raise ValueError(f"Unknown cache tags {sorted(unknown)} for operation {name}")
+        policies[name] = policy
+    return policies
+
+
+def cache_scope(policy: Dict[str, Any], role: str, user_id: str, document: DocumentNode) -> str:
+    """Cache key segment separating results that different callers may not share
+
+    Results are shared across a role only for the entry's registered document.
+    """
+    if policy["scope"] == "role" and policy.get("document_hash") == document_hash(document):
+        return f"role:{role}"
+    return f"role:{role}:user:{user_id}"
@@ -0,0 +1,375 @@
+"""
+Local stand-in for the Hasura GraphQL endpoint.
+
+Serves the `orders` query and the `insert_orders_one` / `insert_orders`
+mutations over an in-memory table, with the same role-based row filtering the
+real orders permissions apply. Latency, HTTP errors and dropped connections can
+be injected from a seeded random generator, so benchmarks and tests of the
+retry, caching and batching paths are repeatable and run offline.
+
+Usage:
+    python hasura_stand_in.py [--port 8080] [--latency lognormal:20,0.5]
+                              [--error-rate 0.01] [--drop-rate 0.001] [--seed 1] [--orders 1000]
+
+Then point the API at it with HASURA_ENDPOINT=http://127.0.0.1:8080/v1/graphql.
+"""
+import argparse
+import asyncio
+import logging
+import math
+import random
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+from aiohttp import web
+from graphql import (
+    parse, GraphQLSyntaxError, OperationDefinitionNode, FragmentDefinitionNode, FieldNode,
+    FragmentSpreadNode, InlineFragmentNode, SelectionSetNode, OperationType, value_from_ast_untyped
+)
+
+# Setup logging
+logger = logging.getLogger("fastapi-hasura")
+
+TIMESTAMP_COLUMNS = ("created_at", "updated_at")
+
+LATENCY_KINDS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+
+
+class StandInError(Exception):
+    """A GraphQL error reported in the response body, like Hasura's validation errors"""
+
+    def __init__(self, message: str, code: str = "validation-failed"):
+        super().__init__(message)
+        self.code = code
+
+
+class LatencyModel:
+    """Random latency drawn from a named distribution, in milliseconds
+
+    Specs look like "fixed:20", "uniform:10,30", "normal:20,5",
+    "lognormal:20,0.5" (median and sigma) or "exponential:20" (mean).
+    """
+
+    def __init__(self, spec: str = "fixed:0"):
+        kind, _, params = spec.partition(":")
+        if kind not in LATENCY_KINDS:
+            raise ValueError(f"Unknown latency distribution {kind!r}")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p] or [0.0]
+        self.spec = spec
+
+    def sample(self, rng: random.Random) -> float:
+        """Draw one latency in seconds"""
+        p = self.params
+        if self.kind == "fixed":
+            ms = p[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            ms = rng.gauss(p[0], p[1])
+        elif self.kind == "lognormal":
+            ms = p[0] * math.exp(rng.gauss(0, p[1]))
+        else:
+            ms = rng.expovariate(1 / p[0]) if p[0] > 0 else 0.0
+        return max(0.0, ms) / 1000
+
+
+def _timestamp(value: Any) -> Any:
+    """Parse timestamps so comparisons do not depend on their string format"""
+    if not isinstance(value, str):
+        return value
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _compare(column: str, value: Any, op: str, operand: Any) -> bool:
+    if op == "_is_null":
+        return (value is None) == bool(operand)
+    if value is None:
+        return False
+    if column in TIMESTAMP_COLUMNS:
+        value = _timestamp(value)
+        operand = [_timestamp(v) for v in operand] if op in ("_in", "_nin") else _timestamp(operand)
+    if op == "_eq":
+        return value == operand
+    if op == "_neq":
+        return value != operand
+    if op == "_gt":
+        return value > operand
+    if op == "_gte":
+        return value >= operand
+    if op == "_lt":
+        return value < operand
+    if op == "_lte":
+        return value <= operand
+    if op == "_in":
+        return value in operand
+    if op == "_nin":
+        return value not in operand
+    raise StandInError(f"Unsupported comparison operator {op}")
+
+
+def matches(row: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Hasura bool_exp against a row"""
+    for key, condition in (where or {}).items():
+        if key == "_and":
+            if not all(matches(row, c) for c in condition):
+                return False
+        elif key == "_or":
+            if not any(matches(row, c) for c in condition):
+                return False
+        elif key == "_not":
+            if matches(row, condition):
+                return False
+        else:
+            for op, operand in condition.items():
+                if not _compare(key, row.get(key), op, operand):
+                    return False
+    return True
+
+
+def sort_rows(rows: List[Dict[str, Any]], order_by: Any) -> List[Dict[str, Any]]:
+    """Apply a Hasura order_by (an object or list of objects)"""
+    if isinstance(order_by, dict):
+        order_by = [order_by]
+    keys = [(column, direction) for item in (order_by or []) for column, direction in item.items()]
+    for column, direction in reversed(keys):
+        convert = _timestamp if column in TIMESTAMP_COLUMNS else (lambda v: v)
+        present = [row for row in rows if row.get(column) is not None]
+        missing = [row for row in rows if row.get(column) is None]
+        present.sort(key=lambda row: convert(row[column]), reverse=direction.startswith("desc"))
+        rows = present + missing
+    return rows
+
+
+class HasuraStandIn:
+    """In-memory orders table behind a Hasura-compatible GraphQL endpoint"""
+
+    def __init__(self, latency: str = "fixed:0", error_rate: float = 0.0, drop_rate: float = 0.0,
+                 error_status: int = 503, seed: Optional[int] = None, admin_secret: Optional[str] = None):
+        """Initialize the stand-in
+
+        Args:
+            latency: Latency distribution spec, see LatencyModel
+            error_rate: Fraction of requests answered with `error_status`
+            drop_rate: Fraction of requests whose connection is closed without a response
+            error_status: HTTP status of injected errors
+            seed: Seed for latency, fault and id generation
+            admin_secret: Required x-hasura-admin-secret, if any
+        """
+        self.latency = LatencyModel(latency)
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.error_status = error_status
+        self.admin_secret = admin_secret
+        self.rng = random.Random(seed)
+        self.orders: List[Dict[str, Any]] = []
+        self.stats = {"requests": 0, "errors": 0, "drops": 0, "queries": 0, "mutations": 0, "inserted": 0}
+        self.runner = None
+        self.url = None
+
+    # Data
+
+    def _new_id(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def insert(self, obj: Dict[str, Any], role: str = "admin", user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Insert one order, filling defaults the way the orders table does"""
+        if role == "user":
+            if obj.get("user_id", user_id) != user_id:
+                raise StandInError("check constraint of an insert/update permission has failed", "permission-error")
+            obj = {"user_id": user_id, **obj}
+        now = datetime.now(timezone.utc).isoformat()
+        row = {"id": self._new_id(), "status": "pending", "details": None, "processing_result": None,
+               "created_at": now, "updated_at": now}
+        row.update(obj)
+        self.orders.append(row)
+        self.stats["inserted"] += 1
+        return row
+
+    def seed_orders(self, count: int, users: int = 10) -> None:
+        """Fill the table with `count` orders spread over `users` users"""
+        for n in range(count):
+            self.insert({"user_id": str(n % users), "status": "created", "details": {"n": n}})
+
+    def select(self, args: Dict[str, Any], role: str, user_id: Optional[str]) -> List[Dict[str, Any]]:
+        rows = [row for row in self.orders if role != "user" or row.get("user_id") == user_id]
+        rows = [row for row in rows if matches(row, args.get("where"))]
+        rows = sort_rows(rows, args.get("order_by"))
+        offset = args.get("offset") or 0
+        limit = args.get("limit")
+        return rows[offset:] if limit is None else rows[offset:offset + limit]
+
+    # GraphQL execution
+
+    def _fields(self, selection_set: Optional[SelectionSetNode], fragments) -> List[FieldNode]:
+        """Flatten fragments into the list of selected fields"""
+        fields = []
+        for selection in selection_set.selections if selection_set else ():
+            if isinstance(selection, FieldNode):
+                fields.append(selection)
+            elif isinstance(selection, FragmentSpreadNode):
+                fields.extend(self._fields(fragments[selection.name.value].selection_set, fragments))
+            elif isinstance(selection, InlineFragmentNode):
+                fields.extend(self._fields(selection.selection_set, fragments))
+        return fields
+
+    def _project(self, row: Dict[str, Any], selection_set, fragments, typename: str) -> Dict[str, Any]:
+        result = {}
+        for field in self._fields(selection_set, fragments):
+            name = field.name.value
+            key = (field.alias or field.name).value
+            if name == "__typename":
+                result[key] = typename
+            elif name not in row:
+                raise StandInError(f"field '{name}' not found in type: '{typename}'")
+            else:
+                result[key] = row[name]
+        return result
+
+    def execute(self, query: str, variables: Optional[Dict[str, Any]] = None, operation_name: Optional[str] = None,
+                role: str = "admin", user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Execute a document and return the GraphQL response body"""
+        try:
+            document = parse(query)
+        except GraphQLSyntaxError as e:
+            return {"errors": [{"message": e.message, "extensions": {"code": "validation-failed"}}]}
+
+        operations = [d for d in document.definitions if isinstance(d, OperationDefinitionNode)]
+        if operation_name is not None:
+            operations = [op for op in operations if op.name and op.name.value == operation_name]
+        if len(operations) != 1:
+            return {"errors": [{"message": "exactly one operation has to be present in the query",
+                                "extensions": {"code": "validation-failed"}}]}
+        operation = operations[0]
+        fragments = {d.name.value: d for d in document.definitions if isinstance(d, FragmentDefinitionNode)}
+        variables = variables or {}
+
+        try:
+            if operation.operation == OperationType.QUERY:
+                self.stats["queries"] += 1
+                data = self._execute_query(operation, fragments, variables, role, user_id)
+            elif operation.operation == OperationType.MUTATION:
+                self.stats["mutations"] += 1
+                data = self._execute_mutation(operation, fragments, variables, role, user_id)
+            else:
+                raise StandInError("subscriptions are not supported over HTTP")
+        except StandInError as e:
+            return {"errors": [{"message": str(e), "extensions": {"code": e.code}}]}
+        return {"data": data}
+
+    def _arguments(self, field: FieldNode, variables: Dict[str, Any]) -> Dict[str, Any]:
+        return {arg.name.value: value_from_ast_untyped(arg.value, variables) for arg in field.arguments or ()}
+
+    def _execute_query(self, operation, fragments, variables, role, user_id) -> Dict[str, Any]:
+        data = {}
+        for field in self._fields(operation.selection_set, fragments):
+            name = field.name.value
+            key = (field.alias or field.name).value
+            if name == "__typename":
+                data[key] = "query_root"
+            elif name == "orders":
+                rows = self.select(self._arguments(field, variables), role, user_id)
+                data[key] = [self._project(row, field.selection_set, fragments, "orders") for row in rows]
+            else:
+                raise StandInError(f"field '{name}' not found in type: 'query_root'")
+        return data
+
+    def _execute_mutation(self, operation, fragments, variables, role, user_id) -> Dict[str, Any]:
+        data = {}
+        for field in self._fields(operation.selection_set, fragments):
+            name = field.name.value
+            key = (field.alias or field.name).value
+            args = self._arguments(field, variables)
+            if name == "__typename":
+                data[key] = "mutation_root"
+            elif name == "insert_orders_one":
+                row = self.insert(dict(args["object"]), role, user_id)
+                data[key] = self._project(row, field.selection_set, fragments, "orders")
+            elif name == "insert_orders":
+                # Validate every object before inserting any, as the real mutation is atomic
+                objects = [dict(obj) for obj in args["objects"]]
+                if role == "user" and any(obj.get("user_id", user_id) != user_id for obj in objects):
+                    raise StandInError("check constraint of an insert/update permission has failed", "permission-error")
+                rows = [self.insert(obj, role, user_id) for obj in objects]
+                response = {}
+                for sub in self._fields(field.selection_set, fragments):
+                    sub_key = (sub.alias or sub.name).value
+                    if sub.name.value == "affected_rows":
+                        response[sub_key] = len(rows)
+                    elif sub.name.value == "returning":
+                        response[sub_key] = [self._project(row, sub.selection_set, fragments, "orders") for row in rows]
+                    elif sub.name.value == "__typename":
+                        response[sub_key] = "orders_mutation_response"
+                    else:
+                        raise StandInError(f"field '{sub.name.value}' not found in type: 'orders_mutation_response'")
+                data[key] = response
+            else:
+                raise StandInError(f"field '{name}' not found in type: 'mutation_root'")
+        return data
+
+    # HTTP
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        self.stats["requests"] += 1
+        # Draw every random decision up front so a seed replays the same faults
+        delay = self.latency.sample(self.rng)
+        fault = self.rng.random()
+
+        await asyncio.sleep(delay)
+        if fault < self.drop_rate:
+            self.stats["drops"] += 1
+            request.transport.close()
+            return web.Response()
+        if fault < self.drop_rate + self.error_rate:
+            self.stats["errors"] += 1
+            return web.Response(status=self.error_status, text="injected failure")
+
+        if self.admin_secret is not None and request.headers.get("x-hasura-admin-secret") != self.admin_secret:
+            return web.json_response({"errors": [{"message": "invalid x-hasura-admin-secret/x-hasura-access-key",
+                                                  "extensions": {"code": "access-denied"}}]})
+        body = await request.json()
+        role = request.headers.get("x-hasura-role", "admin")
+        user_id = request.headers.get("x-hasura-user-id")
+        return web.json_response(self.execute(body.get("query", ""), body.get("variables"),
+                                              body.get("operationName"), role, user_id))
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/graphql", self.handle)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve in the running event loop; returns the GraphQL URL"""
+        self.runner = web.AppRunner(self.make_app())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.url = f"http://{host}:{port}/v1/graphql"
+        return self.url
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", default="fixed:0", help="e.g. fixed:20, uniform:10,30, lognormal:20,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--orders", type=int, default=0, help="orders to preload")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    stand_in = HasuraStandIn(args.latency, args.error_rate, args.drop_rate, args.error_status, args.seed)
+    stand_in.seed_orders(args.orders)
+    logger.info(f"Hasura stand-in serving {len(stand_in.orders)} orders on http://{args.host}:{args.port}/v1/graphql")
+    web.run_app(stand_in.make_app(), host=args.host, port=args.port, print=None)
@@ -0,0 +1,117 @@
+"""
+Background dependency probing for health endpoints.
+
+Hasura, Redis and n8n are checked on a schedule and the latest result of each
+probe is cached, so liveness and readiness endpoints answer from memory instead
+of calling dependencies on every load balancer probe.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Any, Callable, Awaitable, Optional, Tuple, List
+
+# Setup logging
+logger = logging.getLogger("fastapi-hasura")
+
+Probe = Callable[[], Awaitable[Any]]
+
+
+class HealthMonitor:
+    """Runs dependency probes periodically and caches their outcome"""
+
+    def __init__(self, interval: float = 10, timeout: float = 2, stale_after: Optional[float] = None):
+        """Initialize the monitor
+
+        Args:
+            interval: Seconds between probe rounds
+            timeout: Seconds a single probe may take before it counts as failed
+            stale_after: Age after which a result no longer counts for readiness
+                (defaults to three intervals)
+        """
+        self.interval = interval
+        self.timeout = timeout
+        self.stale_after = stale_after if stale_after is not None else interval * 3
+        self.probes: Dict[str, Probe] = {}
+        self.required: List[str] = []
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, probe: Probe, required: bool = False) -> None:
+        """Add a dependency probe; required dependencies gate readiness"""
+        self.probes[name] = probe
+        if required:
+            self.required.append(name)
+        self.results[name] = {
+            "status": "unknown",
+            "required": required,
+            "latency_ms": None,
+            "checked_at": None,
+            "error": None,
+            "consecutive_failures": 0
+        }
+
+    async def check(self, name: str) -> Dict[str, Any]:
+        """Run one probe and record its outcome"""
+        result = self.results[name]
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.probes[name](), self.timeout)
+            result["status"] = "healthy"
+            result["error"] = None
+            result["consecutive_failures"] = 0
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            if result["status"] != "unhealthy":
+                logger.warning(f"Dependency {name} became unhealthy: {error}")
+            result["status"] = "unhealthy"
+            result["error"] = error
+            result["consecutive_failures"] += 1
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        result["checked_at"] = time.time()
+        return result
+
+    async def run_once(self) -> None:
+        """Probe every dependency concurrently"""
+        await asyncio.gather(*(self.check(name) for name in self.probes))
+
+    async def run(self) -> None:
+        """Probe forever on the configured interval"""
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start the probing task"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop the probing task"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def status(self, name: str) -> str:
+        """Cached status of a dependency, reporting old results as stale"""
+        result = self.results[name]
+        if result["checked_at"] is not None and time.time() - result["checked_at"] > self.stale_after:
+            return "stale"
+        return result["status"]
+
+    def is_ready(self) -> Tuple[bool, Dict[str, str]]:
+        """Check that every required dependency has a fresh healthy result"""
+        failing = {}
+        for name in self.required:
+            status = self.status(name)
+            if status != "healthy":
+                failing[name] = status
+        return not failing, failing
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Cached results of every probe"""
+        return {name: {**result, "status": self.status(name)} for name, result in self.results.items()}
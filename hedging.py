@@ -0,0 +1,166 @@
+"""
+Hedged requests for read-only Hasura operations.
+
+If the first attempt has not answered by a latency percentile of recent calls,
+an identical second request is sent and whichever finishes first wins. A budget
+caps hedges at a fraction of all requests so a slow backend is not doubled.
+
+When a hedge wins, the cancelled first attempt's elapsed time is recorded as a
+lower bound of its latency; recording only finished attempts would leave out
+exactly the slow ones and pull the percentile down.
+"""
+import asyncio
+import bisect
+import logging
+import time
+from collections import deque
+from typing import Callable, Awaitable, Any, Dict, Optional
+
+from graphql import DocumentNode, OperationDefinitionNode, OperationType
+
+# Setup logging
+logger = logging.getLogger("fastapi-hasura")
+
+
+def is_read_only(document: DocumentNode) -> bool:
+    """Check whether every operation in a document is a query"""
+    operations = [d for d in document.definitions if isinstance(d, OperationDefinitionNode)]
+    return bool(operations) and all(op.operation == OperationType.QUERY for op in operations)
+
+
+class LatencyTracker:
+    """Rolling window of observed latencies
+
+    The window is also kept sorted as samples arrive, so reading a percentile
+    on every hedged call is an index lookup rather than a sort.
+    """
+
+    def __init__(self, window: int = 1000, min_samples: int = 20):
+        self.window = window
+        self.samples = deque()
+        self.ordered = []
+        self.min_samples = min_samples
+
+    def record(self, seconds: float) -> None:
+        if len(self.samples) >= self.window:
+            oldest = self.samples.popleft()
+            del self.ordered[bisect.bisect_left(self.ordered, oldest)]
+        self.samples.append(seconds)
+        bisect.insort(self.ordered, seconds)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """Latency at the given percentile, or None until enough samples exist"""
+        if len(self.ordered) < self.min_samples:
+            return None
+        index = min(len(self.ordered) - 1, int(len(self.ordered) * percentile / 100))
+        return self.ordered[index]
+
+
+class HedgeBudget:
+    """Token bucket allowing hedges for a fraction of requests"""
+
+    def __init__(self, ratio: float = 0.05, burst: float = 10):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+
+    def deposit(self) -> None:
+        """Credit the budget for one request"""
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Spend one hedge if the budget allows it"""
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class Hedger:
+    """Runs calls with a delayed backup request"""
+
+    def __init__(self, percentile: float = 95, budget_ratio: float = 0.05, min_delay_ms: float = 10,
+                 window: int = 1000, min_samples: int = 20):
+        """Initialize the hedger
+
+        Args:
+            percentile: Latency percentile after which a hedge is sent
+            budget_ratio: Maximum hedges per request, e.g. 0.05 for 5%
+            min_delay_ms: Lower bound on the hedge delay
+            window: Number of recent latencies kept
+            min_samples: Samples required before hedging starts
+        """
+        self.percentile = percentile
+        self.min_delay = min_delay_ms / 1000
+        self.tracker = LatencyTracker(window, min_samples)
+        self.budget = HedgeBudget(budget_ratio)
+        self.stats = {"requests": 0, "hedges_fired": 0, "hedges_won": 0, "budget_exhausted": 0}
+
+    def hedge_delay(self) -> Optional[float]:
+        """Current delay before a hedge is sent"""
+        delay = self.tracker.percentile(self.percentile)
+        if delay is None:
+            return None
+        return max(self.min_delay, delay)
+
+    async def _timed(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run one request and record its latency on success"""
+        start = time.monotonic()
+        result = await call()
+        self.tracker.record(time.monotonic() - start)
+        return result
+
+    async def run(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run a call, hedging it if the first request is slow"""
+        self.stats["requests"] += 1
+        self.budget.deposit()
+
+        delay = self.hedge_delay()
+        start = time.monotonic()
+        primary = asyncio.ensure_future(self._timed(call))
+        tasks = [primary]
+        try:
+            if delay is None:
+                return await primary
+
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result()
+
+            if not self.budget.withdraw():
+                self.stats["budget_exhausted"] += 1
+                return await primary
+
+            self.stats["hedges_fired"] += 1
+            hedge = asyncio.ensure_future(self._timed(call))
+            tasks.append(hedge)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.stats["hedges_won"] += 1
+                        return task.result()
+            # Both requests failed: surface the primary's error
+            return primary.result()
+        finally:
+            if not primary.done():
+                # The primary took at least this long; the hedge started later and says less
+                self.tracker.record(time.monotonic() - start)
+            # Cancel the loser, or both requests if the caller was cancelled
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def get_summary(self) -> Dict[str, Any]:
+        """Get hedging counters and the current hedge delay"""
+        delay = self.hedge_delay()
+        fired = self.stats["hedges_fired"]
+        return {
+            **self.stats,
+            "win_rate": (self.stats["hedges_won"] / fired * 100) if fired else 0,
+            "hedge_delay_ms": round(delay * 1000, 2) if delay is not None else None,
+            "percentile": self.percentile,
+            "budget_tokens": round(self.budget.tokens, 2)
+        }
@@ -1,5 +1,5 @@
-from fastapi import FastAPI, Request, HTTPException, Depends, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, Response, HTTPException, Depends, BackgroundTasks, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
 import os
@@ -8,16 +8,77 @@ import json
 from typing import Dict, Any, List, Optional
 from gql import gql, Client
 from gql.transport.aiohttp import AIOHTTPTransport
+from gql.transport.exceptions import TransportQueryError
 import jwt
 import time
 import asyncio
 import logging
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 # Import workflow integration
 import workflow_integration
 
 # Import order processing
 import order_routes
+from order_processor import order_processor
+from order_store import MemoryOrderStore, RedisOrderStore, SQLiteOrderStore
+from order_stream import LocalOrderStream, RedisOrderStream
+from payment_gateway import HTTPPaymentGateway, PaymentBatcher
+
+# Import query batching
+import query_batcher
+
+# Import retry policy and circuit breaker
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState, is_retryable, backoff_delay
+
+# Import keyset pagination helpers
+from pagination import ORDERS_ORDER_BY, InvalidCursorError, build_keyset_where, split_page
+from pagination import ORDER_CHANGES_ORDER_BY, encode_change_token, decode_change_token, normalize_since, build_changes_where
+from pagination import changes_horizon
+
+# Import precompiled order queries
+from order_queries import ORDER_FIELDS, InvalidProjectionError, parse_projection, orders_list_query, orders_page_query, project_rows
+from order_queries import INSERT_ORDERS_MUTATION, chunked, orders_changes_query
+
+# Import the orders change feed
+from change_feed import OrderChangeFeed, websocket_url
+
+# Import hedged requests
+from hedging import Hedger, is_read_only
+
+# Import per-request deadlines
+import deadlines
+from deadlines import DeadlineExceeded, DeadlineMiddleware
+
+# Import background dependency probing
+from health_probes import HealthMonitor
+
+# Import read endpoint routing
+from endpoint_router import EndpointRouter
+
+# Import generic GraphQL proxy helpers
+from graphql import OperationType
+from graphql_proxy import InvalidOperationError, select_operation, operation_type, operation_name
+from graphql_proxy import canonical_hash, parse_cache_allowlist, cache_scope
+
+# Import adaptive concurrency limiting
+from concurrency_limiter import AdaptiveLimiter, ConcurrencyLimitExceeded
+
+# Import verified token caching
+from token_cache import VerifiedTokenCache
+
+# Import ASGI authentication middleware
+from auth_middleware import JWTAuthMiddleware
+
+# Import token revocation
+from token_revocation import RevocationList
+
+# Import user accounts and login verification
+from user_store import DEMO_USERS, LoginVerifier, UserStore
+
+# Import request rate limiting
+from rate_limiter import LocalRateLimitBackend, RateLimitMiddleware, RateLimiter, RedisRateLimitBackend, parse_rate_limits
 
 # Import cache monitoring (add proper path if needed)
 try:
@@ -70,11 +131,25 @@ app.include_router(order_routes.router)
 # Hasura GraphQL endpoint - Updated with the correct configuration
 HASURA_ENDPOINT = os.getenv("HASURA_ENDPOINT", "https://moving-firefly-92.hasura.app/v1/graphql")
 HASURA_ADMIN_SECRET = os.getenv("HASURA_ADMIN_SECRET", "sq1AZtO4UgdMRwCZ4F2R00JGLEm2DJhTVKE4Db0jt852Zi2V6ljzMWDZ3HnNL55D")
+HASURA_WS_ENDPOINT = os.getenv("HASURA_WS_ENDPOINT", websocket_url(HASURA_ENDPOINT))
+
+# Orders change feed (subscription-driven cache invalidation)
+ORDERS_CHANGE_FEED_ENABLED = os.getenv("ORDERS_CHANGE_FEED_ENABLED", "false").lower() == "true"
 
 # JWT configuration
 JWT_SECRET = os.getenv("JWT_SECRET", "your-jwt-secret")
 JWT_ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))  # verified tokens kept; 0 disables the cache
+TOKEN_REVOCATION_STREAM = os.getenv("TOKEN_REVOCATION_STREAM", "auth:revoked_tokens")
+TOKEN_REVOCATION_SYNC_INTERVAL = float(os.getenv("TOKEN_REVOCATION_SYNC_INTERVAL", "1"))  # seconds
+
+# Login configuration
+USERS_FILE = os.getenv("USERS_FILE")  # JSON list of users; demo accounts are used when unset
+PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", "600000"))  # for new hashes and unknown users
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+LOGIN_CACHE_TTL = float(os.getenv("LOGIN_CACHE_TTL", "60"))  # seconds a successful login is remembered; 0 disables
+LOGIN_CACHE_SIZE = int(os.getenv("LOGIN_CACHE_SIZE", "10000"))
 
 # Redis configuration
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
@@ -84,9 +159,118 @@ REDIS_EXPIRATION = int(os.getenv("REDIS_EXPIRATION", "3600"))  # 1 hour cache ex
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
 REDIS_SOCKET_TIMEOUT = int(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))  # 5 seconds timeout
 
-# Hasura connection retry parameters
-HASURA_MAX_RETRIES = 3
-HASURA_RETRY_DELAY = 2  # seconds
+# Health probe parameters
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "10"))  # seconds
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "2"))  # seconds
+HEALTH_REQUIRED_DEPENDENCIES = [name.strip() for name in os.getenv("HEALTH_REQUIRED_DEPENDENCIES", "hasura").split(",") if name.strip()]
+
+# Request deadline parameters (seconds)
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "10"))
+REQUEST_DEADLINE_MAX_SECONDS = float(os.getenv("REQUEST_DEADLINE_MAX_SECONDS", "60"))
+REQUEST_DEADLINE_HEADER = "X-Request-Timeout"
+# Routes needing a different budget than the default (a streamed body is budgeted per page, see stream_orders)
+ROUTE_DEADLINES = {
+    "/api/orders/stream": 60,
+    "/api/create-orders": 30
+}
+
+# Hasura connection retry parameters (exponential backoff with full jitter)
+HASURA_MAX_RETRIES = int(os.getenv("HASURA_MAX_RETRIES", "3"))
+HASURA_RETRY_BASE_DELAY = float(os.getenv("HASURA_RETRY_BASE_DELAY", "0.1"))  # seconds
+HASURA_RETRY_MAX_DELAY = float(os.getenv("HASURA_RETRY_MAX_DELAY", "2"))  # seconds
+
+# Hasura circuit breaker parameters
+HASURA_BREAKER_FAILURE_THRESHOLD = int(os.getenv("HASURA_BREAKER_FAILURE_THRESHOLD", "5"))
+HASURA_BREAKER_RESET_TIMEOUT = float(os.getenv("HASURA_BREAKER_RESET_TIMEOUT", "30"))  # seconds
+HASURA_BREAKER_PROBE_TIMEOUT = float(os.getenv("HASURA_BREAKER_PROBE_TIMEOUT", "5"))  # seconds per half-open probe
+HASURA_STALE_CACHE_TTL = int(os.getenv("HASURA_STALE_CACHE_TTL", "86400"))  # stale copies served while Hasura is down
+
+# Orders listing pagination parameters
+ORDERS_MAX_PAGE_SIZE = int(os.getenv("ORDERS_MAX_PAGE_SIZE", "500"))
+ORDERS_STREAM_PAGE_SIZE = int(os.getenv("ORDERS_STREAM_PAGE_SIZE", "500"))
+# Budget per streamed page, so a stream runs as long as it needs to while each page fetch stays bounded
+ORDERS_STREAM_PAGE_DEADLINE_SECONDS = float(os.getenv("ORDERS_STREAM_PAGE_DEADLINE_SECONDS", "30"))
+ORDERS_CHANGES_CACHE_TTL = int(os.getenv("ORDERS_CHANGES_CACHE_TTL", "5"))  # seconds; deltas go stale quickly
+# Deltas leave out changes younger than this, so transactions that commit late are not skipped
+ORDERS_CHANGES_SAFETY_LAG_SECONDS = float(os.getenv("ORDERS_CHANGES_SAFETY_LAG_SECONDS", "5"))
+
+# Bulk order creation parameters
+BULK_ORDER_CHUNK_SIZE = int(os.getenv("BULK_ORDER_CHUNK_SIZE", "100"))
+BULK_ORDER_MAX_ITEMS = int(os.getenv("BULK_ORDER_MAX_ITEMS", "1000"))
+
+# Query batching parameters
+HASURA_BATCHING_ENABLED = os.getenv("HASURA_BATCHING_ENABLED", "false").lower() == "true"
+HASURA_BATCH_WINDOW_MS = float(os.getenv("HASURA_BATCH_WINDOW_MS", "5"))
+HASURA_BATCH_MAX_SIZE = int(os.getenv("HASURA_BATCH_MAX_SIZE", "20"))
+
+# Order insert batching parameters
+ORDER_WRITE_BATCHING_ENABLED = os.getenv("ORDER_WRITE_BATCHING_ENABLED", "false").lower() == "true"
+ORDER_WRITE_BATCH_WINDOW_MS = float(os.getenv("ORDER_WRITE_BATCH_WINDOW_MS", "5"))  # max latency added per insert
+ORDER_WRITE_BATCH_MAX_SIZE = int(os.getenv("ORDER_WRITE_BATCH_MAX_SIZE", "50"))
+
+# Hedged read parameters
+HASURA_HEDGING_ENABLED = os.getenv("HASURA_HEDGING_ENABLED", "false").lower() == "true"
+HASURA_HEDGE_PERCENTILE = float(os.getenv("HASURA_HEDGE_PERCENTILE", "95"))
+HASURA_HEDGE_BUDGET_RATIO = float(os.getenv("HASURA_HEDGE_BUDGET_RATIO", "0.05"))  # max hedges per request
+HASURA_HEDGE_MIN_DELAY_MS = float(os.getenv("HASURA_HEDGE_MIN_DELAY_MS", "10"))
+
+# Read replica routing parameters (comma-separated URLs; empty sends reads to HASURA_ENDPOINT)
+HASURA_READ_ENDPOINTS = [url.strip() for url in os.getenv("HASURA_READ_ENDPOINTS", "").split(",") if url.strip()]
+HASURA_READ_EWMA_ALPHA = float(os.getenv("HASURA_READ_EWMA_ALPHA", "0.3"))
+HASURA_READ_EJECT_AFTER = int(os.getenv("HASURA_READ_EJECT_AFTER", "3"))  # consecutive failures
+HASURA_READ_EJECT_SECONDS = float(os.getenv("HASURA_READ_EJECT_SECONDS", "30"))
+
+# Adaptive concurrency limit for Hasura calls
+HASURA_CONCURRENCY_LIMIT_ENABLED = os.getenv("HASURA_CONCURRENCY_LIMIT_ENABLED", "false").lower() == "true"
+HASURA_CONCURRENCY_INITIAL_LIMIT = int(os.getenv("HASURA_CONCURRENCY_INITIAL_LIMIT", "20"))
+HASURA_CONCURRENCY_MIN_LIMIT = int(os.getenv("HASURA_CONCURRENCY_MIN_LIMIT", "2"))
+HASURA_CONCURRENCY_MAX_LIMIT = int(os.getenv("HASURA_CONCURRENCY_MAX_LIMIT", "200"))
+HASURA_CONCURRENCY_QUEUE_SIZE = int(os.getenv("HASURA_CONCURRENCY_QUEUE_SIZE", "100"))
+HASURA_CONCURRENCY_QUEUE_TIMEOUT_MS = float(os.getenv("HASURA_CONCURRENCY_QUEUE_TIMEOUT_MS", "200"))
+
+# Order processing pipeline (see order_processor.py)
+ORDER_PROCESSOR_WORKERS = int(os.getenv("ORDER_PROCESSOR_WORKERS", "4"))  # orders processed concurrently
+ORDER_PROCESSOR_QUEUE_SIZE = int(os.getenv("ORDER_PROCESSOR_QUEUE_SIZE", "1000"))  # waiting orders before 503
+ORDER_PROCESSOR_CPU_EXECUTOR = os.getenv("ORDER_PROCESSOR_CPU_EXECUTOR", "thread")  # "thread" or "process"
+ORDER_PROCESSOR_CPU_WORKERS = int(os.getenv("ORDER_PROCESSOR_CPU_WORKERS", "2"))
+ORDER_PROCESSOR_DRAIN_SECONDS = float(os.getenv("ORDER_PROCESSOR_DRAIN_SECONDS", "5"))  # on shutdown
+# Shared order intake so any worker process can take an order: "" (this process only), "redis" or "local" (stand-in)
+ORDER_STREAM = os.getenv("ORDER_STREAM", "")
+ORDER_STREAM_KEY = os.getenv("ORDER_STREAM_KEY", "orders:intake")
+ORDER_STREAM_MAX_BACKLOG = int(os.getenv("ORDER_STREAM_MAX_BACKLOG", "10000"))  # unfinished orders before 503
+ORDER_STREAM_CLAIM_IDLE = float(os.getenv("ORDER_STREAM_CLAIM_IDLE", "60"))  # seconds before a dead worker's orders are retaken
+# "memory", "sqlite" or "redis"; orders taken from a Redis stream need the shared Redis store
+ORDER_STORE = os.getenv("ORDER_STORE", "redis" if ORDER_STREAM == "redis" else "memory")
+ORDER_STORE_PATH = os.getenv("ORDER_STORE_PATH", "orders.db")  # SQLite database file
+ORDER_STORE_MAX_FINISHED = int(os.getenv("ORDER_STORE_MAX_FINISHED", "10000"))  # finished orders kept in memory
+ORDER_STORE_FINISHED_TTL = float(os.getenv("ORDER_STORE_FINISHED_TTL", "3600"))  # seconds finished orders are kept
+
+# Payment gateway for the payment stage (see payment_gateway.py); unset simulates payments.
+# Batches only fill when many orders are in the payment stage at once, so raise ORDER_PROCESSOR_WORKERS with it.
+PAYMENT_GATEWAY_URL = os.getenv("PAYMENT_GATEWAY_URL", "")
+PAYMENT_GATEWAY_API_KEY = os.getenv("PAYMENT_GATEWAY_API_KEY", "")
+PAYMENT_GATEWAY_POOL_SIZE = int(os.getenv("PAYMENT_GATEWAY_POOL_SIZE", "10"))  # connections kept to the gateway
+PAYMENT_GATEWAY_TIMEOUT = float(os.getenv("PAYMENT_GATEWAY_TIMEOUT", "10"))  # seconds per batch
+PAYMENT_BATCH_WINDOW_MS = float(os.getenv("PAYMENT_BATCH_WINDOW_MS", "20"))  # wait for more payments after the first
+PAYMENT_BATCH_MAX_SIZE = int(os.getenv("PAYMENT_BATCH_MAX_SIZE", "100"))  # the gateway's per-call limit
+
+# Request rate limits (JSON rules, see rate_limiter.py); backend "local" or "redis"
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "false").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "local")
+RATE_LIMITS = parse_rate_limits(os.getenv("RATE_LIMITS", json.dumps({
+    "/token": {"*": {"rate": "10/minute", "burst": 5}},
+    "/api/orders": {"*": "20/second", "admin": "100/second"},
+    "/api/orders/*": {"*": "20/second", "admin": "100/second"},
+    "/api/create-order": {"*": {"rate": "60/minute", "burst": 10}, "admin": "20/second"},
+    "/api/create-orders": {"*": {"rate": "10/minute", "burst": 2}, "admin": "1/second"},
+    "/api/graphql": {"*": "20/second", "admin": "100/second"},
+    "/orders/*": {"*": {"rate": "60/minute", "burst": 10}}
+})))
+
+# GraphQL proxy cache allow-list (JSON), e.g.
+# {"MyOrders": {"ttl": 60, "tags": ["orders"]},
+#  "Products": {"ttl": 300, "scope": "role", "document": "query Products { products { id name } }"}}
+GRAPHQL_CACHE_ALLOWLIST = parse_cache_allowlist(os.getenv("GRAPHQL_CACHE_ALLOWLIST", "{}"), tag_families=("orders",))
 
 # Setup Redis client
 try:
@@ -118,13 +302,45 @@ except redis.ConnectionError as e:
             logger.debug(f"MockRedis SETEX: {key} (exp: {expiration})")
             pass
             
-        def delete(self, key):
-            logger.debug(f"MockRedis DELETE: {key}")
+        def delete(self, *keys):
+            logger.debug(f"MockRedis DELETE: {keys}")
             pass
             
         def keys(self, pattern):
             logger.debug(f"MockRedis KEYS: {pattern}")
             return []
+        
+        def sadd(self, key, *members):
+            logger.debug(f"MockRedis SADD: {key}")
+            pass
+        
+        def smembers(self, key):
+            logger.debug(f"MockRedis SMEMBERS: {key}")
+            return set()
+        
+        def expire(self, key, expiration):
+            logger.debug(f"MockRedis EXPIRE: {key} (exp: {expiration})")
+            pass
+        
+        def ttl(self, key):
+            logger.debug(f"MockRedis TTL: {key}")
+            return -2
+        
+        def xadd(self, name, fields):
+            logger.debug(f"MockRedis XADD: {name}")
+            pass
+        
+        def xread(self, streams, count=None):
+            logger.debug(f"MockRedis XREAD: {list(streams)}")
+            return []
+        
+        def xtrim(self, name, minid=None, approximate=True):
+            logger.debug(f"MockRedis XTRIM: {name}")
+            pass
+        
+        def ping(self):
+            # Report the fallback as unhealthy so health checks show Redis is missing
+            raise redis.ConnectionError("Redis unavailable, using MockRedis fallback")
     
     redis_client = MockRedis()
     logger.info("Using MockRedis client as fallback")
@@ -147,9 +363,129 @@ except Exception as e:
     logger.error(f"Error initializing GraphQL client: {e}")
     # We'll handle this in the routes
 
+# Clients for read replicas; mutations always go to HASURA_ENDPOINT
+read_clients = {
+    url: Client(transport=AIOHTTPTransport(url=url), fetch_schema_from_transport=False)
+    for url in HASURA_READ_ENDPOINTS
+}
+
+# Persistent GraphQL sessions, opened on startup so requests share one connection pool
+hasura_session = None
+read_sessions = {}
+
+@app.on_event("startup")
+async def connect_hasura():
+    """Open the shared Hasura session"""
+    global hasura_session
+    try:
+        hasura_session = await client.connect_async()
+        logger.info("Hasura GraphQL session opened")
+    except Exception as e:
+        logger.error(f"Error opening Hasura GraphQL session: {e}")
+    
+    for url, read_client in read_clients.items():
+        try:
+            read_sessions[url] = await read_client.connect_async()
+        except Exception as e:
+            logger.error(f"Error opening GraphQL session to read endpoint {url}: {e}")
+
+@app.on_event("shutdown")
+async def disconnect_hasura():
+    """Close the shared Hasura session"""
+    global hasura_session
+    if hasura_session is not None:
+        await client.close_async()
+        hasura_session = None
+    
+    for url in list(read_sessions):
+        await read_clients[url].close_async()
+        del read_sessions[url]
+
 # Hasura helper functions
-async def execute_with_retry(query, variables=None, headers=None, max_retries=HASURA_MAX_RETRIES):
-    """Execute a GraphQL query with retry logic"""
+async def _execute_graphql(query, variables=None, headers=None, endpoint=None):
+    """Send a single GraphQL request with per-request headers
+    
+    `endpoint` selects a read replica; by default the request goes to HASURA_ENDPOINT.
+    """
+    url = endpoint or HASURA_ENDPOINT
+    session = hasura_session if url == HASURA_ENDPOINT else read_sessions.get(url)
+    if session is not None:
+        return await session.execute(
+            query,
+            variable_values=variables,
+            extra_args={"headers": headers}
+        )
+    
+    # No shared session (e.g. startup hooks not run): use a short-lived one
+    one_shot = Client(
+        transport=AIOHTTPTransport(url=url, headers=headers),
+        fetch_schema_from_transport=False
+    )
+    async with one_shot as session:
+        return await session.execute(query, variable_values=variables)
+
+hasura_breaker = CircuitBreaker(
+    "hasura",
+    failure_threshold=HASURA_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=HASURA_BREAKER_RESET_TIMEOUT,
+    probe_timeout=HASURA_BREAKER_PROBE_TIMEOUT
+)
+
+hasura_hedger = Hedger(
+    percentile=HASURA_HEDGE_PERCENTILE,
+    budget_ratio=HASURA_HEDGE_BUDGET_RATIO,
+    min_delay_ms=HASURA_HEDGE_MIN_DELAY_MS
+)
+
+hasura_limiter = AdaptiveLimiter(
+    "hasura",
+    initial_limit=HASURA_CONCURRENCY_INITIAL_LIMIT,
+    min_limit=HASURA_CONCURRENCY_MIN_LIMIT,
+    max_limit=HASURA_CONCURRENCY_MAX_LIMIT,
+    queue_size=HASURA_CONCURRENCY_QUEUE_SIZE,
+    queue_timeout=HASURA_CONCURRENCY_QUEUE_TIMEOUT_MS / 1000
+)
+
+read_router = EndpointRouter(
+    HASURA_READ_ENDPOINTS,
+    alpha=HASURA_READ_EWMA_ALPHA,
+    eject_after=HASURA_READ_EJECT_AFTER,
+    ejection_seconds=HASURA_READ_EJECT_SECONDS
+) if HASURA_READ_ENDPOINTS else None
+
+async def _execute_routed(query, variables=None, headers=None):
+    """Send a read to the read endpoint with the best latency and error record"""
+    endpoint = read_router.choose()
+    read_router.start(endpoint)
+    start = time.perf_counter()
+    try:
+        result = await _execute_graphql(query, variables, headers, endpoint=endpoint.url)
+    except Exception as e:
+        # GraphQL errors mean the endpoint answered; only transport failures count against it
+        read_router.record(endpoint, time.perf_counter() - start, ok=not is_retryable(e))
+        raise
+    except BaseException:
+        # Cancelled, e.g. by a deadline or a winning hedge
+        read_router.release(endpoint)
+        raise
+    read_router.record(endpoint, time.perf_counter() - start, ok=True)
+    return result
+
+async def execute_with_retry(query, variables=None, headers=None, max_retries=HASURA_MAX_RETRIES, hedge=None):
+    """Execute a GraphQL query with retry logic
+    
+    Transient errors are retried with jittered exponential backoff. Calls fail
+    fast with CircuitOpenError while the Hasura circuit breaker is open.
+    Read-only operations are hedged when `hedge` (default HASURA_HEDGING_ENABLED) is set,
+    and are routed across HASURA_READ_ENDPOINTS when read replicas are configured.
+    With HASURA_CONCURRENCY_LIMIT_ENABLED, every call (hedges included) takes a
+    slot from the adaptive limiter and ConcurrencyLimitExceeded is raised when none frees up.
+    """
+    read_only = is_read_only(query)
+    if hedge is None:
+        hedge = HASURA_HEDGING_ENABLED
+    hedge = hedge and read_only
+
     retry_count = 0
     last_error = None
     
@@ -158,29 +494,87 @@ async def execute_with_retry(query, variables=None, headers=None, max_retries=HA
     if headers:
         complete_headers.update(headers)
     
+    if read_router is not None and read_only:
+        # Each attempt picks an endpoint, so retries and hedges move away from a failing replica
+        call = lambda: _execute_routed(query, variables, complete_headers)
+    else:
+        call = lambda: _execute_graphql(query, variables, complete_headers)
+    
+    if HASURA_CONCURRENCY_LIMIT_ENABLED:
+        unlimited = call
+        call = lambda: hasura_limiter.run(unlimited, is_drop=is_retryable)
+    
     while retry_count < max_retries:
+        deadlines.check()
+        if not hasura_breaker.allow_request():
+            if last_error is not None:
+                break
+            raise CircuitOpenError(hasura_breaker.name, hasura_breaker.retry_in())
+        probe = hasura_breaker.state == CircuitState.HALF_OPEN
+        
         try:
-            # Set the headers for this request
-            client.transport.headers = complete_headers
-            
-            # Execute the query
-            result = await client.execute_async(
-                query, 
-                variable_values=variables
-            )
+            # Headers are passed per request; the shared transport is never mutated
+            # Each attempt is bounded by what is left of the request deadline
+            attempt = hasura_hedger.run(call) if hedge else call()
+            if probe:
+                # A hung probe would keep every other caller failing fast
+                attempt = asyncio.wait_for(attempt, hasura_breaker.probe_timeout)
+            result = await deadlines.bounded(attempt)
+            hasura_breaker.record_success()
             return result
+        except DeadlineExceeded:
+            # The caller ran out of time; that says nothing about Hasura's health
+            logger.warning(f"GraphQL execution stopped after {retry_count+1} attempts: request deadline exceeded")
+            raise
+        except ConcurrencyLimitExceeded:
+            # Shed locally before reaching Hasura; retrying would only add load
+            raise
         except Exception as e:
             last_error = e
+            if not is_retryable(e):
+                # Hasura answered, so it is up; the request itself is at fault
+                hasura_breaker.record_success()
+                raise
+            
+            hasura_breaker.record_failure()
             logger.warning(f"GraphQL execution failed (attempt {retry_count+1}/{max_retries}): {e}")
             retry_count += 1
             if retry_count < max_retries:
-                # Wait before retrying
-                await asyncio.sleep(HASURA_RETRY_DELAY)
+                # Wait before retrying, jittered so callers don't retry in waves
+                delay = backoff_delay(retry_count - 1, HASURA_RETRY_BASE_DELAY, HASURA_RETRY_MAX_DELAY)
+                left = deadlines.remaining()
+                if left is not None and delay >= left:
+                    logger.warning(f"GraphQL retry abandoned after {retry_count} attempts: request deadline exceeded")
+                    raise DeadlineExceeded() from e
+                await asyncio.sleep(delay)
+        finally:
+            # A probe that ended without a verdict (deadline, shedding, cancellation) frees the slot
+            if probe and hasura_breaker.state == CircuitState.HALF_OPEN:
+                hasura_breaker.release_probe()
     
     # If we've exhausted all retries
-    logger.error(f"GraphQL execution failed after {max_retries} attempts: {last_error}")
+    logger.error(f"GraphQL execution failed after {retry_count} attempts: {last_error}")
     raise last_error
 
+query_batcher_instance = query_batcher.QueryBatcher(
+    execute_with_retry,
+    window_ms=HASURA_BATCH_WINDOW_MS,
+    max_batch_size=HASURA_BATCH_MAX_SIZE
+)
+
+order_insert_batcher = query_batcher.InsertBatcher(
+    execute_with_retry,
+    INSERT_ORDERS_MUTATION,
+    window_ms=ORDER_WRITE_BATCH_WINDOW_MS,
+    max_batch_size=ORDER_WRITE_BATCH_MAX_SIZE
+)
+
+async def execute_read(query, variables=None, headers=None):
+    """Execute a read-only query, coalescing it with concurrent reads when batching is enabled"""
+    if HASURA_BATCHING_ENABLED:
+        return await query_batcher_instance.load(query, variables, headers)
+    return await execute_with_retry(query, variables, headers)
+
 # OAuth2 setup
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -200,27 +594,74 @@ class TokenData(BaseModel):
 
 class Order(BaseModel):
     details: Dict[str, Any]
+
+class BulkOrderRequest(BaseModel):
+    orders: List[Order]
+
+class RevokeRequest(BaseModel):
+    token: Optional[str] = None
+    jti: Optional[str] = None
+
+class GraphQLRequest(BaseModel):
+    query: str
+    variables: Optional[Dict[str, Any]] = None
+    operationName: Optional[str] = None
     
 class QueryCache(BaseModel):
     key: str
     ttl: int = REDIS_EXPIRATION
 
+# Verified tokens, reused until they expire
+token_cache = VerifiedTokenCache(JWT_SECRET, [JWT_ALGORITHM], max_size=JWT_CACHE_SIZE)
+
+# Revoked token IDs, synced from Redis in the background and checked locally
+token_revocations = RevocationList(
+    redis_client,
+    stream=TOKEN_REVOCATION_STREAM,
+    max_token_lifetime=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    sync_interval=TOKEN_REVOCATION_SYNC_INTERVAL
+)
+
+# User accounts and password verification
+if USERS_FILE:
+    user_store = UserStore.from_file(USERS_FILE)
+else:
+    logger.warning("USERS_FILE is not set; using the demo accounts admin/password and user/password")
+    user_store = UserStore(DEMO_USERS)
+
+login_verifier = LoginVerifier(
+    user_store,
+    workers=PASSWORD_HASH_WORKERS,
+    cache_ttl=LOGIN_CACHE_TTL,
+    cache_size=LOGIN_CACHE_SIZE,
+    iterations=PASSWORD_HASH_ITERATIONS
+)
+
+def verify_token(token: str) -> Dict[str, Any]:
+    """Claims of a valid, unrevoked token; raises jwt.InvalidTokenError otherwise"""
+    claims = token_cache.verify(token)
+    token_revocations.check(claims)
+    return claims
+
 # Authentication functions
 def create_access_token(data: dict, expires_delta: int = ACCESS_TOKEN_EXPIRE_MINUTES):
     to_encode = data.copy()
     expire = time.time() + expires_delta * 60
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        # The JWT middleware has already verified this request's token
+        payload = getattr(request.state, "user", None)
+        if payload is None:
+            payload = verify_token(token)
         user_id: str = payload.get("sub")
         role: str = payload.get("role", "user")
         if user_id is None:
@@ -246,6 +687,7 @@ def get_cache_key(query_name: str, variables: Dict[str, Any] = None, user_id: st
 
 async def get_from_cache(query_name: str, key: str):
     """Get data from Redis cache with tracking"""
+    deadlines.check()
     start_time = time.time()
     try:
         data = redis_client.get(key)
@@ -263,15 +705,74 @@ async def get_from_cache(query_name: str, key: str):
     cache_monitoring.track_cache_miss(query_name)
     return None, False
 
-async def set_in_cache(query_name: str, key: str, data: Any, expiration: int = REDIS_EXPIRATION):
-    """Set data in Redis cache"""
+async def set_in_cache(query_name: str, key: str, data: Any, expiration: int = REDIS_EXPIRATION, tags: List[str] = None):
+    """Set data in Redis cache, optionally registering the key under invalidation tags"""
+    deadlines.check()
     try:
         redis_client.setex(key, expiration, json.dumps(data))
+        for tag in tags or []:
+            tag_key = f"tag:{tag}"
+            redis_client.sadd(tag_key, key)
+            # Only ever extend the tag: it must outlive the longest-lived key registered under it
+            if redis_client.ttl(tag_key) < expiration:
+                redis_client.expire(tag_key, expiration)
         logger.debug(f"Stored in cache: {query_name} (key: {key}, expiration: {expiration}s)")
     except Exception as e:
         logger.error(f"Cache error: {e}")
 
+def orders_cache_tags(role: str, user_id: str) -> List[str]:
+    """Tags for a cached orders listing
+    
+    Listings of the "user" role only contain the viewer's own orders; any other
+    role may see every user's orders, so their listings depend on all changes.
+    """
+    if role == "user":
+        return [f"orders:user:{user_id}"]
+    return ["orders:all"]
+
+def order_change_tags(user_ids) -> List[str]:
+    """Tags invalidated when orders of the given users change"""
+    return [f"orders:user:{user_id}" for user_id in sorted(user_ids)] + ["orders:all"]
+
 # Background tasks
+async def invalidate_cache_tags(tags: List[str]):
+    """Invalidate every cache key registered under the given tags"""
+    try:
+        keys_to_delete = []
+        for tag in tags:
+            tag_key = f"tag:{tag}"
+            keys_to_delete.extend(redis_client.smembers(tag_key))
+            keys_to_delete.append(tag_key)
+        
+        batch_size = 100
+        for i in range(0, len(keys_to_delete), batch_size):
+            redis_client.delete(*keys_to_delete[i:i+batch_size])
+        
+        logger.info(f"Invalidated cache tags {tags} ({len(keys_to_delete) - len(tags)} keys)")
+    except Exception as e:
+        logger.error(f"Error invalidating cache tags {tags}: {e}")
+
+async def invalidate_changed_orders(user_ids):
+    """Change feed handler: drop cached listings affected by changed orders"""
+    await invalidate_cache_tags(order_change_tags(user_ids))
+
+orders_change_feed = OrderChangeFeed(
+    HASURA_WS_ENDPOINT,
+    {"x-hasura-admin-secret": HASURA_ADMIN_SECRET},
+    invalidate_changed_orders
+)
+
+@app.on_event("startup")
+async def start_orders_change_feed():
+    """Start the orders change feed when enabled"""
+    if ORDERS_CHANGE_FEED_ENABLED:
+        orders_change_feed.start()
+
+@app.on_event("shutdown")
+async def stop_orders_change_feed():
+    """Stop the orders change feed"""
+    await orders_change_feed.stop()
+
 async def invalidate_related_caches(pattern: str):
     """Invalidate caches related to specific pattern"""
     try:
@@ -311,62 +812,229 @@ async def invalidate_related_caches(pattern: str):
     except Exception as e:
         logger.error(f"Error invalidating caches: {e}")
 
-@app.middleware("http")
-async def validate_jwt_middleware(request: Request, call_next):
-    """Middleware to validate JWT token and add user info to request state"""
-    # Skip validation for certain paths
-    if request.url.path.startswith("/docs") or request.url.path.startswith("/openapi") or request.url.path == "/token" or request.url.path == "/health":
-        response = await call_next(request)
-        return response
-    
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header.startswith("Bearer "):
-        return JSONResponse(status_code=401, content={"detail": "Authentication token missing"})
-    
-    token = auth_header.replace("Bearer ", "")
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        request.state.user = payload
-    except jwt.InvalidTokenError:
-        return JSONResponse(status_code=401, content={"detail": "Invalid token"})
-    
-    response = await call_next(request)
-    return response
+# Where the order processor takes orders from and keeps them; finished orders are evicted after a while
+if "redis" in (ORDER_STORE, ORDER_STREAM) and not isinstance(redis_client, redis.Redis):
+    logger.warning("Redis is unavailable; orders are queued and stored in this process only")
+    ORDER_STORE, ORDER_STREAM = "memory", ""
+if ORDER_STREAM == "redis":
+    order_processor.stream = RedisOrderStream(redis_client, stream=ORDER_STREAM_KEY, max_backlog=ORDER_STREAM_MAX_BACKLOG)
+elif ORDER_STREAM == "local":
+    order_processor.stream = LocalOrderStream(max_backlog=ORDER_STREAM_MAX_BACKLOG)
+order_processor.claim_idle = ORDER_STREAM_CLAIM_IDLE
+if ORDER_STORE == "redis":
+    order_processor.store = RedisOrderStore(redis_client, finished_ttl=ORDER_STORE_FINISHED_TTL)
+elif ORDER_STORE == "sqlite":
+    order_processor.store = SQLiteOrderStore(ORDER_STORE_PATH, finished_ttl=ORDER_STORE_FINISHED_TTL)
+else:
+    order_processor.store = MemoryOrderStore(max_finished=ORDER_STORE_MAX_FINISHED, finished_ttl=ORDER_STORE_FINISHED_TTL)
+if PAYMENT_GATEWAY_URL:
+    order_processor.payments = PaymentBatcher(
+        HTTPPaymentGateway(PAYMENT_GATEWAY_URL, api_key=PAYMENT_GATEWAY_API_KEY or None, pool_size=PAYMENT_GATEWAY_POOL_SIZE,
+                           timeout=PAYMENT_GATEWAY_TIMEOUT, max_batch_size=PAYMENT_BATCH_MAX_SIZE),
+        window_ms=PAYMENT_BATCH_WINDOW_MS
+    )
+
+# Rate limiting per user, role and route; returns 429 with Retry-After
+rate_limiter = None
+if RATE_LIMIT_ENABLED:
+    if RATE_LIMIT_BACKEND == "redis" and isinstance(redis_client, redis.Redis):
+        rate_limit_backend = RedisRateLimitBackend(redis_client)
+    else:
+        if RATE_LIMIT_BACKEND == "redis":
+            logger.warning("Redis is unavailable; rate limits are kept per process")
+        rate_limit_backend = LocalRateLimitBackend()
+    rate_limiter = RateLimiter(RATE_LIMITS, rate_limit_backend)
+
+# Added before the authentication middleware so it runs inside it and sees the user
+app.add_middleware(RateLimitMiddleware, limiter=lambda: rate_limiter)
+
+# Paths served without a token
+AUTH_EXEMPT_PATHS = ("/token", "/health")
+AUTH_EXEMPT_PREFIXES = ("/docs", "/openapi", "/health/")
+
+# Validate the JWT and add user info to request state, as a plain ASGI middleware
+# so responses (streams included) pass through without extra wrapping
+app.add_middleware(
+    JWTAuthMiddleware,
+    verify=lambda token: verify_token(token),
+    exempt_paths=AUTH_EXEMPT_PATHS,
+    exempt_prefixes=AUTH_EXEMPT_PREFIXES
+)
+
+def request_budget(request: Request) -> float:
+    """Deadline for a request: the route's budget, or the client's header within the maximum"""
+    budget = ROUTE_DEADLINES.get(request.url.path, REQUEST_DEADLINE_SECONDS)
+    requested = request.headers.get(REQUEST_DEADLINE_HEADER)
+    if requested:
+        try:
+            budget = min(max(float(requested), 0.0), REQUEST_DEADLINE_MAX_SECONDS)
+        except ValueError:
+            pass
+    return budget
+
+# Outermost, so the deadline covers authentication, rate limiting and the whole response
+app.add_middleware(DeadlineMiddleware, budget=lambda scope: request_budget(Request(scope)))
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    """Fail requests that ran out of time with a clear timeout status"""
+    logger.warning(f"Request deadline exceeded: {request.method} {request.url.path}")
+    return JSONResponse(status_code=504, content={"detail": "Request deadline exceeded"})
+
+# Dependency probes, run in the background so health endpoints never call dependencies
+HASURA_PROBE_QUERY = gql("query { __typename }")
+
+async def probe_hasura():
+    await _execute_graphql(HASURA_PROBE_QUERY, None, {"x-hasura-admin-secret": HASURA_ADMIN_SECRET})
+
+async def probe_redis():
+    # redis-py is synchronous; keep the ping off the event loop
+    await asyncio.to_thread(redis_client.ping)
+
+health_monitor = HealthMonitor(interval=HEALTH_PROBE_INTERVAL, timeout=HEALTH_PROBE_TIMEOUT)
+health_monitor.register("hasura", probe_hasura, required="hasura" in HEALTH_REQUIRED_DEPENDENCIES)
+health_monitor.register("redis", probe_redis, required="redis" in HEALTH_REQUIRED_DEPENDENCIES)
+health_monitor.register("n8n", workflow_integration.check_n8n_health, required="n8n" in HEALTH_REQUIRED_DEPENDENCIES)
+
+@app.on_event("startup")
+async def start_token_revocations():
+    """Load revoked tokens and keep following new revocations"""
+    token_revocations.start()
+
+@app.on_event("shutdown")
+async def stop_token_revocations():
+    """Stop following token revocations"""
+    await token_revocations.stop()
+
+@app.on_event("startup")
+async def start_order_processor():
+    """Start the order processing workers"""
+    if ORDER_PROCESSOR_CPU_EXECUTOR == "process":
+        order_processor.cpu_executor = ProcessPoolExecutor(max_workers=ORDER_PROCESSOR_CPU_WORKERS)
+    else:
+        order_processor.cpu_executor = ThreadPoolExecutor(max_workers=ORDER_PROCESSOR_CPU_WORKERS, thread_name_prefix="order-cpu")
+    order_processor.start(workers=ORDER_PROCESSOR_WORKERS, queue_size=ORDER_PROCESSOR_QUEUE_SIZE)
+
+@app.on_event("shutdown")
+async def stop_order_processor():
+    """Let queued orders finish, then stop the workers"""
+    await order_processor.stop(drain_timeout=ORDER_PROCESSOR_DRAIN_SECONDS)
+    order_processor.cpu_executor.shutdown(wait=False)
+    order_processor.cpu_executor = None
+    if order_processor.payments is not None:
+        await order_processor.payments.gateway.close()
+
+@app.on_event("shutdown")
+async def stop_login_verifier():
+    """Release the password hashing workers"""
+    login_verifier.shutdown()
+
+@app.on_event("startup")
+async def start_health_monitor():
+    """Start background dependency probing"""
+    health_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_health_monitor():
+    """Stop background dependency probing"""
+    await health_monitor.stop()
 
 # API Routes
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    # Check if Hasura connection is working
-    hasura_status = "healthy"
-    try:
-        # Simple query to test connection
-        query = gql("query { __typename }")
-        await client.execute_async(query)
-    except Exception as e:
-        hasura_status = f"unhealthy: {str(e)}"
+    """Health check endpoint, answered from cached dependency probes"""
+    hasura = health_monitor.results["hasura"]
+    hasura_status = health_monitor.status("hasura")
+    if hasura_status == "unhealthy":
+        hasura_status = f"unhealthy: {hasura['error']}"
     
     return {
         "status": "healthy",
         "hasura": hasura_status,
+        "dependencies": health_monitor.snapshot(),
+        "hasura_circuit": hasura_breaker.get_state(),
+        "read_endpoints": read_router.get_state() if read_router is not None else "disabled",
+        "orders_change_feed": orders_change_feed.get_state() if ORDERS_CHANGE_FEED_ENABLED else "disabled",
         "timestamp": time.time()
     }
 
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive", "timestamp": time.time()}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness probe: every required dependency passed its latest background probe"""
+    ready, failing = health_monitor.is_ready()
+    content = {
+        "status": "ready" if ready else "not_ready",
+        "failing": failing,
+        "timestamp": time.time()
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=content)
+
 @app.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     """Get an authentication token"""
-    # In a real application, you would validate credentials against a database
-    # For this example, we'll accept any username/password and assign a role
-    
-    # Mock user authentication - in real app, validate against database
-    user_id = "12345"  # This would come from your database
-    role = "admin" if form_data.username == "admin" else "user"
+    # Password hashing runs in the login worker pool, not on the event loop
+    user = await login_verifier.authenticate(form_data.username, form_data.password)
+    if user is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
     access_token = create_access_token(
-        data={"sub": user_id, "role": role}
+        data={"sub": user.user_id, "role": user.role}
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
+@app.post("/api/auth/revoke")
+async def revoke_token(request: RevokeRequest, current_user: User = Depends(get_current_user)):
+    """Revoke a token, given as the token itself or its jti (admin only)
+    
+    Revocation takes effect on this instance at once and on the others within
+    TOKEN_REVOCATION_SYNC_INTERVAL seconds.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can revoke tokens")
+    
+    if request.token:
+        try:
+            # Expired tokens can still be revoked; there is just nothing left to block
+            claims = jwt.decode(request.token, JWT_SECRET, algorithms=[JWT_ALGORITHM], options={"verify_exp": False})
+        except jwt.InvalidTokenError:
+            raise HTTPException(status_code=400, detail="Invalid token")
+        jti = claims.get("jti")
+        if jti is None:
+            raise HTTPException(status_code=400, detail="Token has no jti and cannot be revoked")
+        expires_at = claims.get("exp", time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+    elif request.jti:
+        jti = request.jti
+        # Without the token its expiry is unknown; keep the entry for the longest lifetime
+        expires_at = time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    else:
+        raise HTTPException(status_code=400, detail="Pass either token or jti")
+    
+    try:
+        await token_revocations.revoke(jti, expires_at)
+    except Exception as e:
+        logger.error(f"Failed to publish token revocation: {e}")
+        raise HTTPException(status_code=503, detail="Token revoked on this instance only; shared store unavailable")
+    
+    logger.info(f"Token {jti} revoked by {current_user.user_id}")
+    return {"revoked": jti, "expires_at": expires_at}
+
+@app.get("/api/auth/revocations")
+async def revocation_metrics(current_user: User = Depends(get_current_user)):
+    """Get the local revocation list size and sync state (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view token revocations")
+    
+    return token_revocations.get_state()
+
 @app.post("/api/create-order")
 async def create_order(order: Order, background_tasks: BackgroundTasks, current_user: User = Depends(get_current_user)):
     """Create a new order in Hasura"""
@@ -405,16 +1073,22 @@ async def create_order(order: Order, background_tasks: BackgroundTasks, current_
         try:
             # Use our utility function with retry logic
             start_time = time.time()
-            result = await execute_with_retry(mutation, variables, headers)
+            if ORDER_WRITE_BATCHING_ENABLED:
+                # Share a multi-row insert with concurrent orders of the same user and role
+                row = await order_insert_batcher.insert(variables["input"], headers)
+                result = {"insert_orders_one": row}
+            else:
+                result = await execute_with_retry(mutation, variables, headers)
             query_time_ms = (time.time() - start_time) * 1000
             logger.debug(f"Mutation execution time: {query_time_ms:.2f}ms")
             
-            # Schedule cache invalidation
-            cache_pattern = f"get_orders:*:{user_id}"
-            background_tasks.add_task(invalidate_related_caches, cache_pattern)
+            # Schedule cache invalidation of every listing that can contain this order
+            background_tasks.add_task(deadlines.detached(invalidate_cache_tags), order_change_tags([user_id]))
             
             logger.info(f"Order created successfully: {result}")
             return result
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Failed to create order: {str(e)}")
             # For demo purposes, return mock data if Hasura is unavailable
@@ -425,20 +1099,150 @@ async def create_order(order: Order, background_tasks: BackgroundTasks, current_
                     "created_at": "2023-07-21T12:34:56"
                 }
             }
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         logger.error(f"Order creation error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/create-orders")
+async def create_orders_bulk(request: BulkOrderRequest, background_tasks: BackgroundTasks, current_user: User = Depends(get_current_user)):
+    """Create many orders with multi-row insert mutations
+    
+    Orders are written in chunks of BULK_ORDER_CHUNK_SIZE, one mutation per chunk.
+    A chunk succeeds or fails as a whole; results are reported per input item.
+    """
+    if not request.orders:
+        raise HTTPException(status_code=400, detail="No orders provided")
+    if len(request.orders) > BULK_ORDER_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_ORDER_MAX_ITEMS} orders per request")
+    
+    role = current_user.role
+    user_id = current_user.user_id
+    headers = {
+        "x-hasura-role": role,
+        "x-hasura-user-id": user_id
+    }
+    
+    logger.info(f"Creating {len(request.orders)} orders with user_id: {user_id}, role: {role}")
+    
+    results = []
+    index = 0
+    for chunk in chunked(request.orders, BULK_ORDER_CHUNK_SIZE):
+        objects = [{"user_id": user_id, "details": order.details} for order in chunk]
+        try:
+            result = await execute_with_retry(INSERT_ORDERS_MUTATION, {"objects": objects}, headers)
+            rows = result["insert_orders"]["returning"]
+            # Rows are matched to input items by position, which only holds if every one came back
+            if len(rows) != len(chunk):
+                raise RuntimeError(f"Expected {len(chunk)} inserted rows, got {len(rows)}")
+            for row in rows:
+                results.append({"index": index, "success": True, "order": row})
+                index += 1
+        except DeadlineExceeded as e:
+            # Out of time: report this and every later chunk as not written
+            logger.warning(f"Bulk order creation stopped at index {index}: {e}")
+            for _ in range(len(request.orders) - index):
+                results.append({"index": index, "success": False, "error": str(e)})
+                index += 1
+            break
+        except Exception as e:
+            logger.error(f"Failed to create order chunk at index {index}: {str(e)}")
+            for _ in chunk:
+                results.append({"index": index, "success": False, "error": str(e)})
+                index += 1
+    
+    created = sum(1 for item in results if item["success"])
+    if created:
+        # One invalidation for every user whose listings gained orders
+        background_tasks.add_task(deadlines.detached(invalidate_cache_tags), order_change_tags({user_id}))
+    
+    return {
+        "created": created,
+        "failed": len(results) - created,
+        "results": results
+    }
+
+async def fetch_orders_page(headers: Dict[str, str], limit: int, cursor: Optional[str] = None,
+                            projection: tuple = ORDER_FIELDS):
+    """Fetch one keyset page of orders, returning the rows and the next cursor"""
+    variables = {
+        "where": build_keyset_where(cursor),
+        "order_by": ORDERS_ORDER_BY,
+        # One extra row tells us whether another page exists
+        "limit": limit + 1
+    }
+    result = await execute_read(orders_page_query(projection), variables, headers)
+    rows, next_cursor = split_page(result.get("orders") or [], limit)
+    return project_rows(rows, projection), next_cursor
+
+def get_projection(fields: Optional[str]) -> tuple:
+    """Parse the requested order fields, rejecting unknown ones"""
+    try:
+        return parse_projection(fields)
+    except InvalidProjectionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def get_orders_page(current_user: User, limit: int, cursor: Optional[str], projection: tuple = ORDER_FIELDS):
+    """Get a cached keyset page of orders"""
+    query_name = "get_orders"
+    user_id = current_user.user_id
+    cache_key = get_cache_key(query_name, {"limit": limit, "cursor": cursor, "fields": list(projection)}, user_id)
+    
+    cached_data, from_cache = await get_from_cache(query_name, cache_key)
+    if from_cache:
+        logger.info(f"Returning cached page for key: {cache_key}")
+        return cached_data
+    
+    headers = {
+        "x-hasura-role": current_user.role,
+        "x-hasura-user-id": user_id
+    }
+    
+    try:
+        rows, next_cursor = await fetch_orders_page(headers, limit, cursor, projection)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to fetch orders page: {str(e)}")
+        stale_data, has_stale = await get_from_cache(f"{query_name}_stale", f"stale:{cache_key}")
+        if has_stale:
+            logger.info(f"Returning stale cached page for key: {cache_key}")
+            return stale_data
+        raise HTTPException(status_code=503, detail="Orders are temporarily unavailable")
+    
+    page = {"orders": rows, "next_cursor": next_cursor}
+    await set_in_cache(query_name, cache_key, page, tags=orders_cache_tags(current_user.role, user_id))
+    await set_in_cache(query_name, f"stale:{cache_key}", page, HASURA_STALE_CACHE_TTL)
+    return page
+
 @app.get("/api/orders")
-async def get_orders(current_user: User = Depends(get_current_user)):
-    """Get orders with role-based filtering"""
+async def get_orders(
+    limit: Optional[int] = Query(None, ge=1, le=ORDERS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Get orders with role-based filtering
+    
+    Pass `limit` (and the `next_cursor` of the previous page as `cursor`) to page
+    through orders newest first. Without either, the full list is returned.
+    `fields` is an optional comma-separated subset of order fields to return.
+    """
+    projection = get_projection(fields)
+    if limit is not None or cursor is not None:
+        return await get_orders_page(current_user, limit or ORDERS_MAX_PAGE_SIZE, cursor, projection)
+    
     try:
         role = current_user.role
         user_id = current_user.user_id
         query_name = "get_orders"
         
-        # Generate cache key
-        cache_key = get_cache_key(query_name, None, user_id)
+        # Generate cache key; the default projection keeps the original key
+        variables = None if projection == ORDER_FIELDS else {"fields": list(projection)}
+        cache_key = get_cache_key(query_name, variables, user_id)
         
         # Try to get from cache first
         cached_data, from_cache = await get_from_cache(query_name, cache_key)
@@ -447,17 +1251,7 @@ async def get_orders(current_user: User = Depends(get_current_user)):
             return cached_data
         
         # If not in cache, fetch from Hasura
-        query = gql('''
-            query GetOrders {
-                orders {
-                    id
-                    status
-                    user_id
-                    details
-                    created_at
-                }
-            }
-        ''')
+        query = orders_list_query(projection)
         
         headers = {
             "x-hasura-role": role,
@@ -469,33 +1263,222 @@ async def get_orders(current_user: User = Depends(get_current_user)):
         try:
             # Use our utility function with retry logic
             start_time = time.time()
-            result = await execute_with_retry(query, None, headers)
+            result = await execute_read(query, None, headers)
             query_time_ms = (time.time() - start_time) * 1000
             logger.debug(f"Query execution time: {query_time_ms:.2f}ms")
             
-            # Store in cache for future requests
-            await set_in_cache(query_name, cache_key, result)
+            # Store in cache for future requests, plus a long-lived stale copy for outages
+            await set_in_cache(query_name, cache_key, result, tags=orders_cache_tags(role, user_id))
+            await set_in_cache(query_name, f"stale:{cache_key}", result, HASURA_STALE_CACHE_TTL)
             
             logger.info(f"Orders fetched successfully")
             return result
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Failed to fetch orders: {str(e)}")
+            
+            # Serve the last known result while Hasura is unavailable
+            stale_data, has_stale = await get_from_cache(f"{query_name}_stale", f"stale:{cache_key}")
+            if has_stale:
+                logger.info(f"Returning stale cached data for key: {cache_key}")
+                return stale_data
+            
             # For demo purposes, return mock data if Hasura is unavailable
+            mock_order = {
+                "id": "123e4567-e89b-12d3-a456-426614174000",
+                "status": "created",
+                "user_id": current_user.user_id,
+                "details": {"product_id": "123", "quantity": 1},
+                "created_at": "2023-07-21T12:34:56"
+            }
             return {
-                "orders": [
-                    {
-                        "id": "123e4567-e89b-12d3-a456-426614174000",
-                        "status": "created",
-                        "user_id": current_user.user_id,
-                        "details": {"product_id": "123", "quantity": 1},
-                        "created_at": "2023-07-21T12:34:56"
-                    }
-                ]
+                "orders": [{field: mock_order[field] for field in projection}]
             }
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         logger.error(f"Order retrieval error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def stream_orders(headers: Dict[str, str], page_size: int, projection: tuple = ORDER_FIELDS,
+                        page_deadline: Optional[float] = None):
+    """Page through Hasura and yield the orders listing as JSON chunks
+    
+    Only one page is held in memory at a time. If Hasura fails mid-stream the
+    document is closed with an "error" member, since the status is already sent.
+    Each page fetch gets `page_deadline` seconds instead of sharing the
+    request's budget, which would cut off large listings.
+    """
+    yield '{"orders":['
+    cursor = None
+    first = True
+    try:
+        while True:
+            token = deadlines.set_deadline(page_deadline)
+            try:
+                rows, cursor = await fetch_orders_page(headers, page_size, cursor, projection)
+            finally:
+                deadlines.reset_deadline(token)
+            for row in rows:
+                yield ("" if first else ",") + json.dumps(row)
+                first = False
+            if cursor is None:
+                break
+    except Exception as e:
+        logger.error(f"Order stream interrupted: {e}")
+        yield '],"error":' + json.dumps("Order stream interrupted") + '}'
+        return
+    yield ']}'
+
+@app.get("/api/orders/stream")
+async def get_orders_stream(fields: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    """Stream all visible orders as JSON with flat memory use"""
+    projection = get_projection(fields)
+    headers = {
+        "x-hasura-role": current_user.role,
+        "x-hasura-user-id": current_user.user_id
+    }
+    logger.info(f"Streaming orders for user_id: {current_user.user_id}, role: {current_user.role}")
+    return StreamingResponse(
+        stream_orders(headers, ORDERS_STREAM_PAGE_SIZE, projection, page_deadline=ORDERS_STREAM_PAGE_DEADLINE_SECONDS),
+        media_type="application/json"
+    )
+
+async def fetch_order_changes(headers: Dict[str, str], limit: int, position: tuple, projection: tuple = ORDER_FIELDS):
+    """Fetch up to `limit` orders changed after `position`, oldest change first
+    
+    Changes younger than ORDERS_CHANGES_SAFETY_LAG_SECONDS are left for a later
+    delta, so the token never moves past a change that is still being committed.
+    """
+    updated_at, row_id = position
+    variables = {
+        "where": build_changes_where(updated_at, row_id, changes_horizon(ORDERS_CHANGES_SAFETY_LAG_SECONDS)),
+        "order_by": ORDER_CHANGES_ORDER_BY,
+        "limit": limit + 1
+    }
+    result = await execute_read(orders_changes_query(projection), variables, headers)
+    rows = result.get("orders") or []
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    if rows:
+        next_token = encode_change_token(rows[-1]["updated_at"], rows[-1]["id"])
+    elif updated_at is not None:
+        # Nothing new: the client keeps its position
+        next_token = encode_change_token(updated_at, row_id)
+    else:
+        next_token = None
+    return {"orders": rows, "next_token": next_token, "has_more": has_more}
+
+@app.get("/api/orders/changes")
+async def get_order_changes(
+    since: Optional[str] = None,
+    token: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=ORDERS_MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Get orders created or updated after `since` (ISO 8601) or a change `token`
+    
+    Returns the changed orders oldest first with a `next_token` to pass on the
+    next refresh; `has_more` means further changes are waiting right away.
+    Changes show up ORDERS_CHANGES_SAFETY_LAG_SECONDS after they are made.
+    Without either parameter, changes are replayed from the beginning.
+    """
+    if since and token:
+        raise HTTPException(status_code=400, detail="Pass either since or token, not both")
+    projection = get_projection(fields)
+    try:
+        if token:
+            position = decode_change_token(token)
+        else:
+            position = (normalize_since(since) if since else None, None)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    limit = limit or ORDERS_MAX_PAGE_SIZE
+    query_name = "get_order_changes"
+    user_id = current_user.user_id
+    cache_key = get_cache_key(query_name, {"position": list(position), "limit": limit, "fields": list(projection)}, user_id)
+    
+    cached_data, from_cache = await get_from_cache(query_name, cache_key)
+    if from_cache:
+        return cached_data
+    
+    headers = {
+        "x-hasura-role": current_user.role,
+        "x-hasura-user-id": user_id
+    }
+    
+    try:
+        delta = await fetch_order_changes(headers, limit, position, projection)
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to fetch order changes: {str(e)}")
+        raise HTTPException(status_code=503, detail="Order changes are temporarily unavailable")
+    
+    # Repeated polls from the same position hit a short-lived copy; tags drop it on any change
+    await set_in_cache(query_name, cache_key, delta, ORDERS_CHANGES_CACHE_TTL, tags=orders_cache_tags(current_user.role, user_id))
+    return delta
+
+@app.post("/api/graphql")
+async def graphql_proxy(request: GraphQLRequest, response: Response, current_user: User = Depends(get_current_user)):
+    """Forward a GraphQL operation to Hasura with the caller's role
+    
+    Queries named in GRAPHQL_CACHE_ALLOWLIST are cached under a hash of their
+    canonical form and variables, scoped to the caller's role (and user unless
+    the entry says "scope": "role" and the document is the one registered for
+    it). Everything else is passed through uncached.
+    """
+    try:
+        document = select_operation(request.query, request.operationName)
+    except InvalidOperationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    kind = operation_type(document)
+    if kind == OperationType.SUBSCRIPTION:
+        raise HTTPException(status_code=400, detail="Subscriptions are not supported")
+    
+    role = current_user.role
+    user_id = current_user.user_id
+    name = operation_name(document)
+    policy = GRAPHQL_CACHE_ALLOWLIST.get(name) if kind == OperationType.QUERY and name else None
+    query_name = f"graphql:{name}"
+    
+    if policy:
+        cache_key = f"{query_name}:{cache_scope(policy, role, user_id, document)}:{canonical_hash(document, request.variables)}"
+        cached_data, from_cache = await get_from_cache(query_name, cache_key)
+        if from_cache:
+            response.headers["X-Cache"] = "HIT"
+            return {"data": cached_data}
+    
+    headers = {
+        "x-hasura-role": role,
+        "x-hasura-user-id": user_id
+    }
+    
+    try:
+        if kind == OperationType.QUERY:
+            result = await execute_read(document, request.variables, headers)
+        else:
+            result = await execute_with_retry(document, request.variables, headers)
+    except TransportQueryError as e:
+        # GraphQL errors are the client's to handle; pass them through unchanged
+        return {"data": e.data, "errors": e.errors}
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"GraphQL proxy request failed: {str(e)}")
+        raise HTTPException(status_code=503, detail="Hasura is temporarily unavailable")
+    
+    if policy:
+        tags = orders_cache_tags(role, user_id) if "orders" in policy["tags"] else []
+        await set_in_cache(query_name, cache_key, result, policy["ttl"], tags=tags)
+        response.headers["X-Cache"] = "MISS"
+    return {"data": result}
+
 @app.get("/api/user/profile")
 async def get_user_profile(current_user: User = Depends(get_current_user)):
     """Get user profile information"""
@@ -547,6 +1530,67 @@ async def reset_metrics(current_user: User = Depends(get_current_user)):
     cache_monitoring.reset_metrics()
     return {"status": "success", "message": "Cache metrics reset successfully"}
 
+# Query batching endpoints
+@app.get("/api/hasura/batching/metrics")
+async def batching_metrics(current_user: User = Depends(get_current_user)):
+    """Get query batching metrics including the batch-size distribution (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view batching metrics")
+    
+    summary = query_batcher.get_summary()
+    summary["enabled"] = HASURA_BATCHING_ENABLED
+    return summary
+
+@app.get("/api/hasura/hedging/metrics")
+async def hedging_metrics(current_user: User = Depends(get_current_user)):
+    """Get hedged request counters (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view hedging metrics")
+    
+    summary = hasura_hedger.get_summary()
+    summary["enabled"] = HASURA_HEDGING_ENABLED
+    return summary
+
+@app.get("/api/hasura/concurrency/metrics")
+async def concurrency_metrics(current_user: User = Depends(get_current_user)):
+    """Get the adaptive Hasura concurrency limit, queue depth and rejections (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view concurrency metrics")
+    
+    state = hasura_limiter.get_state()
+    state["enabled"] = HASURA_CONCURRENCY_LIMIT_ENABLED
+    return state
+
+@app.get("/api/order-processor/metrics")
+async def order_processor_metrics(current_user: User = Depends(get_current_user)):
+    """Get order queue depth, worker count and processed order counts (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view order processor metrics")
+    
+    return order_processor.get_state()
+
+@app.get("/api/rate-limits")
+async def get_rate_limits(current_user: User = Depends(get_current_user)):
+    """Get rate limit rules and allowed/limited counts (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view rate limits")
+    
+    if rate_limiter is None:
+        return {"enabled": False}
+    return {"enabled": True, **rate_limiter.get_state()}
+
+@app.get("/api/hasura/read-endpoints")
+async def read_endpoint_metrics(current_user: User = Depends(get_current_user)):
+    """Get latency, error rate and ejection state of each read endpoint (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view read endpoint metrics")
+    
+    return {
+        "enabled": read_router is not None,
+        "primary": HASURA_ENDPOINT,
+        "endpoints": read_router.get_state() if read_router is not None else []
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
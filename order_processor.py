@@ -1,10 +1,19 @@
+import asyncio
 import logging
 import json
+import os
+import socket
 import time
 import uuid
-from typing import Dict, Any, Optional
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional
 from enum import Enum
 
+from deadlines import detached
+from order_store import OrderStore, MemoryOrderStore
+from order_stream import OrderQueueFull, OrderStream
+from payment_gateway import PaymentBatcher
+
 # Setup logging
 logger = logging.getLogger("order-processor")
 
@@ -15,37 +24,233 @@ class OrderStatus(str, Enum):
     FAILED = "failed"
     CANCELLED = "cancelled"
 
+# Simulated time spent in each stage, in seconds
+DEFAULT_STAGE_DELAYS = {"validate": 0.5, "payment": 1.0, "finalize": 0.5}
+
 class OrderProcessor:
-    """Handles order processing workflow"""
+    """Handles order processing workflow
+    
+    Orders are submitted to a bounded queue and processed by a fixed number of
+    worker tasks. Stages only await, so processing never blocks the event loop;
+    CPU-bound checks registered with add_cpu_hook run in `cpu_executor`.
+    
+    With a shared `stream`, submitted orders are published to it instead and
+    every process's workers take orders from it as they become idle; the
+    store must then be shared too (e.g. RedisOrderStore).
+
+    With `payments` set, the payment stage authorizes each order's total
+    through that PaymentBatcher instead of simulating the gateway.
+    """
     
-    def __init__(self):
-        """Initialize the order processor"""
-        self.orders = {}
+    def __init__(self, workers: int = 4, queue_size: int = 1000, stage_delays: Optional[Dict[str, float]] = None,
+                 cpu_executor: Optional[Executor] = None, store: Optional[OrderStore] = None,
+                 stream: Optional[OrderStream] = None, consumer: Optional[str] = None,
+                 claim_idle: float = 60, read_block_ms: int = 1000, payments: Optional[PaymentBatcher] = None):
+        """Initialize the order processor
+        
+        Args:
+            workers: Worker tasks processing orders concurrently
+            queue_size: Orders waiting for a worker before submit() refuses more
+            stage_delays: Simulated seconds spent in each stage
+            cpu_executor: Where CPU-bound hooks run; a small thread pool by default
+            store: Where orders and their status history are kept; in memory by default
+            stream: Shared intake stream; None queues orders in this process only
+            consumer: This process's name in the stream's consumer group
+            claim_idle: Seconds before orders left unacknowledged by another consumer are taken over
+            read_block_ms: Longest wait for new orders in one stream read
+            payments: Batches payment authorizations to a gateway; None simulates the payment stage
+        """
+        self.store = store if store is not None else MemoryOrderStore()
+        self.workers = workers
+        self.queue_size = queue_size
+        self.stage_delays = {**DEFAULT_STAGE_DELAYS, **(stage_delays or {})}
+        self.cpu_executor = cpu_executor
+        self.cpu_hooks: Dict[str, List[Callable[[str, Dict[str, Any]], None]]] = {stage: [] for stage in DEFAULT_STAGE_DELAYS}
+        self.stream = stream
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.claim_idle = claim_idle
+        self.read_block_ms = read_block_ms
+        self.payments = payments
+        self.queue: Optional[asyncio.Queue] = None
+        self._idle = 0
+        self._room: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {"submitted": 0, "rejected": 0, "completed": 0, "failed": 0, "in_progress": 0}
         logger.info("Order processor initialized")
     
-    async def process_order(self, order_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Process an order through the workflow"""
+    @property
+    def orders(self) -> OrderStore:
+        return self.store
+    
+    def start(self, workers: Optional[int] = None, queue_size: Optional[int] = None) -> None:
+        """Create the queue and start the worker tasks on the running loop"""
+        if workers is not None:
+            self.workers = workers
+        if queue_size is not None:
+            self.queue_size = queue_size
+        self._loop = asyncio.get_running_loop()
+        # With a stream, orders wait there and are only taken when a worker is idle
+        self.queue = asyncio.Queue(maxsize=self.workers if self.stream is not None else self.queue_size)
+        self._idle = self.workers
+        self._room = asyncio.Event()
+        # Workers outlive the request that may have started them, so they run without its deadline
+        self._tasks = [self._loop.create_task(detached(self._worker)()) for _ in range(self.workers)]
+        if self.stream is not None:
+            self._tasks.append(self._loop.create_task(detached(self._intake)()))
+        logger.info(f"Order processor started {self.workers} workers")
+    
+    async def stop(self, drain_timeout: float = 0) -> None:
+        """Stop the workers, first giving queued orders up to `drain_timeout` seconds to finish"""
+        if self.queue is not None and drain_timeout > 0:
+            try:
+                await asyncio.wait_for(self.queue.join(), drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Order processor stopped with {self.queue.qsize()} orders still queued")
+        for task in self._tasks:
+            task.cancel()
+        if self._loop is asyncio.get_running_loop():
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.queue = None
+    
+    def _ensure_started(self) -> None:
+        # Started lazily when the app's startup hook did not run (or ran on another loop)
+        if self.queue is None or self._loop is not asyncio.get_running_loop():
+            self.start()
+    
+    async def submit(self, order_data: Dict[str, Any]) -> str:
+        """Queue an order for processing and return its ID; raises OrderQueueFull"""
+        self._ensure_started()
+        if self.stream is not None:
+            return await self._publish(order_data)
+        if self.queue.full():
+            self.stats["rejected"] += 1
+            raise OrderQueueFull(f"Order queue is full ({self.queue_size} orders waiting)")
+        order_id = await self._register_order(order_data)
+        try:
+            self.queue.put_nowait((order_id, order_data, None))
+        except asyncio.QueueFull:
+            # Filled up while the order was being stored
+            await self._reject(order_id)
+            raise OrderQueueFull(f"Order queue is full ({self.queue_size} orders waiting)")
+        self.stats["submitted"] += 1
+        return order_id
+    
+    async def _publish(self, order_data: Dict[str, Any]) -> str:
+        # Stored before publishing so whichever worker takes the order finds it
+        order_id = await self._register_order(order_data)
+        try:
+            await self._call(self.stream.publish, order_id, order_data)
+        except OrderQueueFull:
+            await self._reject(order_id)
+            raise
+        self.stats["submitted"] += 1
+        return order_id
+    
+    async def _reject(self, order_id: str) -> None:
+        self.stats["rejected"] += 1
+        await self._update_order_status(order_id, OrderStatus.CANCELLED, "Order queue is full")
+    
+    @staticmethod
+    async def _call(method: Callable, *args) -> Any:
+        """Call a store or stream method, in a thread when its backend does network round trips"""
+        if method.__self__.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+    
+    async def _intake(self) -> None:
+        """Hand orders from the shared stream to this process's idle workers"""
+        last_claim = time.monotonic()
+        while True:
+            while self._idle - self.queue.qsize() <= 0:
+                self._room.clear()
+                await self._room.wait()
+            count = self._idle - self.queue.qsize()
+            try:
+                entries = []
+                if time.monotonic() - last_claim >= self.claim_idle:
+                    last_claim = time.monotonic()
+                    entries = await asyncio.to_thread(self.stream.claim_stale, self.consumer, int(self.claim_idle * 1000), count)
+                if not entries:
+                    entries = await asyncio.to_thread(self.stream.read, self.consumer, count, self.read_block_ms)
+            except Exception as e:
+                logger.warning(f"Reading the order stream failed: {e}")
+                await asyncio.sleep(1)
+                continue
+            for entry_id, order_id, order_data in entries:
+                await self.queue.put((order_id, order_data, entry_id))
+    
+    async def _worker(self) -> None:
+        while True:
+            order_id, order_data, entry_id = await self.queue.get()
+            self._idle -= 1
+            try:
+                await self._run_stages(order_id, order_data)
+            except Exception as e:
+                logger.error(f"Unexpected error processing order {order_id}: {e}")
+            finally:
+                if entry_id is not None:
+                    try:
+                        await self._call(self.stream.ack, entry_id)
+                    except Exception as e:
+                        logger.error(f"Could not acknowledge order {order_id}: {e}")
+                self._idle += 1
+                self._room.set()
+                self.queue.task_done()
+    
+    def add_cpu_hook(self, stage: str, hook: Callable[[str, Dict[str, Any]], None]) -> None:
+        """Run a CPU-bound check in the CPU executor during a stage; raising fails the order
+        
+        With a process pool, hooks must be picklable (module-level functions).
+        """
+        self.cpu_hooks[stage].append(hook)
+    
+    async def run_cpu(self, func: Callable, *args) -> Any:
+        """Run a CPU-bound function off the event loop"""
+        if self.cpu_executor is None:
+            self.cpu_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="order-cpu")
+        return await asyncio.get_running_loop().run_in_executor(self.cpu_executor, func, *args)
+    
+    async def _stage(self, stage: str, order_id: str, order_data: Dict[str, Any]) -> None:
+        """Run a stage's CPU hooks, then wait out its simulated latency"""
+        for hook in self.cpu_hooks[stage]:
+            await self.run_cpu(hook, order_id, order_data)
+        await asyncio.sleep(self.stage_delays[stage])
+    
+    def get_state(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._tasks),
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "queue_size": self.queue_size,
+            **self.stats,
+            **self.store.get_state(),
+            **(self.stream.get_state() if self.stream is not None else {}),
+            **({"payments": self.payments.get_state()} if self.payments is not None else {})
+        }
+    
+    async def _register_order(self, order_data: Dict[str, Any]) -> str:
+        """Store a new order as pending and return its ID"""
         # Generate an order ID if not provided
-        order_id = order_data.get("order_id", f"ORD-{uuid.uuid4()}")
+        order_id = order_data.get("order_id") or f"ORD-{uuid.uuid4()}"
         
         # Store order with initial status
-        self.orders[order_id] = {
-            "order_id": order_id,
-            "data": order_data,
-            "status": OrderStatus.PENDING,
-            "created_at": time.time(),
-            "updated_at": time.time(),
-            "history": [
-                {"status": OrderStatus.PENDING, "timestamp": time.time(), "message": "Order received"}
-            ]
-        }
+        await self._call(self.store.create, order_id, order_data, OrderStatus.PENDING, time.time(), "Order received")
         
         logger.info(f"Order {order_id} received and added to processing queue")
-        
-        # Process order (simulating async processing)
+        return order_id
+    
+    async def process_order(self, order_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Process an order through the workflow, waiting for the result"""
+        order_id = await self._register_order(order_data)
+        return await self._run_stages(order_id, order_data)
+    
+    async def _run_stages(self, order_id: str, order_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Take a registered order through every stage"""
+        self.stats["in_progress"] += 1
         try:
             # Update status to processing
-            self._update_order_status(order_id, OrderStatus.PROCESSING, "Order processing started")
+            await self._update_order_status(order_id, OrderStatus.PROCESSING, "Order processing started")
             
             # Validate order items
             await self._validate_order_items(order_id, order_data)
@@ -57,9 +262,10 @@ class OrderProcessor:
             await self._finalize_order(order_id, order_data)
             
             # Update status to completed
-            self._update_order_status(order_id, OrderStatus.COMPLETED, "Order completed successfully")
+            await self._update_order_status(order_id, OrderStatus.COMPLETED, "Order completed successfully")
             
             logger.info(f"Order {order_id} processed successfully")
+            self.stats["completed"] += 1
             
             return {
                 "success": True,
@@ -73,7 +279,8 @@ class OrderProcessor:
             logger.error(error_msg)
             
             # Update status to failed
-            self._update_order_status(order_id, OrderStatus.FAILED, error_msg)
+            await self._update_order_status(order_id, OrderStatus.FAILED, error_msg)
+            self.stats["failed"] += 1
             
             return {
                 "success": False,
@@ -81,34 +288,20 @@ class OrderProcessor:
                 "status": OrderStatus.FAILED,
                 "message": error_msg
             }
+        finally:
+            self.stats["in_progress"] -= 1
     
-    def get_order_status(self, order_id: str) -> Optional[Dict[str, Any]]:
+    async def get_order_status(self, order_id: str) -> Optional[Dict[str, Any]]:
         """Get the current status of an order"""
-        order = self.orders.get(order_id)
-        if not order:
-            return None
-        
-        return {
-            "order_id": order_id,
-            "status": order["status"],
-            "created_at": order["created_at"],
-            "updated_at": order["updated_at"],
-            "history": order["history"]
-        }
+        return await self._call(self.store.get, order_id)
     
-    def _update_order_status(self, order_id: str, status: OrderStatus, message: str = "") -> None:
+    async def _update_order_status(self, order_id: str, status: OrderStatus, message: str = "") -> None:
         """Update the status of an order"""
-        if order_id not in self.orders:
+        try:
+            await self._call(self.store.transition, order_id, status, time.time(), message)
+        except KeyError:
             raise ValueError(f"Order {order_id} not found")
         
-        self.orders[order_id]["status"] = status
-        self.orders[order_id]["updated_at"] = time.time()
-        self.orders[order_id]["history"].append({
-            "status": status,
-            "timestamp": time.time(),
-            "message": message
-        })
-        
         logger.info(f"Order {order_id} status updated to {status}: {message}")
     
     async def _validate_order_items(self, order_id: str, order_data: Dict[str, Any]) -> None:
@@ -117,8 +310,7 @@ class OrderProcessor:
         if not items:
             raise ValueError("Order contains no items")
         
-        # Simulate validation
-        time.sleep(0.5)
+        await self._stage("validate", order_id, order_data)
         
         logger.info(f"Order {order_id} items validated: {len(items)} items")
     
@@ -128,15 +320,22 @@ class OrderProcessor:
         if total <= 0:
             raise ValueError("Order total must be greater than zero")
         
-        # Simulate payment processing
-        time.sleep(1)
+        if self.payments is None:
+            await self._stage("payment", order_id, order_data)
+            logger.info(f"Order {order_id} payment processed: ${total}")
+            return
+        
+        for hook in self.cpu_hooks["payment"]:
+            await self.run_cpu(hook, order_id, order_data)
+        result = await self.payments.authorize(order_id, total, order_data.get("currency", "USD"))
+        if not result.approved:
+            raise ValueError(f"Payment declined: {result.error}")
         
-        logger.info(f"Order {order_id} payment processed: ${total}")
+        logger.info(f"Order {order_id} payment authorized: ${total} ({result.authorization_id})")
     
     async def _finalize_order(self, order_id: str, order_data: Dict[str, Any]) -> None:
         """Finalize order after payment"""
-        # Simulate finalization
-        time.sleep(0.5)
+        await self._stage("finalize", order_id, order_data)
         
         logger.info(f"Order {order_id} finalized")
 
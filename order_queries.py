@@ -0,0 +1,106 @@
+"""
+Precompiled GraphQL documents for order listings and inserts.
+
+Callers may ask for a subset of order fields. Listing documents are built only
+from the allow-listed fields below and compiled once per projection.
+"""
+from functools import lru_cache
+from typing import Optional, Tuple, List, Dict, Any
+
+from gql import gql
+
+# Fields clients may request, in the order they are selected
+ORDER_FIELDS = ("id", "status", "user_id", "details", "created_at")
+
+# Fields keyset pagination needs to build the next cursor
+KEYSET_FIELDS = ("id", "created_at")
+
+# Fields every delta sync row carries, so clients can merge it and resume
+CHANGE_FIELDS = ("id", "updated_at")
+
+
+class InvalidProjectionError(ValueError):
+    """Raised when a projection names fields that are not allowed"""
+
+
+def parse_projection(fields: Optional[str]) -> Tuple[str, ...]:
+    """Turn a comma-separated field list into a canonical projection"""
+    if not fields:
+        return ORDER_FIELDS
+
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested.difference(ORDER_FIELDS)
+    if unknown:
+        raise InvalidProjectionError(f"Unknown order fields: {', '.join(sorted(unknown))}")
+    if not requested:
+        raise InvalidProjectionError("At least one order field is required")
+
+    return tuple(field for field in ORDER_FIELDS if field in requested)
+
+
+@lru_cache(maxsize=32)
+def orders_list_query(projection: Tuple[str, ...] = ORDER_FIELDS):
+    """Document listing all visible orders with the given fields"""
+    selection = "\n".join(projection)
+    return gql(f'''
+        query GetOrders {{
+            orders {{
+                {selection}
+            }}
+        }}
+    ''')
+
+
+@lru_cache(maxsize=32)
+def orders_page_query(projection: Tuple[str, ...] = ORDER_FIELDS):
+    """Document fetching one keyset page of orders with the given fields"""
+    selected = projection + tuple(field for field in KEYSET_FIELDS if field not in projection)
+    selection = "\n".join(selected)
+    return gql(f'''
+        query GetOrdersPage($where: orders_bool_exp!, $order_by: [orders_order_by!], $limit: Int!) {{
+            orders(where: $where, order_by: $order_by, limit: $limit) {{
+                {selection}
+            }}
+        }}
+    ''')
+
+
+@lru_cache(maxsize=32)
+def orders_changes_query(projection: Tuple[str, ...] = ORDER_FIELDS):
+    """Document fetching orders changed after a position, oldest change first"""
+    selected = projection + tuple(field for field in CHANGE_FIELDS if field not in projection)
+    selection = "\n".join(selected)
+    return gql(f'''
+        query GetOrderChanges($where: orders_bool_exp!, $order_by: [orders_order_by!], $limit: Int!) {{
+            orders(where: $where, order_by: $order_by, limit: $limit) {{
+                {selection}
+            }}
+        }}
+    ''')
+
+
+def project_rows(rows: List[Dict[str, Any]], projection: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    """Drop fields that were only fetched for pagination"""
+    if all(field in projection for field in KEYSET_FIELDS):
+        return rows
+    return [{field: row.get(field) for field in projection} for row in rows]
+
+
+# Multi-row insert; Hasura returns rows in the order of the input objects
+INSERT_ORDERS_MUTATION = gql('''
+    mutation CreateOrders($objects: [orders_insert_input!]!) {
+        insert_orders(objects: $objects) {
+            affected_rows
+            returning {
+                id
+                status
+                created_at
+            }
+        }
+    }
+''')
+
+
+def chunked(items: List[Any], size: int) -> List[List[Any]]:
+    """Split a list into consecutive chunks of at most `size` items"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
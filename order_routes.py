@@ -3,8 +3,9 @@ from pydantic import BaseModel
 from typing import Dict, Any, List, Optional
 import logging
 import json
-from order_processor import order_processor
+from order_processor import order_processor, OrderQueueFull
 from workflow_integration import trigger_workflow
+from deadlines import detached
 
 # Setup logging
 logger = logging.getLogger("order-routes")
@@ -45,18 +46,24 @@ async def create_order(order: OrderRequest, background_tasks: BackgroundTasks):
             total = sum(item.get("quantity", 0) * item.get("price", 0) for item in order_data.get("items", []))
             order_data["total"] = round(total, 2)
         
-        # Process order in background
-        background_tasks.add_task(order_processor.process_order, order_data)
+        # Queue the order for the processing workers
+        try:
+            order_id = await order_processor.submit(order_data)
+        except OrderQueueFull as e:
+            logger.warning(str(e))
+            raise HTTPException(status_code=503, detail="Order queue is full, try again later", headers={"Retry-After": "1"})
         
         # Try to trigger workflow if available
-        background_tasks.add_task(trigger_workflow, "order-process", order_data)
+        background_tasks.add_task(detached(trigger_workflow), "order-process", order_data)
         
         # Return immediate response
         return OrderResponse(
             success=True,
             message="Order received and processing started",
-            order_id=order_data.get("order_id")
+            order_id=order_id
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating order: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error creating order: {str(e)}")
@@ -64,7 +71,7 @@ async def create_order(order: OrderRequest, background_tasks: BackgroundTasks):
 @router.get("/{order_id}", response_model=OrderResponse)
 async def get_order(order_id: str):
     """Get status of an order"""
-    order_status = order_processor.get_order_status(order_id)
+    order_status = await order_processor.get_order_status(order_id)
     
     if not order_status:
         raise HTTPException(status_code=404, detail=f"Order {order_id} not found")
@@ -79,7 +86,7 @@ async def get_order(order_id: str):
 @router.get("/{order_id}/details")
 async def get_order_details(order_id: str):
     """Get detailed information about an order"""
-    order_status = order_processor.get_order_status(order_id)
+    order_status = await order_processor.get_order_status(order_id)
     
     if not order_status:
         raise HTTPException(status_code=404, detail=f"Order {order_id} not found")
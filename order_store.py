@@ -0,0 +1,401 @@
+"""
+Storage for orders handled by the OrderProcessor.
+
+MemoryOrderStore keeps orders in a dict and evicts finished (completed, failed
+or cancelled) orders once there are more than `max_finished` of them or they
+are older than `finished_ttl` seconds, so a long-running worker does not grow
+without bound. Its records are slotted objects holding the status as an index
+into a table of statuses and the history as a bounded tuple of
+(status, timestamp, message) entries, with recurring messages stored once and
+referenced by index; the submitted payload is released when the order
+finishes. SQLiteOrderStore keeps orders on disk in WAL mode, so they
+survive restarts and are readable by other processes, and prunes finished
+orders by age; its calls wait on disk and are made from worker threads.
+RedisOrderStore keeps orders in Redis, shared by every worker process, and
+lets finished orders expire.
+
+All return orders in the shape of OrderProcessor.get_order_status.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+# Setup logging
+logger = logging.getLogger("order-processor")
+
+FINISHED_STATUSES = frozenset(("completed", "failed", "cancelled"))
+
+
+class OrderStore(ABC):
+    """Interface of an order store"""
+
+    # Whether calls wait on the network or disk, which OrderProcessor keeps off the event loop
+    blocking = False
+
+    @abstractmethod
+    def create(self, order_id: str, data: Dict[str, Any], status: str, timestamp: float, message: str) -> None:
+        """Store a new order with its first status"""
+
+    @abstractmethod
+    def transition(self, order_id: str, status: str, timestamp: float, message: str) -> None:
+        """Move an order to a new status; raises KeyError for unknown orders"""
+
+    @abstractmethod
+    def get(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """Status, timestamps and history of an order, or None"""
+
+    @abstractmethod
+    def get_data(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """The order as submitted, or None (a store may release it once the order finishes)"""
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Drop finished orders past retention; returns how many"""
+        return 0
+
+    def __contains__(self, order_id: str) -> bool:
+        return self.get(order_id) is not None
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of orders stored"""
+
+    def get_state(self) -> Dict[str, Any]:
+        return {"store": type(self).__name__, "orders": len(self)}
+
+
+class OrderRecord:
+    """One order in a MemoryOrderStore"""
+
+    __slots__ = ("data", "status", "created_at", "updated_at", "history")
+
+    def __init__(self, data: Optional[Dict[str, Any]], status: int, created_at: float,
+                 history: Tuple[Tuple[int, float, Union[int, str]], ...]):
+        self.data = data
+        self.status = status
+        self.created_at = created_at
+        self.updated_at = created_at
+        self.history = history
+
+
+class MemoryOrderStore(OrderStore):
+    """Orders in a dict of compact records, with eviction of finished orders by count and age"""
+
+    def __init__(self, max_finished: int = 10000, finished_ttl: Optional[float] = 3600,
+                 history_size: int = 16, max_messages: int = 1024):
+        """Initialize the store
+
+        Args:
+            max_finished: Finished orders kept; the oldest are evicted first
+            finished_ttl: Seconds a finished order is kept; None keeps them until evicted by count
+            history_size: Status changes kept per order; older ones are dropped
+            max_messages: Distinct messages stored once and shared; later new messages are kept per entry
+        """
+        self.orders: Dict[str, OrderRecord] = {}
+        # Finished order IDs in the order they finished
+        self.finished: "deque[str]" = deque()
+        self.max_finished = max_finished
+        self.finished_ttl = finished_ttl
+        self.history_size = history_size
+        self.max_messages = max_messages
+        self.evicted = 0
+        # Status values (e.g. OrderStatus members) by index, and the reverse
+        self.statuses: List[Any] = []
+        self.status_ids: Dict[Any, int] = {}
+        self.messages: List[str] = []
+        self.message_ids: Dict[str, int] = {}
+
+    def _status_id(self, status) -> int:
+        status_id = self.status_ids.get(status)
+        if status_id is None:
+            status_id = self.status_ids[status] = len(self.statuses)
+            self.statuses.append(status)
+        return status_id
+
+    def _message_ref(self, message: str) -> Union[int, str]:
+        message_id = self.message_ids.get(message)
+        if message_id is None:
+            if len(self.messages) >= self.max_messages:
+                return message
+            message_id = self.message_ids[message] = len(self.messages)
+            self.messages.append(message)
+        return message_id
+
+    def create(self, order_id, data, status, timestamp, message):
+        status_id = self._status_id(status)
+        self.orders[order_id] = OrderRecord(data, status_id, timestamp, ((status_id, timestamp, self._message_ref(message)),))
+
+    def transition(self, order_id, status, timestamp, message):
+        order = self.orders[order_id]
+        order.status = status_id = self._status_id(status)
+        order.updated_at = timestamp
+        order.history = (order.history + ((status_id, timestamp, self._message_ref(message)),))[-self.history_size:]
+        if status in FINISHED_STATUSES:
+            # Processing is over; only the status is still served
+            order.data = None
+            self.finished.append(order_id)
+            self.prune(timestamp)
+
+    def get(self, order_id):
+        order = self.orders.get(order_id)
+        if not order:
+            return None
+        statuses, messages = self.statuses, self.messages
+        return {
+            "order_id": order_id,
+            "status": statuses[order.status],
+            "created_at": order.created_at,
+            "updated_at": order.updated_at,
+            "history": [
+                {"status": statuses[status], "timestamp": timestamp,
+                 "message": messages[message] if isinstance(message, int) else message}
+                for status, timestamp, message in order.history
+            ]
+        }
+
+    def get_data(self, order_id):
+        order = self.orders.get(order_id)
+        return order.data if order else None
+
+    def _is_finished(self, order: Optional[OrderRecord]) -> bool:
+        return order is not None and self.statuses[order.status] in FINISHED_STATUSES
+
+    def prune(self, now=None):
+        now = time.time() if now is None else now
+        evicted = 0
+        while self.finished:
+            order = self.orders.get(self.finished[0])
+            if not self._is_finished(order):
+                # Evicted already, or listed twice and since reopened
+                self.finished.popleft()
+                continue
+            expired = self.finished_ttl is not None and now - order.updated_at > self.finished_ttl
+            if len(self.finished) <= self.max_finished and not expired:
+                break
+            del self.orders[self.finished.popleft()]
+            evicted += 1
+        self.evicted += evicted
+        return evicted
+
+    def __len__(self):
+        return len(self.orders)
+
+    def get_state(self):
+        return {**super().get_state(), "finished": len(self.finished), "evicted": self.evicted}
+
+
+class SQLiteOrderStore(OrderStore):
+    """Orders in an SQLite database in WAL mode"""
+
+    blocking = True
+
+    def __init__(self, path: str = "orders.db", finished_ttl: Optional[float] = 7 * 86400, prune_every: int = 1000):
+        """Initialize the store
+
+        Args:
+            path: Database file
+            finished_ttl: Seconds a finished order is kept; None keeps them forever
+            prune_every: Finished orders between prunes
+        """
+        self.path = path
+        self.finished_ttl = finished_ttl
+        self.prune_every = prune_every
+        self._finished_since_prune = 0
+        # Shared by the worker threads calls are made from; the lock keeps one statement
+        # or transaction on the connection at a time
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.RLock()
+        # WAL lets readers in other processes work alongside the writer; with
+        # synchronous=NORMAL a commit does not wait for fsync
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS orders (
+                order_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                finished_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS orders_finished_at ON orders (finished_at) WHERE finished_at IS NOT NULL;
+            CREATE TABLE IF NOT EXISTS order_history (
+                order_id TEXT NOT NULL,
+                timestamp REAL NOT NULL,
+                status TEXT NOT NULL,
+                message TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS order_history_order_id ON order_history (order_id);
+        """)
+
+    def create(self, order_id, data, status, timestamp, message):
+        with self._lock, self.db:
+            self.db.execute("BEGIN")
+            self.db.execute(
+                "INSERT OR REPLACE INTO orders (order_id, data, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (order_id, json.dumps(data), status, timestamp, timestamp)
+            )
+            self.db.execute("DELETE FROM order_history WHERE order_id = ?", (order_id,))
+            self.db.execute("INSERT INTO order_history VALUES (?, ?, ?, ?)", (order_id, timestamp, status, message))
+
+    def transition(self, order_id, status, timestamp, message):
+        finished_at = timestamp if status in FINISHED_STATUSES else None
+        with self._lock:
+            with self.db:
+                self.db.execute("BEGIN")
+                updated = self.db.execute(
+                    "UPDATE orders SET status = ?, updated_at = ?, finished_at = ? WHERE order_id = ?",
+                    (status, timestamp, finished_at, order_id)
+                ).rowcount
+                if not updated:
+                    raise KeyError(order_id)
+                self.db.execute("INSERT INTO order_history VALUES (?, ?, ?, ?)", (order_id, timestamp, status, message))
+            if finished_at is not None:
+                self._finished_since_prune += 1
+                if self._finished_since_prune >= self.prune_every:
+                    self.prune(timestamp)
+
+    def get(self, order_id):
+        with self._lock:
+            row = self.db.execute(
+                "SELECT status, created_at, updated_at FROM orders WHERE order_id = ?", (order_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            history = self.db.execute(
+                "SELECT status, timestamp, message FROM order_history WHERE order_id = ? ORDER BY rowid", (order_id,)
+            ).fetchall()
+        return {
+            "order_id": order_id,
+            "status": row[0],
+            "created_at": row[1],
+            "updated_at": row[2],
+            "history": [{"status": status, "timestamp": timestamp, "message": message}
+                        for status, timestamp, message in history]
+        }
+
+    def get_data(self, order_id):
+        with self._lock:
+            row = self.db.execute("SELECT data FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def prune(self, now=None):
+        self._finished_since_prune = 0
+        if self.finished_ttl is None:
+            return 0
+        cutoff = (time.time() if now is None else now) - self.finished_ttl
+        with self._lock, self.db:
+            self.db.execute("BEGIN")
+            self.db.execute(
+                "DELETE FROM order_history WHERE order_id IN (SELECT order_id FROM orders WHERE finished_at < ?)", (cutoff,)
+            )
+            pruned = self.db.execute("DELETE FROM orders WHERE finished_at < ?", (cutoff,)).rowcount
+        if pruned:
+            logger.info(f"Pruned {pruned} finished orders from {self.path}")
+        return pruned
+
+    def __len__(self):
+        with self._lock:
+            return self.db.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self.db.close()
+
+    def get_state(self):
+        return {**super().get_state(), "path": self.path}
+
+
+# KEYS[1] order hash, KEYS[2] history list; ARGV[1] status, ARGV[2] timestamp,
+# ARGV[3] history entry, ARGV[4] history size, ARGV[5] seconds to keep (0: no expiry)
+TRANSITION_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+redis.call('HSET', KEYS[1], 'status', ARGV[1], 'updated_at', ARGV[2])
+redis.call('RPUSH', KEYS[2], ARGV[3])
+redis.call('LTRIM', KEYS[2], -tonumber(ARGV[4]), -1)
+if tonumber(ARGV[5]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[5])
+    redis.call('EXPIRE', KEYS[2], ARGV[5])
+end
+return 1
+"""
+
+
+def _text(value) -> str:
+    """Plain string for Redis replies and str-based enums such as OrderStatus"""
+    if isinstance(value, bytes):
+        return value.decode()
+    return getattr(value, "value", value)
+
+
+class RedisOrderStore(OrderStore):
+    """Orders in Redis hashes with a capped history list, readable from every worker"""
+
+    blocking = True
+
+    def __init__(self, client, prefix: str = "order:", finished_ttl: Optional[float] = 3600, history_size: int = 16):
+        """Initialize the store
+
+        Args:
+            client: Redis client
+            prefix: Key prefix; an order uses <prefix><id> and <prefix><id>:history
+            finished_ttl: Seconds a finished order is kept; None keeps them forever
+            history_size: Status changes kept per order
+        """
+        self.client = client
+        self.prefix = prefix
+        self.finished_ttl = finished_ttl
+        self.history_size = history_size
+        self._transition = client.register_script(TRANSITION_SCRIPT)
+
+    def _keys(self, order_id: str) -> Tuple[str, str]:
+        key = self.prefix + order_id
+        return key, key + ":history"
+
+    def create(self, order_id, data, status, timestamp, message):
+        key, history = self._keys(order_id)
+        pipe = self.client.pipeline()
+        pipe.delete(history)
+        pipe.hset(key, mapping={"data": json.dumps(data), "status": _text(status),
+                                "created_at": repr(timestamp), "updated_at": repr(timestamp)})
+        pipe.rpush(history, json.dumps([_text(status), timestamp, message]))
+        pipe.execute()
+
+    def transition(self, order_id, status, timestamp, message):
+        ttl = int(self.finished_ttl) if self.finished_ttl and status in FINISHED_STATUSES else 0
+        entry = json.dumps([_text(status), timestamp, message])
+        if not self._transition(keys=list(self._keys(order_id)),
+                                args=[_text(status), repr(timestamp), entry, self.history_size, ttl]):
+            raise KeyError(order_id)
+
+    def get(self, order_id):
+        key, history = self._keys(order_id)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hmget(key, "status", "created_at", "updated_at")
+        pipe.lrange(history, 0, -1)
+        (status, created_at, updated_at), entries = pipe.execute()
+        if status is None:
+            return None
+        return {
+            "order_id": order_id,
+            "status": _text(status),
+            "created_at": float(created_at),
+            "updated_at": float(updated_at),
+            "history": [{"status": status, "timestamp": timestamp, "message": message}
+                        for status, timestamp, message in map(json.loads, entries)]
+        }
+
+    def get_data(self, order_id):
+        data = self.client.hget(self.prefix + order_id, "data")
+        return json.loads(data) if data else None
+
+    def __len__(self):
+        # Walks the keyspace; for diagnostics only
+        return sum(1 for key in self.client.scan_iter(match=self.prefix + "*") if not _text(key).endswith(":history"))
+
+    def get_state(self):
+        return {"store": type(self).__name__, "prefix": self.prefix}
@@ -0,0 +1,175 @@
+"""
+Shared intake stream for orders, consumed by every worker process.
+
+With `uvicorn --workers N` each process has its own OrderProcessor. Publishing
+submitted orders to a stream read through a consumer group lets whichever
+process has a free worker take the next order, so processing scales with the
+number of processes. Entries stay pending until acknowledged; entries left
+pending by a process that died are claimed by another after `idle` time.
+
+RedisOrderStream uses Redis Streams (XADD / XREADGROUP / XACK / XAUTOCLAIM).
+LocalOrderStream is an in-process stand-in with the same semantics for a
+single process, tests and benchmarks.
+"""
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Dict, Any, List, Tuple
+
+# Setup logging
+logger = logging.getLogger("order-processor")
+
+# (entry ID, order ID, order data)
+StreamEntry = Tuple[str, str, Dict[str, Any]]
+
+
+class OrderQueueFull(Exception):
+    """Raised when an order cannot be queued because the queue is full"""
+
+
+class OrderStream(ABC):
+    """Interface of an order intake stream"""
+
+    # Whether publish and ack are network round trips, which OrderProcessor keeps off the event loop
+    blocking = False
+
+    @abstractmethod
+    def publish(self, order_id: str, data: Dict[str, Any]) -> str:
+        """Append an order; raises OrderQueueFull when `max_backlog` orders are unfinished"""
+
+    @abstractmethod
+    def read(self, consumer: str, count: int, block_ms: int) -> List[StreamEntry]:
+        """Take up to `count` new entries for `consumer`, waiting up to `block_ms` (blocking)"""
+
+    @abstractmethod
+    def ack(self, entry_id: str) -> None:
+        """Mark an entry as processed"""
+
+    @abstractmethod
+    def claim_stale(self, consumer: str, idle_ms: int, count: int) -> List[StreamEntry]:
+        """Take over entries another consumer has held unacknowledged for `idle_ms`"""
+
+    def get_state(self) -> Dict[str, Any]:
+        return {"backend": type(self).__name__}
+
+
+class LocalOrderStream(OrderStream):
+    """In-process stand-in for a consumer group on a stream"""
+
+    def __init__(self, max_backlog: int = 10000):
+        self.max_backlog = max_backlog
+        # read() runs in a thread while publish() runs on the event loop
+        self._condition = threading.Condition()
+        self._entries: "deque[StreamEntry]" = deque()
+        # entry ID -> (consumer, delivered at, entry)
+        self._pending: Dict[str, Tuple[str, float, StreamEntry]] = {}
+        self._sequence = 0
+
+    def publish(self, order_id, data):
+        with self._condition:
+            if len(self._entries) + len(self._pending) >= self.max_backlog:
+                raise OrderQueueFull(f"Order queue is full ({self.max_backlog} orders unfinished)")
+            self._sequence += 1
+            entry_id = f"{int(time.time() * 1000)}-{self._sequence}"
+            self._entries.append((entry_id, order_id, data))
+            self._condition.notify()
+            return entry_id
+
+    def read(self, consumer, count, block_ms):
+        deadline = time.monotonic() + block_ms / 1000
+        with self._condition:
+            while not self._entries:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return []
+                self._condition.wait(left)
+            entries = []
+            while self._entries and len(entries) < count:
+                entry = self._entries.popleft()
+                self._pending[entry[0]] = (consumer, time.monotonic(), entry)
+                entries.append(entry)
+            return entries
+
+    def ack(self, entry_id):
+        with self._condition:
+            self._pending.pop(entry_id, None)
+
+    def claim_stale(self, consumer, idle_ms, count):
+        cutoff = time.monotonic() - idle_ms / 1000
+        with self._condition:
+            stale = [entry for owner, delivered_at, entry in self._pending.values() if delivered_at <= cutoff][:count]
+            for entry in stale:
+                self._pending[entry[0]] = (consumer, time.monotonic(), entry)
+            return stale
+
+    def get_state(self):
+        with self._condition:
+            return {**super().get_state(), "waiting": len(self._entries), "pending": len(self._pending)}
+
+
+# KEYS[1] stream; ARGV[1] max backlog, ARGV[2] order ID, ARGV[3] order JSON.
+# Processed entries are deleted on ack, so XLEN counts unfinished orders.
+PUBLISH_SCRIPT = """
+if redis.call('XLEN', KEYS[1]) >= tonumber(ARGV[1]) then return false end
+return redis.call('XADD', KEYS[1], '*', 'order_id', ARGV[2], 'data', ARGV[3])
+"""
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class RedisOrderStream(OrderStream):
+    """Orders in a Redis stream read through a consumer group"""
+
+    blocking = True
+
+    def __init__(self, client, stream: str = "orders:intake", group: str = "order-processors", max_backlog: int = 10000):
+        self.client = client
+        self.stream = stream
+        self.group = group
+        self.max_backlog = max_backlog
+        self._publish = client.register_script(PUBLISH_SCRIPT)
+        try:
+            client.xgroup_create(stream, group, id="0", mkstream=True)
+        except Exception as e:
+            # The group already exists when another worker created it first
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def publish(self, order_id, data):
+        entry_id = self._publish(keys=[self.stream], args=[self.max_backlog, order_id, json.dumps(data)])
+        if not entry_id:
+            raise OrderQueueFull(f"Order queue is full ({self.max_backlog} orders unfinished)")
+        return _text(entry_id)
+
+    @staticmethod
+    def _entries(messages) -> List[StreamEntry]:
+        entries = []
+        for entry_id, fields in messages:
+            if not fields:
+                # Deleted while pending
+                continue
+            fields = {_text(k): _text(v) for k, v in fields.items()}
+            entries.append((_text(entry_id), fields["order_id"], json.loads(fields["data"])))
+        return entries
+
+    def read(self, consumer, count, block_ms):
+        response = self.client.xreadgroup(self.group, consumer, {self.stream: ">"}, count=count, block=block_ms)
+        return self._entries(response[0][1]) if response else []
+
+    def ack(self, entry_id):
+        pipe = self.client.pipeline()
+        pipe.xack(self.stream, self.group, entry_id)
+        pipe.xdel(self.stream, entry_id)
+        pipe.execute()
+
+    def claim_stale(self, consumer, idle_ms, count):
+        response = self.client.xautoclaim(self.stream, self.group, consumer, idle_ms, start_id="0-0", count=count)
+        return self._entries(response[1])
+
+    def get_state(self):
+        return {**super().get_state(), "stream": self.stream, "group": self.group, "unfinished": self.client.xlen(self.stream)}
@@ -0,0 +1,119 @@
+"""
+Keyset pagination helpers for the orders listing.
+
+Orders are ordered by (created_at desc, id desc). A cursor encodes the sort key
+of the last row on a page, so the next page is a range scan on an index over
+(created_at, id) rather than an OFFSET that re-reads every earlier row.
+
+Delta sync works the same way over (updated_at asc, id asc): a change token
+encodes the last change a client has seen, and the next delta is a range scan
+on an index over (updated_at, id). updated_at is set when a transaction starts,
+so a transaction committing late can land behind a token already handed out;
+deltas therefore stop at a horizon a safety lag behind now, and changes are
+only handed out once transactions that started before them have committed.
+"""
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional, Tuple
+
+# Sort order matching the cursor; keep in sync with build_keyset_where
+ORDERS_ORDER_BY = [{"created_at": "desc"}, {"id": "desc"}]
+
+# Order in which changes are replayed; keep in sync with build_changes_where
+ORDER_CHANGES_ORDER_BY = [{"updated_at": "asc"}, {"id": "asc"}]
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Encode the sort key of a row as an opaque cursor"""
+    raw = json.dumps([row["created_at"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Decode a cursor back into its (created_at, id) sort key"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(created_at, str) or not isinstance(row_id, str):
+        raise InvalidCursorError(f"Invalid cursor: {cursor}")
+    return created_at, row_id
+
+
+def build_keyset_where(cursor: Optional[str]) -> Dict[str, Any]:
+    """Build the Hasura filter selecting rows strictly after the cursor"""
+    if not cursor:
+        return {}
+
+    created_at, row_id = decode_cursor(cursor)
+    return {
+        "_or": [
+            {"created_at": {"_lt": created_at}},
+            {"created_at": {"_eq": created_at}, "id": {"_lt": row_id}}
+        ]
+    }
+
+
+def encode_change_token(updated_at: str, row_id: Optional[str] = None) -> str:
+    """Encode the position of the last seen change as an opaque token"""
+    raw = json.dumps([updated_at, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_change_token(token: str) -> Tuple[str, Optional[str]]:
+    """Decode a change token back into its (updated_at, id) position"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        updated_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception as e:
+        raise InvalidCursorError(f"Invalid change token: {token}") from e
+    if not isinstance(updated_at, str) or not isinstance(row_id, (str, type(None))):
+        raise InvalidCursorError(f"Invalid change token: {token}")
+    return updated_at, row_id
+
+
+def normalize_since(since: str) -> str:
+    """Validate an ISO 8601 timestamp and put it in one canonical form"""
+    try:
+        return datetime.fromisoformat(since).isoformat()
+    except ValueError as e:
+        raise InvalidCursorError(f"Invalid timestamp: {since}") from e
+
+
+def changes_horizon(safety_lag: float) -> str:
+    """Newest updated_at a delta may include: changes after it may still have earlier-stamped peers in flight"""
+    return (datetime.now(timezone.utc) - timedelta(seconds=safety_lag)).isoformat()
+
+
+def build_changes_where(updated_at: Optional[str], row_id: Optional[str] = None,
+                        until: Optional[str] = None) -> Dict[str, Any]:
+    """Build the Hasura filter selecting changes strictly after a position, up to `until` when given"""
+    if updated_at is None:
+        after = {}
+    elif row_id is None:
+        after = {"updated_at": {"_gt": updated_at}}
+    else:
+        after = {
+            "_or": [
+                {"updated_at": {"_gt": updated_at}},
+                {"updated_at": {"_eq": updated_at}, "id": {"_gt": row_id}}
+            ]
+        }
+    if until is None:
+        return after
+    settled = {"updated_at": {"_lte": until}}
+    return {"_and": [after, settled]} if after else settled
+
+
+def split_page(rows: list, limit: int) -> Tuple[list, Optional[str]]:
+    """Trim a limit+1 fetch to a page and compute the next cursor"""
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(page[-1])
@@ -0,0 +1,151 @@
+"""
+Batched payment authorization for the order pipeline.
+
+Gateways accept a batch of authorizations per call and charge per call, so
+PaymentBatcher collects the payments of orders that reach the payment stage
+within a short window (or until the gateway's batch limit) and sends them in
+one request over a pooled HTTP client. Declines come back per payment and
+fail only their own order. A batch the gateway rejects as a whole is retried
+payment by payment, so one malformed payment cannot fail the others.
+
+payment_gateway_stand_in.py serves the same API locally for tests and benchmarks.
+"""
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List, NamedTuple, Optional
+
+import aiohttp
+
+from query_batcher import WindowedBatcher, resolve_futures
+
+# Setup logging
+logger = logging.getLogger("order-processor")
+
+
+class PaymentResult(NamedTuple):
+    order_id: str
+    approved: bool
+    authorization_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class PaymentGatewayError(Exception):
+    """The gateway could not process a batch (unreachable, timed out or failing)"""
+
+
+class PaymentBatchRejected(PaymentGatewayError):
+    """The gateway refused a batch as a whole, e.g. because one payment in it is malformed"""
+
+
+class PaymentGateway(ABC):
+    """Interface of a payment gateway"""
+
+    max_batch_size = 100
+
+    @abstractmethod
+    async def authorize(self, payments: List[Dict[str, Any]]) -> List[PaymentResult]:
+        """Authorize payments ({"order_id", "amount", "currency"}); one result per payment"""
+
+    async def close(self) -> None:
+        pass
+
+
+class HTTPPaymentGateway(PaymentGateway):
+    """Gateway reached over HTTP through a pool of kept-alive connections"""
+
+    def __init__(self, url: str, api_key: Optional[str] = None, pool_size: int = 10, timeout: float = 10,
+                 max_batch_size: int = 100):
+        """Initialize the client
+
+        Args:
+            url: Batch authorization endpoint
+            api_key: Sent as a bearer token when set
+            pool_size: Most connections open to the gateway at once
+            timeout: Seconds allowed per batch
+            max_batch_size: Most payments the gateway accepts per call
+        """
+        self.url = url
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_batch_size = max_batch_size
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # Created on first use, inside the event loop that will use it
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout, headers=self.headers)
+        return self._session
+
+    async def authorize(self, payments):
+        try:
+            async with self.session.post(self.url, json={"payments": payments}) as response:
+                if 400 <= response.status < 500:
+                    raise PaymentBatchRejected(f"Gateway rejected the batch: HTTP {response.status} {await response.text()}")
+                if response.status >= 300:
+                    raise PaymentGatewayError(f"Gateway error: HTTP {response.status}")
+                body = await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise PaymentGatewayError(f"Gateway unreachable: {e!r}")
+        return [PaymentResult(r["order_id"], bool(r["approved"]), r.get("authorization_id"), r.get("error"))
+                for r in body["results"]]
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class PaymentBatcher(WindowedBatcher):
+    """Collects concurrent payment authorizations and sends them to the gateway in batches"""
+
+    def __init__(self, gateway: PaymentGateway, window_ms: float = 20, max_batch_size: Optional[int] = None):
+        """Initialize the batcher
+
+        Args:
+            gateway: Where batches are sent
+            window_ms: How long to wait for more payments after the first one
+            max_batch_size: Send at once when this many are waiting; the gateway's limit by default
+        """
+        super().__init__(gateway.authorize, window_ms, min(max_batch_size or gateway.max_batch_size, gateway.max_batch_size))
+        self.gateway = gateway
+        self.stats = {"batches": 0, "payments": 0, "declined": 0, "split_retries": 0, "errors": 0}
+
+    async def authorize(self, order_id: str, amount: float, currency: str = "USD") -> PaymentResult:
+        """Queue a payment for the next batch and wait for its own result"""
+        return await self._enqueue(None, {"payment": {"order_id": order_id, "amount": amount, "currency": currency}})
+
+    async def _dispatch(self, headers, batch):
+        try:
+            results = await self.gateway.authorize([item["payment"] for item in batch])
+        except PaymentBatchRejected as e:
+            if len(batch) == 1:
+                resolve_futures([batch[0]["future"]], error=e)
+                return
+            # Only the offending payment should fail: send them separately
+            logger.warning(f"Payment batch rejected, retrying {len(batch)} payments individually: {e}")
+            self.stats["split_retries"] += 1
+            await asyncio.gather(*(self._dispatch(headers, [item]) for item in batch))
+            return
+        except Exception as e:
+            self.stats["errors"] += 1
+            resolve_futures([item["future"] for item in batch], error=e)
+            return
+
+        # Counted once answered, so payments split out of a rejected batch are not counted twice
+        self.stats["batches"] += 1
+        self.stats["payments"] += len(batch)
+        by_order = {result.order_id: result for result in results}
+        for item in batch:
+            order_id = item["payment"]["order_id"]
+            result = by_order.get(order_id) or PaymentResult(order_id, False, error="Missing from gateway response")
+            if not result.approved:
+                self.stats["declined"] += 1
+            resolve_futures([item["future"]], result=result)
+
+    def get_state(self) -> Dict[str, Any]:
+        batches = self.stats["batches"]
+        return {**self.stats, "avg_batch_size": round(self.stats["payments"] / batches, 2) if batches else 0}
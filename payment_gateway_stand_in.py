@@ -0,0 +1,133 @@
+"""
+Local stand-in for a batch payment authorization gateway.
+
+Serves POST /v1/payments/authorize, taking {"payments": [{"order_id",
+"amount", "currency"}]} and answering {"results": [{"order_id", "approved",
+"authorization_id", "error"}]}, the API HTTPPaymentGateway speaks. Latency per
+call and per payment, random declines and failed calls are drawn from a seeded
+random generator, so benchmarks and tests are repeatable and run offline.
+Batches over the size limit and payments without a positive amount are
+rejected as a whole with HTTP 400.
+
+Usage:
+    python payment_gateway_stand_in.py [--port 8090] [--latency fixed:200] [--per-item-ms 1]
+                                       [--decline-rate 0.02] [--error-rate 0] [--seed 1]
+
+Then point the API at it with PAYMENT_GATEWAY_URL=http://127.0.0.1:8090/v1/payments/authorize.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import uuid
+from typing import Dict, Any, Optional
+
+from aiohttp import web
+
+from hasura_stand_in import LatencyModel
+
+# Setup logging
+logger = logging.getLogger("fastapi-hasura")
+
+
+class PaymentGatewayStandIn:
+    """Local batch authorization endpoint with configurable latency and failures"""
+
+    def __init__(self, latency: str = "fixed:0", per_item_ms: float = 0, decline_rate: float = 0,
+                 error_rate: float = 0, seed: Optional[int] = None, max_batch_size: int = 100,
+                 amount_limit: float = 10000):
+        """Initialize the stand-in
+
+        Args:
+            latency: Time per call, as a LatencyModel spec (e.g. "fixed:200", "lognormal:150,0.3")
+            per_item_ms: Additional milliseconds per payment in the batch
+            decline_rate: Share of payments declined at random
+            error_rate: Share of calls answered with HTTP 503
+            seed: Seed for the random generator, for repeatable runs
+            max_batch_size: Larger batches are rejected with HTTP 400
+            amount_limit: Payments above this amount are declined
+        """
+        self.latency = LatencyModel(latency)
+        self.per_item = per_item_ms / 1000
+        self.decline_rate = decline_rate
+        self.error_rate = error_rate
+        self.max_batch_size = max_batch_size
+        self.amount_limit = amount_limit
+        self.rng = random.Random(seed)
+        self.runner: Optional[web.AppRunner] = None
+        self.url: Optional[str] = None
+        self.stats = {"requests": 0, "payments": 0, "declined": 0, "errors": 0, "rejected": 0}
+
+    def decide(self, payment: Dict[str, Any]) -> Dict[str, Any]:
+        """Approve or decline one payment"""
+        order_id = payment.get("order_id")
+        amount = payment.get("amount")
+        if not isinstance(amount, (int, float)) or amount <= 0:
+            raise ValueError(f"Invalid amount for {order_id}")
+        if amount > self.amount_limit:
+            error = "Amount over limit"
+        elif self.rng.random() < self.decline_rate:
+            error = "Card declined"
+        else:
+            return {"order_id": order_id, "approved": True, "authorization_id": f"AUTH-{uuid.uuid4().hex[:12]}"}
+        self.stats["declined"] += 1
+        return {"order_id": order_id, "approved": False, "error": error}
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.stats["requests"] += 1
+        payments = (await request.json()).get("payments", [])
+        # Draw random decisions up front so a seed replays the same faults
+        fault = self.rng.random()
+        await asyncio.sleep(self.latency.sample(self.rng) + self.per_item * len(payments))
+        if fault < self.error_rate:
+            self.stats["errors"] += 1
+            return web.Response(status=503, text="injected failure")
+        if len(payments) > self.max_batch_size:
+            self.stats["rejected"] += 1
+            return web.json_response({"error": f"At most {self.max_batch_size} payments per batch"}, status=400)
+        try:
+            results = [self.decide(payment) for payment in payments]
+        except ValueError as e:
+            self.stats["rejected"] += 1
+            return web.json_response({"error": str(e)}, status=400)
+        self.stats["payments"] += len(payments)
+        return web.json_response({"results": results})
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/payments/authorize", self.handle)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve in the running event loop; returns the authorization URL"""
+        self.runner = web.AppRunner(self.make_app())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.url = f"http://{host}:{port}/v1/payments/authorize"
+        return self.url
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", default="fixed:200", help="per call, e.g. fixed:200, lognormal:150,0.3")
+    parser.add_argument("--per-item-ms", type=float, default=1.0)
+    parser.add_argument("--decline-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-batch-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    stand_in = PaymentGatewayStandIn(args.latency, args.per_item_ms, args.decline_rate, args.error_rate,
+                                     args.seed, args.max_batch_size)
+    logger.info(f"Payment gateway stand-in on http://{args.host}:{args.port}/v1/payments/authorize")
+    web.run_app(stand_in.make_app(), host=args.host, port=args.port, print=None)
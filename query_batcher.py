@@ -0,0 +1,351 @@
+"""
+DataLoader-style batching of concurrent Hasura queries and inserts.
+
+Operations issued within a short window are collected per header set (role and
+user id) and sent as one round-trip: queries are merged into a single aliased
+GraphQL document, order inserts into a single multi-row insert_orders mutation.
+Each caller receives only its own part of the response.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple, Callable, Awaitable
+
+from graphql import (
+    DocumentNode,
+    OperationDefinitionNode,
+    OperationType,
+    FieldNode,
+    NameNode,
+    SelectionSetNode,
+    VariableNode,
+    Visitor,
+    visit,
+    print_ast,
+)
+from gql.transport.exceptions import TransportQueryError
+
+import deadlines
+
+# Setup logging
+logger = logging.getLogger("fastapi-hasura")
+
+def _new_metrics() -> Dict[str, Any]:
+    return {
+        "batches": 0,
+        "queries": 0,
+        "deduplicated": 0,
+        "split_retries": 0,
+        "size_distribution": {},
+        "last_reset": datetime.now().isoformat()
+    }
+
+# In-memory batching metrics for reads and writes (reset on app restart)
+batch_metrics = _new_metrics()
+write_batch_metrics = _new_metrics()
+
+Executor = Callable[[DocumentNode, Optional[Dict[str, Any]], Optional[Dict[str, str]]], Awaitable[Dict[str, Any]]]
+
+
+def is_batchable(document: DocumentNode) -> bool:
+    """Check whether a document can be merged with others.
+
+    Only single-operation queries without fragments or operation directives
+    whose top-level selections are plain fields are merged.
+    """
+    if len(document.definitions) != 1:
+        return False
+    operation = document.definitions[0]
+    if not isinstance(operation, OperationDefinitionNode):
+        return False
+    if operation.operation != OperationType.QUERY or operation.directives:
+        return False
+    return all(isinstance(selection, FieldNode) for selection in operation.selection_set.selections)
+
+
+class _PrefixVariables(Visitor):
+    """Rename every variable of an operation with a batch-slot prefix"""
+
+    def __init__(self, prefix: str):
+        super().__init__()
+        self.prefix = prefix
+
+    def enter_variable(self, node, *_args):
+        return VariableNode(name=NameNode(value=self.prefix + node.name.value))
+
+
+def merge_queries(documents: List[Tuple[DocumentNode, Optional[Dict[str, Any]]]]):
+    """Merge batchable queries into one aliased document.
+
+    Returns the merged document, the merged variables and, for every input
+    query, a mapping of merged response key to the caller's original key.
+    """
+    variable_definitions = []
+    selections = []
+    merged_variables: Dict[str, Any] = {}
+    key_maps: List[Dict[str, str]] = []
+
+    for index, (document, variables) in enumerate(documents):
+        prefix = f"b{index}_"
+        operation = visit(document.definitions[0], _PrefixVariables(prefix))
+        variable_definitions.extend(operation.variable_definitions or [])
+
+        key_map = {}
+        for field in operation.selection_set.selections:
+            original_key = (field.alias or field.name).value
+            merged_key = prefix + original_key
+            selections.append(FieldNode(
+                alias=NameNode(value=merged_key),
+                name=field.name,
+                arguments=field.arguments,
+                directives=field.directives,
+                selection_set=field.selection_set
+            ))
+            key_map[merged_key] = original_key
+        key_maps.append(key_map)
+
+        for name, value in (variables or {}).items():
+            merged_variables[prefix + name] = value
+
+    merged = DocumentNode(definitions=[
+        OperationDefinitionNode(
+            operation=OperationType.QUERY,
+            name=NameNode(value="Batched"),
+            variable_definitions=variable_definitions,
+            directives=[],
+            selection_set=SelectionSetNode(selections=selections)
+        )
+    ])
+    return merged, merged_variables, key_maps
+
+
+class WindowedBatcher(ABC):
+    """Collects concurrent operations per header set and dispatches them in batches
+
+    A batch is dispatched `window_ms` after its first operation arrived, or as
+    soon as it holds `max_batch_size` operations, so batching never adds more
+    than the window to a caller's latency.
+    """
+
+    def __init__(self, executor: Executor, window_ms: float = 5, max_batch_size: int = 20):
+        """Initialize the batcher
+
+        Args:
+            executor: Coroutine used to send a document to Hasura
+            window_ms: How long to wait for more operations after the first one
+            max_batch_size: Dispatch immediately once this many operations are pending
+        """
+        self.executor = executor
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._pending: Dict[Tuple, List[Dict[str, Any]]] = {}
+        self._timers: Dict[Tuple, asyncio.TimerHandle] = {}
+        self._tasks = set()
+
+    async def _enqueue(self, headers: Optional[Dict[str, str]], item: Dict[str, Any]) -> Any:
+        """Add an operation to its header group's batch and wait for its result"""
+        loop = asyncio.get_running_loop()
+        group = tuple(sorted((headers or {}).items()))
+        item["future"] = loop.create_future()
+        item["deadline"] = deadlines.get_deadline()
+
+        pending = self._pending.setdefault(group, [])
+        pending.append(item)
+
+        if len(pending) >= self.max_batch_size:
+            self._flush(group)
+        elif len(pending) == 1:
+            self._timers[group] = loop.call_later(self.window, self._flush, group)
+
+        # Each caller waits only as long as its own deadline allows
+        return await deadlines.bounded(item["future"])
+
+    def _flush(self, group: Tuple) -> None:
+        """Hand the pending operations of a header group to a dispatch task"""
+        timer = self._timers.pop(group, None)
+        if timer:
+            timer.cancel()
+
+        batch = self._pending.pop(group, None)
+        if not batch:
+            return
+
+        # The batch runs until its most patient caller's deadline, not the first caller's
+        context = contextvars.copy_context()
+        item_deadlines = [item["deadline"] for item in batch]
+        batch_deadline = None if None in item_deadlines else max(item_deadlines)
+        context.run(deadlines.set_deadline_at, batch_deadline)
+
+        task = asyncio.get_running_loop().create_task(self._dispatch(dict(group), batch), context=context)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @abstractmethod
+    async def _dispatch(self, headers: Dict[str, str], batch: List[Dict[str, Any]]) -> None:
+        """Send a batch and resolve the future of each of its operations"""
+
+
+class QueryBatcher(WindowedBatcher):
+    """Collects concurrent queries and dispatches them as merged batches"""
+
+    async def load(self, document: DocumentNode, variables: Optional[Dict[str, Any]] = None,
+                   headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Queue a query for the next batch and wait for its own result"""
+        if not is_batchable(document):
+            return await self.executor(document, variables, headers)
+        return await self._enqueue(headers, {"document": document, "variables": variables})
+
+    async def _dispatch(self, headers: Dict[str, str], batch: List[Dict[str, Any]]) -> None:
+        """Send one merged document and route each slice back to its caller"""
+        # Identical queries in the same group share a single slot
+        slots: Dict[str, Dict[str, Any]] = {}
+        for item in batch:
+            slot_key = print_ast(item["document"]) + json.dumps(item["variables"] or {}, sort_keys=True)
+            slot = slots.setdefault(slot_key, {"document": item["document"], "variables": item["variables"], "futures": []})
+            slot["futures"].append(item["future"])
+
+        unique = list(slots.values())
+        record_batch(len(batch), len(batch) - len(unique))
+
+        if len(unique) == 1:
+            await self._run_single(unique[0], headers)
+            return
+
+        merged, merged_variables, key_maps = merge_queries([(slot["document"], slot["variables"]) for slot in unique])
+        try:
+            result = await self.executor(merged, merged_variables or None, headers)
+        except TransportQueryError as e:
+            # A GraphQL error in one query must not fail the others: retry them separately
+            logger.warning(f"Batched query failed, retrying {len(unique)} queries individually: {e}")
+            batch_metrics["split_retries"] += 1
+            await asyncio.gather(*(self._run_single(slot, headers) for slot in unique))
+            return
+        except Exception as e:
+            for slot in unique:
+                resolve_futures(slot["futures"], error=e)
+            return
+
+        for slot, key_map in zip(unique, key_maps):
+            resolve_futures(slot["futures"], result={original: result.get(merged_key) for merged_key, original in key_map.items()})
+
+    async def _run_single(self, slot: Dict[str, Any], headers: Dict[str, str]) -> None:
+        """Execute one query on its own"""
+        try:
+            result = await self.executor(slot["document"], slot["variables"], headers)
+        except Exception as e:
+            resolve_futures(slot["futures"], error=e)
+            return
+        resolve_futures(slot["futures"], result=result)
+
+
+class InsertBatcher(WindowedBatcher):
+    """Collects concurrent order inserts into multi-row insert_orders mutations"""
+
+    def __init__(self, executor: Executor, mutation: DocumentNode, window_ms: float = 5, max_batch_size: int = 50):
+        """Initialize the batcher
+
+        Args:
+            executor: Coroutine used to send a document to Hasura
+            mutation: Multi-row insert taking `$objects` and selecting `insert_orders.returning`
+            window_ms: Maximum latency added while waiting for more inserts
+            max_batch_size: Rows per mutation
+        """
+        super().__init__(executor, window_ms, max_batch_size)
+        self.mutation = mutation
+
+    async def insert(self, obj: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Queue one row for insertion and wait for the row Hasura returns for it"""
+        return await self._enqueue(headers, {"object": obj})
+
+    async def _dispatch(self, headers: Dict[str, str], batch: List[Dict[str, Any]]) -> None:
+        """Insert a batch with one mutation and hand each caller its own row"""
+        record_batch(len(batch), metrics=write_batch_metrics)
+        try:
+            rows = await self._insert_rows(headers, [item["object"] for item in batch])
+        except TransportQueryError as e:
+            if len(batch) == 1:
+                resolve_futures([batch[0]["future"]], error=e)
+                return
+            # A row rejected by Hasura must not fail the others: insert them separately
+            logger.warning(f"Batched insert failed, retrying {len(batch)} rows individually: {e}")
+            write_batch_metrics["split_retries"] += 1
+            await asyncio.gather(*(self._insert_single(headers, item) for item in batch))
+            return
+        except Exception as e:
+            resolve_futures([item["future"] for item in batch], error=e)
+            return
+
+        for item, row in zip(batch, rows):
+            resolve_futures([item["future"]], result=row)
+
+    async def _insert_single(self, headers: Dict[str, str], item: Dict[str, Any]) -> None:
+        """Insert one row on its own"""
+        try:
+            rows = await self._insert_rows(headers, [item["object"]])
+        except Exception as e:
+            resolve_futures([item["future"]], error=e)
+            return
+        resolve_futures([item["future"]], result=rows[0])
+
+    async def _insert_rows(self, headers: Dict[str, str], objects: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        result = await self.executor(self.mutation, {"objects": objects}, headers)
+        rows = result["insert_orders"]["returning"]
+        if len(rows) != len(objects):
+            raise RuntimeError(f"Expected {len(objects)} inserted rows, got {len(rows)}")
+        return rows
+
+
+def resolve_futures(futures: List[asyncio.Future], result: Any = None, error: Optional[Exception] = None) -> None:
+    """Complete caller futures that are still waiting"""
+    for future in futures:
+        if future.done():
+            continue
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+
+def record_batch(size: int, deduplicated: int = 0, metrics: Optional[Dict[str, Any]] = None) -> None:
+    """Track a dispatched batch and its size"""
+    if metrics is None:
+        metrics = batch_metrics
+    metrics["batches"] += 1
+    metrics["queries"] += size
+    metrics["deduplicated"] += deduplicated
+    distribution = metrics["size_distribution"]
+    distribution[size] = distribution.get(size, 0) + 1
+
+
+def _summarize(metrics: Dict[str, Any]) -> Dict[str, Any]:
+    batches = metrics["batches"]
+    avg_size = metrics["queries"] / batches if batches else 0
+
+    return {
+        "batches": batches,
+        "queries": metrics["queries"],
+        "deduplicated": metrics["deduplicated"],
+        "split_retries": metrics["split_retries"],
+        "avg_batch_size": avg_size,
+        "max_batch_size": max(metrics["size_distribution"], default=0),
+        "size_distribution": {str(size): count for size, count in sorted(metrics["size_distribution"].items())},
+        "since": metrics["last_reset"]
+    }
+
+
+def get_summary() -> Dict[str, Any]:
+    """Get a summary of read batching metrics, with write batching under writes"""
+    summary = _summarize(batch_metrics)
+    summary["writes"] = _summarize(write_batch_metrics)
+    return summary
+
+
+def reset_metrics():
+    """Reset all batching metrics"""
+    global batch_metrics, write_batch_metrics
+    batch_metrics = _new_metrics()
+    write_batch_metrics = _new_metrics()
+    logger.info("Batching metrics reset")
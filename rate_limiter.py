@@ -0,0 +1,254 @@
+"""
+Request rate limiting per user, role and route.
+
+Limits use GCRA, a token bucket that stores a single "theoretical arrival time"
+per key: each request pushes it forward by period/limit, and a request is
+refused when that would put it more than a burst ahead of now. The update is a
+single step, so it is atomic on the event loop for the in-process backend and
+inside a Lua script for the Redis backend, which shares buckets across
+instances.
+
+Rules are a JSON object mapping a route (an exact path, a prefix ending in "*",
+or "*" for any other path) to roles ("*" for any other role), each with a rate
+such as "10/second" or an object with "rate", "burst" and "scope" ("user", the
+default, or "role" for one bucket shared by everyone with the role):
+
+    {"/api/orders": {"*": "20/second", "admin": "100/second"},
+     "/api/create-order": {"user": {"rate": "30/minute", "burst": 5}}}
+
+Requests without a user (e.g. /token) are limited by client address under the
+role "anonymous".
+"""
+import asyncio
+import json
+import logging
+import math
+import time
+from typing import Dict, Any, Callable, NamedTuple, Optional, Tuple
+
+# Setup logging
+logger = logging.getLogger("fastapi-hasura")
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+RATE_LIMIT_SCOPES = ("user", "role")
+ANONYMOUS_ROLE = "anonymous"
+
+
+class RateLimit(NamedTuple):
+    limit: int
+    period: float
+    burst: int
+    scope: str = "user"
+
+    @property
+    def interval(self) -> float:
+        """Seconds each request uses up"""
+        return self.period / self.limit
+
+    @property
+    def capacity(self) -> float:
+        """How far ahead of now, in seconds, the bucket may run"""
+        return self.burst * self.interval
+
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+    """Parse "N/second", "N/minute", "N/hour", "N/day" or "N/<seconds>" into (N, period)"""
+    count, _, period = str(rate).partition("/")
+    period = period.strip().lower()
+    seconds = PERIODS.get(period.rstrip("s"), None)
+    if seconds is None:
+        seconds = float(period)
+    if int(count) <= 0 or seconds <= 0:
+        raise ValueError(f"Invalid rate {rate!r}")
+    return int(count), seconds
+
+
+def parse_rate_limits(raw: str) -> Dict[str, Dict[str, RateLimit]]:
+    """Parse the rate limit rules described in the module docstring"""
+    rules = {}
+    for route, roles in json.loads(raw or "{}").items():
+        rules[route] = {}
+        for role, entry in roles.items():
+            if not isinstance(entry, dict):
+                entry = {"rate": entry}
+            try:
+                limit, period = parse_rate(entry["rate"])
+            except (KeyError, ValueError):
+                raise ValueError(f"Invalid rate limit for {role} on {route}: {entry!r}")
+            scope = entry.get("scope", "user")
+            if scope not in RATE_LIMIT_SCOPES:
+                raise ValueError(f"Invalid rate limit scope {scope!r} for {role} on {route}")
+            rules[route][role] = RateLimit(limit, period, int(entry.get("burst", limit)), scope)
+    return rules
+
+
+class LocalRateLimitBackend:
+    """Buckets in this process's memory"""
+
+    def __init__(self, max_keys: int = 100000, clock: Callable[[], float] = time.monotonic):
+        self.buckets: Dict[str, float] = {}
+        self.max_keys = max_keys
+        self.clock = clock
+
+    async def hit(self, key: str, rule: RateLimit) -> Tuple[bool, float, int]:
+        """Take one request from a bucket: (allowed, retry_after seconds, remaining)"""
+        now = self.clock()
+        tat = self.buckets.get(key, now)
+        if tat < now:
+            tat = now
+        new_tat = tat + rule.interval
+        wait = new_tat - now - rule.capacity
+        # Tolerate float rounding so exactly `burst` requests fit
+        if wait > 1e-9:
+            return False, wait, 0
+        if len(self.buckets) >= self.max_keys and key not in self.buckets:
+            self.prune(now)
+        self.buckets[key] = new_tat
+        return True, 0.0, int((rule.capacity - (new_tat - now)) / rule.interval)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Forget buckets that have refilled completely"""
+        now = self.clock() if now is None else now
+        full = [key for key, tat in self.buckets.items() if tat <= now]
+        for key in full:
+            del self.buckets[key]
+        return len(full)
+
+    def get_state(self) -> Dict[str, Any]:
+        return {"backend": "local", "tracked_keys": len(self.buckets)}
+
+
+# KEYS[1] bucket; ARGV[1] interval, ARGV[2] capacity. Uses the Redis clock so
+# every instance sees the same time. Floats are returned as strings because
+# Redis truncates Lua numbers to integers.
+GCRA_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then tat = now end
+local new_tat = tat + interval
+local wait = new_tat - now - capacity
+if wait > 0 then return {0, tostring(wait), 0} end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, '0', math.floor((capacity - (new_tat - now)) / interval)}
+"""
+
+
+class RedisRateLimitBackend:
+    """Buckets in Redis, shared by every instance"""
+
+    def __init__(self, client, prefix: str = "ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+        self.script = client.register_script(GCRA_SCRIPT)
+
+    async def hit(self, key: str, rule: RateLimit) -> Tuple[bool, float, int]:
+        # redis-py is synchronous; keep the round trip off the event loop
+        allowed, wait, remaining = await asyncio.to_thread(
+            self.script, keys=[self.prefix + key], args=[repr(rule.interval), repr(rule.capacity)]
+        )
+        return bool(allowed), float(wait), int(remaining)
+
+    def get_state(self) -> Dict[str, Any]:
+        return {"backend": "redis"}
+
+
+class RateLimiter:
+    """Finds the rule for a request and checks it against the backend"""
+
+    def __init__(self, rules: Dict[str, Dict[str, RateLimit]], backend):
+        self.rules = rules
+        self.backend = backend
+        # Exact routes are a dict lookup; prefixes are tried longest first
+        self.exact = {route: roles for route, roles in rules.items() if not route.endswith("*")}
+        self.prefixes = sorted(((route[:-1], roles) for route, roles in rules.items() if route.endswith("*")),
+                               key=lambda item: len(item[0]), reverse=True)
+        self.stats = {"allowed": 0, "limited": 0, "backend_errors": 0}
+
+    def rule_for(self, path: str, role: str) -> Tuple[Optional[str], Optional[RateLimit]]:
+        """The route pattern and limit that apply to a path and role"""
+        route, roles = path, self.exact.get(path)
+        if roles is None:
+            for prefix, candidate in self.prefixes:
+                if path.startswith(prefix):
+                    route, roles = prefix + "*", candidate
+                    break
+            else:
+                return None, None
+        rule = roles.get(role) or roles.get("*")
+        return route, rule
+
+    async def check(self, path: str, role: str, identity: str) -> Tuple[bool, float, Optional[RateLimit]]:
+        """(allowed, retry_after, rule) for one request by `identity` with `role`"""
+        route, rule = self.rule_for(path, role)
+        if rule is None:
+            return True, 0.0, None
+        key = f"{route}|role:{role}" if rule.scope == "role" else f"{route}|user:{identity}"
+        try:
+            allowed, retry_after, _ = await self.backend.hit(key, rule)
+        except Exception as e:
+            # Fail open: an unavailable limiter must not take the API down with it
+            self.stats["backend_errors"] += 1
+            logger.warning(f"Rate limit check failed, allowing request: {e}")
+            return True, 0.0, rule
+        self.stats["allowed" if allowed else "limited"] += 1
+        return allowed, retry_after, rule
+
+    def get_state(self) -> Dict[str, Any]:
+        return {
+            "rules": {route: {role: f"{rule.limit}/{rule.period:g}s burst {rule.burst} per {rule.scope}"
+                              for role, rule in roles.items()}
+                      for route, roles in self.rules.items()},
+            **self.backend.get_state(),
+            **self.stats
+        }
+
+
+class RateLimitMiddleware:
+    """ASGI middleware answering 429 with Retry-After once a caller exceeds its limit
+
+    Must run inside the authentication middleware so request.state.user is set.
+    """
+
+    def __init__(self, app, limiter: Callable[[], RateLimiter]):
+        """Initialize the middleware
+
+        Args:
+            app: The wrapped ASGI app
+            limiter: Returns the RateLimiter to use, or None to let every request through
+        """
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        limiter = self.limiter() if scope["type"] == "http" else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        user = scope.get("state", {}).get("user")
+        if user:
+            role, identity = user.get("role", "user"), str(user.get("sub"))
+        else:
+            client = scope.get("client")
+            role, identity = ANONYMOUS_ROLE, f"ip:{client[0] if client else 'unknown'}"
+
+        allowed, retry_after, rule = await limiter.check(scope["path"], role, identity)
+        if allowed:
+            await self.app(scope, receive, send)
+            return
+
+        body = json.dumps({"detail": "Rate limit exceeded"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+                (b"x-ratelimit-limit", f"{rule.limit};w={rule.period:g}".encode())
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
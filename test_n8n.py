@@ -14,7 +14,7 @@ def get_auth_token():
     try:
         auth_data = {
             "username": "admin",  # Use your actual username
-            "password": "admin"   # Use your actual password
+            "password": "password"   # Use your actual password
         }
         
         response = requests.post(
@@ -30,7 +30,7 @@ async def test_order_processor():
     # Check the order status
     order_id = result.get("order_id")
     if order_id:
-        status = order_processor.get_order_status(order_id)
+        status = await order_processor.get_order_status(order_id)
         print(f"\nOrder status: {json.dumps(status, indent=2)}")
     
     return result
@@ -7,6 +7,7 @@ from fastapi.testclient import TestClient
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Import from the parent directory
+import main
 from main import app, get_current_user
 from order_processor import order_processor
 
@@ -30,4 +31,48 @@ def client():
     yield test_client
     
     # Clean up after tests
-    app.dependency_overrides = {} 
\ No newline at end of file
+    app.dependency_overrides = {} 
+
+
+@pytest.fixture
+def user_client(monkeypatch):
+    """Test client with real authentication, sending a valid token for user 12345"""
+    monkeypatch.setattr(app, "dependency_overrides", {})
+    token = main.create_access_token({"sub": "12345", "role": "user"})
+    test_client = TestClient(app)
+    test_client.headers["Authorization"] = f"Bearer {token}"
+    return test_client
+
+
+class DictRedis:
+    """In-memory subset of the Redis client used by the response cache"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, expiration, value):
+        self.data[key] = value
+
+    def sadd(self, key, *members):
+        self.data.setdefault(key, set()).update(members)
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def expire(self, key, expiration):
+        pass
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+@pytest.fixture
+def redis_cache(monkeypatch):
+    """Replace the app's Redis client with an in-memory one"""
+    cache = DictRedis()
+    monkeypatch.setattr(main, "redis_client", cache)
+    return cache
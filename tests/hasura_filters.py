@@ -0,0 +1,18 @@
+"""Evaluation of Hasura where filters against in-memory rows, for tests that fake Hasura reads"""
+import operator
+
+OPERATORS = {"_eq": operator.eq, "_gt": operator.gt, "_gte": operator.ge, "_lt": operator.lt, "_lte": operator.le}
+
+
+def matches(row, where):
+    """Evaluate a boolean expression (_and, _or and column comparisons) the way Hasura would"""
+    for key, condition in where.items():
+        if key == "_and":
+            ok = all(matches(row, part) for part in condition)
+        elif key == "_or":
+            ok = any(matches(row, part) for part in condition)
+        else:
+            ok = all(OPERATORS[op](row[key], value) for op, value in condition.items())
+        if not ok:
+            return False
+    return True
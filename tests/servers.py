@@ -0,0 +1,13 @@
+"""Local aiohttp servers for stand-ins used by the tests"""
+from typing import Tuple
+
+from aiohttp import web
+
+
+async def serve(app: web.Application, host: str = "127.0.0.1") -> Tuple[web.AppRunner, str]:
+    """Serve `app` on a free port in the running event loop; returns the runner and "host:port" """
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, 0).start()
+    port = runner.addresses[0][1]
+    return runner, f"{host}:{port}"
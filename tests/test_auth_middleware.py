@@ -0,0 +1,63 @@
+import jwt
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+import main
+from auth_middleware import JWTAuthMiddleware
+
+
+def verify(token):
+    return jwt.decode(token, "secret", algorithms=["HS256"])
+
+
+def make_client():
+    app = FastAPI()
+    app.add_middleware(JWTAuthMiddleware, verify=verify, exempt_paths=("/token",), exempt_prefixes=("/docs",))
+
+    @app.get("/me")
+    async def me(request: Request):
+        return request.state.user
+
+    @app.get("/stream")
+    async def stream():
+        async def body():
+            for n in range(3):
+                yield f"{n}\n"
+        return StreamingResponse(body())
+
+    @app.get("/token")
+    async def token():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_requests_need_a_valid_token():
+    client = make_client()
+    token = jwt.encode({"sub": "1"}, "secret", algorithm="HS256")
+    forged = jwt.encode({"sub": "1"}, "other", algorithm="HS256")
+
+    missing = client.get("/me")
+    assert missing.status_code == 401
+    assert missing.json() == {"detail": "Authentication token missing"}
+    assert client.get("/me", headers={"Authorization": f"Bearer {forged}"}).json() == {"detail": "Invalid token"}
+    assert client.get("/me", headers={"Authorization": f"Bearer {token}"}).json() == {"sub": "1"}
+    assert client.get("/stream", headers={"Authorization": f"Bearer {token}"}).text == "0\n1\n2\n"
+
+
+def test_exempt_paths():
+    client = make_client()
+    assert client.get("/token").status_code == 200
+    assert client.get("/docs").status_code == 200
+    assert client.get("/tokens").status_code == 401
+
+
+def test_main_app_exemptions(monkeypatch):
+    monkeypatch.setattr(main.app, "dependency_overrides", {})
+    client = TestClient(main.app)
+    assert client.get("/health/live").status_code == 200
+    assert client.get("/openapi.json").status_code == 200
+    assert client.get("/api/user/profile").status_code == 401
+    token = main.create_access_token({"sub": "12345", "role": "user"})
+    assert client.get("/api/user/profile", headers={"Authorization": f"Bearer {token}"}).json()["user_id"] == "12345"
@@ -0,0 +1,65 @@
+import pytest
+
+import main
+
+
+@pytest.fixture
+def api(monkeypatch, user_client):
+    """Test client whose Hasura inserts fail for the second chunk"""
+    mutations = []
+    invalidations = []
+
+    async def execute_with_retry(query, variables=None, headers=None, **kwargs):
+        mutations.append(variables["objects"])
+        if len(mutations) == 2:
+            raise ConnectionError("Hasura unavailable")
+        rows = [{"id": f"id-{len(mutations)}-{i}", "status": "created", "created_at": "2024-01-01"} for i in range(len(variables["objects"]))]
+        return {"insert_orders": {"affected_rows": len(rows), "returning": rows}}
+
+    async def invalidate_cache_tags(tags):
+        invalidations.append(tags)
+
+    monkeypatch.setattr(main, "execute_with_retry", execute_with_retry)
+    monkeypatch.setattr(main, "invalidate_cache_tags", invalidate_cache_tags)
+    monkeypatch.setattr(main, "BULK_ORDER_CHUNK_SIZE", 2)
+    user_client.mutations = mutations
+    user_client.invalidations = invalidations
+    return user_client
+
+
+def test_bulk_orders_are_chunked_with_per_item_results(api):
+    orders = [{"details": {"product_id": str(i)}} for i in range(5)]
+
+    response = api.post("/api/create-orders", json={"orders": orders})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [len(chunk) for chunk in api.mutations] == [2, 2, 1]
+    assert all(obj["user_id"] == "12345" for chunk in api.mutations for obj in chunk)
+    assert [item["index"] for item in body["results"]] == [0, 1, 2, 3, 4]
+    assert [item["success"] for item in body["results"]] == [True, True, False, False, True]
+    assert body["created"] == 3 and body["failed"] == 2
+    assert api.invalidations == [["orders:user:12345", "orders:all"]]
+
+
+def test_bulk_order_limits(api, monkeypatch):
+    monkeypatch.setattr(main, "BULK_ORDER_MAX_ITEMS", 3)
+
+    assert api.post("/api/create-orders", json={"orders": []}).status_code == 400
+    too_many = [{"details": {}} for _ in range(4)]
+    assert api.post("/api/create-orders", json={"orders": too_many}).status_code == 400
+
+
+def test_short_returning_list_fails_the_chunk(api, monkeypatch):
+    async def execute_with_retry(query, variables=None, headers=None, **kwargs):
+        rows = [{"id": f"id-{i}", "status": "created", "created_at": "2024-01-01"} for i in range(len(variables["objects"]) - 1)]
+        return {"insert_orders": {"affected_rows": len(rows), "returning": rows}}
+
+    monkeypatch.setattr(main, "execute_with_retry", execute_with_retry)
+
+    response = api.post("/api/create-orders", json={"orders": [{"details": {}} for _ in range(2)]})
+
+    body = response.json()
+    assert [item["index"] for item in body["results"]] == [0, 1]
+    assert not any(item["success"] for item in body["results"])
+    assert "Expected 2 inserted rows, got 1" in body["results"][0]["error"]
@@ -0,0 +1,155 @@
+import asyncio
+from aiohttp import web
+
+import main
+from change_feed import OrderChangeFeed, websocket_url
+from tests.servers import serve
+
+
+class SubscriptionStandIn:
+    """Minimal graphql-transport-ws server streaming scripted orders_stream batches"""
+
+    def __init__(self, connections):
+        # One list of batches per connection; the connection is dropped after its batches
+        self.connections = list(connections)
+        self.subscriptions = []
+        self.runner = None
+        self.url = None
+
+    async def handler(self, request):
+        ws = web.WebSocketResponse(protocols=["graphql-transport-ws"])
+        await ws.prepare(request)
+        batches = self.connections.pop(0) if self.connections else []
+
+        async for message in ws:
+            data = message.json()
+            if data["type"] == "connection_init":
+                await ws.send_json({"type": "connection_ack"})
+            elif data["type"] == "subscribe":
+                self.subscriptions.append(data["payload"]["variables"])
+                for rows in batches:
+                    await ws.send_json({"id": data["id"], "type": "next", "payload": {"data": {"orders_stream": rows}}})
+                await ws.close()
+        return ws
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/v1/graphql", self.handler)
+        self.runner, address = await serve(app)
+        self.url = f"ws://{address}/v1/graphql"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def test_websocket_url():
+    assert websocket_url("https://example.hasura.app/v1/graphql") == "wss://example.hasura.app/v1/graphql"
+    assert websocket_url("http://localhost:8080/v1/graphql") == "ws://localhost:8080/v1/graphql"
+
+
+def test_feed_reports_changes_and_resumes_after_reconnect():
+    stand_in = SubscriptionStandIn([
+        [[{"id": "1", "user_id": "alice", "updated_at": "2024-01-01T00:00:01+00:00"},
+          {"id": "2", "user_id": "bob", "updated_at": "2024-01-01T00:00:02+00:00"}]],
+        [[{"id": "3", "user_id": "carol", "updated_at": "2024-01-01T00:00:03+00:00"}]],
+    ])
+    changes = []
+
+    async def on_change(user_ids):
+        changes.append(set(user_ids))
+
+    async def run():
+        await stand_in.start()
+        feed = OrderChangeFeed(stand_in.url, {"x-hasura-admin-secret": "secret"}, on_change,
+                               reconnect_base_delay=0.01, reconnect_max_delay=0.01, resume_overlap=1)
+        feed.last_seen = "2024-01-01T00:00:00+00:00"
+        feed.start()
+        for _ in range(200):
+            if len(changes) >= 2:
+                break
+            await asyncio.sleep(0.01)
+        await feed.stop()
+        await stand_in.stop()
+        return feed
+
+    feed = asyncio.run(run())
+
+    assert changes[:2] == [{"alice", "bob"}, {"carol"}]
+    # Each connection re-reads the last second, catching changes committed late
+    assert stand_in.subscriptions[0]["since"] == "2023-12-31T23:59:59+00:00"
+    assert stand_in.subscriptions[1]["since"] == "2024-01-01T00:00:01+00:00"
+    assert feed.last_seen == "2024-01-01T00:00:03+00:00"
+    assert feed.stats["reconnects"] >= 1
+
+
+class TagRedis:
+    """In-memory Redis subset used by tagged caching, with expiry on a manual clock"""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.now = 0
+
+    def advance(self, seconds):
+        self.now += seconds
+        for key, at in list(self.expires.items()):
+            if at <= self.now:
+                self.delete(key)
+
+    def setex(self, key, expiration, value):
+        self.data[key] = value
+        self.expires[key] = self.now + expiration
+
+    def sadd(self, key, *members):
+        self.data.setdefault(key, set()).update(members)
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def expire(self, key, expiration):
+        if key in self.data:
+            self.expires[key] = self.now + expiration
+
+    def ttl(self, key):
+        if key not in self.data:
+            return -2
+        return self.expires[key] - self.now if key in self.expires else -1
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+
+
+def test_change_invalidates_tagged_listings(monkeypatch):
+    redis = TagRedis()
+    monkeypatch.setattr(main, "redis_client", redis)
+
+    async def run():
+        await main.set_in_cache("get_orders", "get_orders:alice", [], tags=main.orders_cache_tags("user", "alice"))
+        await main.set_in_cache("get_orders", "get_orders:bob", [], tags=main.orders_cache_tags("user", "bob"))
+        await main.set_in_cache("get_orders", "get_orders:admin", [], tags=main.orders_cache_tags("admin", "root"))
+        await main.invalidate_changed_orders({"alice"})
+
+    asyncio.run(run())
+
+    assert "get_orders:alice" not in redis.data
+    assert "get_orders:admin" not in redis.data
+    assert "get_orders:bob" in redis.data
+
+
+def test_short_lived_entry_does_not_shorten_tag(monkeypatch):
+    redis = TagRedis()
+    monkeypatch.setattr(main, "redis_client", redis)
+    tags = main.orders_cache_tags("user", "alice")
+
+    async def run():
+        await main.set_in_cache("get_orders", "get_orders:alice", [], expiration=3600, tags=tags)
+        await main.set_in_cache("get_order_changes", "changes:alice", [], expiration=5, tags=tags)
+        assert redis.ttl("tag:orders:user:alice") == 3600
+        redis.advance(10)
+        await main.invalidate_changed_orders({"alice"})
+
+    asyncio.run(run())
+
+    assert "get_orders:alice" not in redis.data
@@ -0,0 +1,144 @@
+import asyncio
+import aiohttp
+import pytest
+from gql import gql
+from gql.transport.exceptions import TransportQueryError, TransportServerError
+
+import main
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState, is_retryable, backoff_delay
+
+QUERY = gql("query { orders { id } }")
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    """Fresh breaker with no backoff sleeps"""
+    breaker = CircuitBreaker("hasura", failure_threshold=2, reset_timeout=60)
+    monkeypatch.setattr(main, "hasura_breaker", breaker)
+    monkeypatch.setattr(main, "HASURA_RETRY_BASE_DELAY", 0)
+    return breaker
+
+
+def fake_executor(monkeypatch, outcomes):
+    """Replace the Hasura call with a sequence of results or exceptions"""
+    calls = []
+
+    async def execute(query, variables=None, headers=None):
+        calls.append(query)
+        outcome = outcomes[min(len(calls), len(outcomes)) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(main, "_execute_graphql", execute)
+    return calls
+
+
+def test_is_retryable():
+    assert is_retryable(aiohttp.ClientConnectionError())
+    assert is_retryable(asyncio.TimeoutError())
+    assert is_retryable(TransportServerError("bad gateway", 502))
+    assert is_retryable(TransportServerError("too many", 429))
+    assert not is_retryable(TransportServerError("bad request", 400))
+    assert not is_retryable(TransportQueryError("field not found"))
+
+
+def test_backoff_delay_is_capped():
+    for attempt in range(10):
+        assert 0 <= backoff_delay(attempt, 0.1, 2) <= min(2, 0.1 * 2 ** attempt)
+
+
+def test_transient_errors_are_retried(monkeypatch, breaker):
+    calls = fake_executor(monkeypatch, [aiohttp.ClientConnectionError(), {"orders": []}])
+
+    result = asyncio.run(main.execute_with_retry(QUERY))
+
+    assert result == {"orders": []}
+    assert len(calls) == 2
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_graphql_errors_are_not_retried(monkeypatch, breaker):
+    calls = fake_executor(monkeypatch, [TransportQueryError("field not found")])
+
+    with pytest.raises(TransportQueryError):
+        asyncio.run(main.execute_with_retry(QUERY))
+
+    assert len(calls) == 1
+    assert breaker.consecutive_failures == 0
+
+
+def test_breaker_opens_and_fails_fast(monkeypatch, breaker):
+    calls = fake_executor(monkeypatch, [aiohttp.ClientConnectionError()])
+
+    with pytest.raises(aiohttp.ClientConnectionError):
+        asyncio.run(main.execute_with_retry(QUERY))
+    assert breaker.state == CircuitState.OPEN
+    assert len(calls) == 2
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(main.execute_with_retry(QUERY))
+    assert len(calls) == 2
+
+
+def test_half_open_probe_closes_breaker(monkeypatch, breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.opened_at -= breaker.reset_timeout
+    calls = fake_executor(monkeypatch, [{"orders": []}])
+
+    assert asyncio.run(main.execute_with_retry(QUERY)) == {"orders": []}
+    assert breaker.state == CircuitState.CLOSED
+    assert len(calls) == 1
+
+
+def test_only_one_half_open_probe_at_a_time(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.opened_at -= breaker.reset_timeout
+
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+
+
+def test_cancelled_probe_is_released(monkeypatch, breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.opened_at -= breaker.reset_timeout
+
+    async def hang(query, variables=None, headers=None):
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(main, "_execute_graphql", hang)
+
+    async def run():
+        probe = asyncio.create_task(main.execute_with_retry(QUERY))
+        await asyncio.sleep(0.01)
+        assert breaker.probe_in_flight
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(run())
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert breaker.allow_request()
+
+
+def test_hung_probe_times_out_and_reopens(monkeypatch, breaker):
+    breaker.probe_timeout = 0.05
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.opened_at -= breaker.reset_timeout
+
+    async def hang(query, variables=None, headers=None):
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(main, "_execute_graphql", hang)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(main.execute_with_retry(QUERY), 5))
+    assert breaker.state == CircuitState.OPEN
+    assert not breaker.probe_in_flight
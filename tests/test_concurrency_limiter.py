@@ -0,0 +1,140 @@
+import asyncio
+import aiohttp
+import pytest
+from fastapi.testclient import TestClient
+from gql import gql
+
+import main
+from circuit_breaker import CircuitBreaker
+from concurrency_limiter import AdaptiveLimiter, ConcurrencyLimitExceeded
+
+QUERY = gql("query { orders { id } }")
+
+
+async def drive(limiter, capacity, workers=100, calls_per_worker=20):
+    """Run concurrent calls against a backend whose latency grows past `capacity` in-flight calls"""
+    load = {"in_flight": 0}
+
+    async def call():
+        load["in_flight"] += 1
+        try:
+            await asyncio.sleep(0.002 * max(1, load["in_flight"] / capacity))
+        finally:
+            load["in_flight"] -= 1
+
+    # Measure the no-load latency first
+    for _ in range(3):
+        await limiter.run(call)
+
+    async def worker():
+        for _ in range(calls_per_worker):
+            await limiter.run(call)
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+
+
+def test_limit_shrinks_when_latency_rises():
+    limiter = AdaptiveLimiter("test", initial_limit=80, queue_size=1000, queue_timeout=5)
+    asyncio.run(drive(limiter, capacity=5))
+    assert limiter.current_limit < 30
+    assert limiter.get_state()["rejected"] == 0
+
+
+def test_limit_grows_while_latency_is_flat():
+    limiter = AdaptiveLimiter("test", initial_limit=2, queue_size=1000, queue_timeout=5)
+    asyncio.run(drive(limiter, capacity=1000))
+    assert limiter.current_limit > 50
+
+
+def test_drops_back_off_multiplicatively():
+    limiter = AdaptiveLimiter("test", initial_limit=10, backoff_ratio=0.5)
+
+    async def failing():
+        raise aiohttp.ClientConnectionError()
+
+    with pytest.raises(aiohttp.ClientConnectionError):
+        asyncio.run(limiter.run(failing, is_drop=lambda e: True))
+    assert limiter.current_limit == 5
+    assert limiter.in_flight == 0
+
+
+def test_calls_over_the_limit_queue_then_get_rejected():
+    limiter = AdaptiveLimiter("test", initial_limit=1, max_limit=1, queue_size=1, queue_timeout=0.05)
+
+    async def run():
+        gate = asyncio.Event()
+        holder = asyncio.create_task(limiter.run(gate.wait))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(limiter.run(lambda: asyncio.sleep(0)))
+        await asyncio.sleep(0)
+        assert limiter.get_state()["queue_depth"] == 1
+
+        # The queue is full: rejected at once
+        with pytest.raises(ConcurrencyLimitExceeded):
+            await limiter.acquire()
+        # The queued call gives up after the queue timeout
+        with pytest.raises(ConcurrencyLimitExceeded):
+            await waiter
+        gate.set()
+        await holder
+        return limiter.get_state()
+
+    state = asyncio.run(run())
+    assert state["in_flight"] == 0
+    assert state["queue_depth"] == 0
+    assert (state["rejected"], state["timed_out"]) == (1, 1)
+
+
+def test_queued_call_runs_when_a_slot_frees():
+    limiter = AdaptiveLimiter("test", initial_limit=1, max_limit=1, queue_timeout=1)
+
+    async def run():
+        order = []
+
+        async def call(name):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+        await asyncio.gather(limiter.run(lambda: call("a")), limiter.run(lambda: call("b")))
+        return order
+
+    assert asyncio.run(run()) == ["a", "b"]
+
+
+def test_rejections_are_not_retried(monkeypatch):
+    limiter = AdaptiveLimiter("hasura", initial_limit=1, max_limit=1, queue_size=0)
+    breaker = CircuitBreaker("hasura", failure_threshold=1)
+    monkeypatch.setattr(main, "hasura_limiter", limiter)
+    monkeypatch.setattr(main, "hasura_breaker", breaker)
+    monkeypatch.setattr(main, "HASURA_CONCURRENCY_LIMIT_ENABLED", True)
+    calls = []
+
+    async def hasura(query, variables=None, headers=None):
+        calls.append(query)
+        await asyncio.sleep(0.02)
+        return {"orders": []}
+
+    monkeypatch.setattr(main, "_execute_graphql", hasura)
+
+    async def run():
+        return await asyncio.gather(main.execute_with_retry(QUERY), main.execute_with_retry(QUERY),
+                                    return_exceptions=True)
+
+    first, second = asyncio.run(run())
+    assert first == {"orders": []}
+    assert isinstance(second, ConcurrencyLimitExceeded)
+    assert len(calls) == 1
+    assert breaker.get_state()["state"] == "closed"
+
+
+def test_concurrency_metrics_are_admin_only(monkeypatch):
+    monkeypatch.setattr(main.app, "dependency_overrides", {})
+    client = TestClient(main.app)
+    admin = main.create_access_token({"sub": "1", "role": "admin"})
+    user = main.create_access_token({"sub": "2", "role": "user"})
+
+    response = client.get("/api/hasura/concurrency/metrics", headers={"Authorization": f"Bearer {admin}"})
+    assert response.status_code == 200
+    assert {"limit", "in_flight", "queue_depth", "rejected"} <= set(response.json())
+    assert client.get("/api/hasura/concurrency/metrics",
+                      headers={"Authorization": f"Bearer {user}"}).status_code == 403
@@ -0,0 +1,132 @@
+import asyncio
+import time
+import aiohttp
+import pytest
+import requests
+from fastapi.testclient import TestClient
+from gql import gql
+
+import deadlines
+import main
+import workflow_integration
+from circuit_breaker import CircuitBreaker
+from deadlines import DeadlineExceeded
+
+QUERY = gql("query { orders { id } }")
+
+
+def test_timeout_is_bounded_by_remaining_budget():
+    async def run():
+        assert deadlines.timeout(10) == 10
+        deadlines.set_deadline(0.5)
+        assert deadlines.timeout(10) <= 0.5
+        assert deadlines.timeout(0.1) == 0.1
+        deadlines.set_deadline(-1)
+        with pytest.raises(DeadlineExceeded):
+            deadlines.timeout(10)
+
+    asyncio.run(run())
+
+
+def test_bounded_raises_when_budget_runs_out():
+    async def run():
+        deadlines.set_deadline(0.02)
+        await deadlines.bounded(asyncio.sleep(1))
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(asyncio.wait_for(run(), timeout=0.5))
+
+
+def test_detached_runs_without_deadline():
+    async def report():
+        return deadlines.remaining()
+
+    async def run():
+        deadlines.set_deadline(1)
+        return await deadlines.detached(report)()
+
+    assert asyncio.run(run()) is None
+
+
+def test_retries_stop_when_budget_is_used_up(monkeypatch):
+    breaker = CircuitBreaker("hasura", failure_threshold=10)
+    monkeypatch.setattr(main, "hasura_breaker", breaker)
+    monkeypatch.setattr(main, "HASURA_RETRY_BASE_DELAY", 5)
+    monkeypatch.setattr(main, "HASURA_RETRY_MAX_DELAY", 5)
+    monkeypatch.setattr("circuit_breaker.random.uniform", lambda low, high: high)
+    calls = []
+
+    async def failing(query, variables=None, headers=None):
+        calls.append(query)
+        raise aiohttp.ClientConnectionError()
+
+    monkeypatch.setattr(main, "_execute_graphql", failing)
+
+    async def run():
+        deadlines.set_deadline(0.2)
+        await main.execute_with_retry(QUERY)
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(run())
+
+    assert time.monotonic() - start < 1
+    assert len(calls) == 1
+
+
+def test_slow_request_fails_with_504(monkeypatch):
+    async def slow_hasura(query, variables=None, headers=None):
+        await asyncio.sleep(2)
+
+    monkeypatch.setattr(main, "_execute_graphql", slow_hasura)
+    monkeypatch.setattr(main, "hasura_breaker", CircuitBreaker("hasura"))
+    monkeypatch.setattr(main.app, "dependency_overrides", {})
+    token = main.create_access_token({"sub": "12345", "role": "user"})
+    client = TestClient(main.app)
+
+    start = time.monotonic()
+    response = client.get("/api/orders", headers={"Authorization": f"Bearer {token}", "X-Request-Timeout": "0.1"})
+
+    assert response.status_code == 504
+    assert response.json()["detail"] == "Request deadline exceeded"
+    assert time.monotonic() - start < 1
+
+
+def test_n8n_timeout_from_the_deadline_is_not_a_workflow_failure(monkeypatch):
+    def timing_out(url, headers=None, json=None, timeout=None):
+        time.sleep(min(timeout, 0.2))
+        raise requests.Timeout("Read timed out")
+
+    monkeypatch.setattr(workflow_integration.requests, "post", timing_out)
+    monkeypatch.setattr(workflow_integration.requests, "get", timing_out)
+
+    async def run(call, budget):
+        deadlines.set_deadline(budget)
+        return await call
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(run(workflow_integration.trigger_workflow("order-created", {}), 0.05))
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(run(workflow_integration.get_workflow_status("1"), 0.05))
+    # n8n itself being slow is still reported as a failed workflow
+    assert not asyncio.run(run(workflow_integration.trigger_workflow("order-created", {}), None))["success"]
+
+
+def test_client_budget_is_capped(monkeypatch):
+    monkeypatch.setattr(main, "REQUEST_DEADLINE_MAX_SECONDS", 5)
+
+    class FakeRequest:
+        def __init__(self, path, headers):
+            self.url = type("URL", (), {"path": path})()
+            self.headers = headers
+
+    assert main.request_budget(FakeRequest("/api/orders", {})) == main.REQUEST_DEADLINE_SECONDS
+    assert main.request_budget(FakeRequest("/api/orders/stream", {})) == 60
+    assert main.request_budget(FakeRequest("/api/orders", {"X-Request-Timeout": "100"})) == 5
+    assert main.request_budget(FakeRequest("/api/orders", {"X-Request-Timeout": "oops"})) == main.REQUEST_DEADLINE_SECONDS
+
+
+def test_app_has_no_base_http_middleware():
+    from starlette.middleware.base import BaseHTTPMiddleware
+
+    assert not any(middleware.cls is BaseHTTPMiddleware for middleware in main.app.user_middleware)
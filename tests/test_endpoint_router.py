@@ -0,0 +1,130 @@
+import asyncio
+import time
+from aiohttp import web
+from gql import gql
+
+import main
+from circuit_breaker import CircuitBreaker
+from endpoint_router import EndpointRouter
+from tests.servers import serve
+
+QUERY = gql("query { orders { id } }")
+MUTATION = gql("mutation { insert_orders_one(object: {}) { id } }")
+
+
+class GraphQLStandIn:
+    """Local GraphQL endpoint with a fixed latency that can be switched to failing"""
+
+    def __init__(self, name, latency=0.0, failing=False):
+        self.name = name
+        self.latency = latency
+        self.failing = failing
+        self.requests = 0
+        self.runner = None
+        self.url = None
+
+    async def handler(self, request):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        if self.failing:
+            return web.Response(status=503, text="unavailable")
+        return web.json_response({"data": {"orders": [{"id": self.name}]}})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/v1/graphql", self.handler)
+        self.runner, address = await serve(app)
+        self.url = f"http://{address}/v1/graphql"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def test_router_prefers_fast_endpoints_and_ejects_failing_ones():
+    router = EndpointRouter(["fast", "slow"], eject_after=2, ejection_seconds=0.05)
+    fast, slow = router.endpoints
+
+    router.record(fast, 0.01, ok=True)
+    router.record(slow, 0.10, ok=True)
+    assert router.choose() is fast
+
+    router.record(fast, 0.01, ok=False)
+    router.record(fast, 0.01, ok=False)
+    assert router.choose() is slow
+    assert router.get_state()[0]["ejected"]
+
+    time.sleep(0.06)
+    assert router.choose() is fast
+
+
+def test_endpoint_that_never_succeeded_stays_behind_healthy_ones():
+    router = EndpointRouter(["dead", "healthy"], eject_after=2, ejection_seconds=0.05)
+    dead, healthy = router.endpoints
+    assert router.choose() is dead
+
+    router.record(dead, 0.01, ok=False)
+    router.record(dead, 0.01, ok=False)
+    router.record(healthy, 0.05, ok=True)
+    time.sleep(0.06)
+
+    # Back from ejection, but not ahead of the endpoint that works
+    assert not dead.is_ejected(time.monotonic())
+    assert router.choose() is healthy
+
+
+def test_recovered_endpoint_wins_traffic_back():
+    router = EndpointRouter(["flaky", "steady"], eject_after=10, ejection_seconds=0.05)
+    flaky, steady = router.endpoints
+    router.record(flaky, 0.01, ok=True)
+    router.record(steady, 0.03, ok=True)
+    for _ in range(10):
+        router.record(flaky, 0.01, ok=False)
+    assert flaky.error_rate > 0.95
+    time.sleep(0.06)
+
+    # Three times faster than the alternative once it is back
+    assert router.choose() is flaky
+    assert flaky.error_rate < 0.5
+
+
+def test_router_fails_open_when_every_endpoint_is_ejected():
+    router = EndpointRouter(["a", "b"], eject_after=1, ejection_seconds=60)
+    a, b = router.endpoints
+    router.record(a, 0.01, ok=False)
+    router.record(b, 0.01, ok=False)
+    assert router.choose() is a
+
+
+def test_reads_are_routed_across_replicas(monkeypatch):
+    primary = GraphQLStandIn("primary")
+    fast = GraphQLStandIn("fast", latency=0.005)
+    slow = GraphQLStandIn("slow", latency=0.05)
+    broken = GraphQLStandIn("broken", failing=True)
+    monkeypatch.setattr(main, "hasura_breaker", CircuitBreaker("hasura", failure_threshold=100))
+    monkeypatch.setattr(main, "HASURA_RETRY_BASE_DELAY", 0.001)
+
+    async def run():
+        for stand_in in (primary, fast, slow, broken):
+            await stand_in.start()
+        monkeypatch.setattr(main, "HASURA_ENDPOINT", primary.url)
+        router = EndpointRouter([broken.url, slow.url, fast.url], eject_after=2, ejection_seconds=60)
+        monkeypatch.setattr(main, "read_router", router)
+
+        answers = [(await main.execute_with_retry(QUERY))["orders"][0]["id"] for _ in range(20)]
+        written = await main.execute_with_retry(MUTATION)
+        for stand_in in (primary, fast, slow, broken):
+            await stand_in.stop()
+        return router, answers, written
+
+    router, answers, written = asyncio.run(run())
+
+    # Every read succeeded despite the broken replica, which fell behind the others after one failure
+    assert "broken" not in answers
+    assert broken.requests == 1
+    assert router.get_state()[0]["error_rate"] > 0
+    # Once measured, the fast replica takes the traffic
+    assert answers[-10:] == ["fast"] * 10
+    assert slow.requests <= 2
+    # Reads never reach the primary; writes always do
+    assert primary.requests == 1
+    assert written == {"orders": [{"id": "primary"}]}
@@ -0,0 +1,116 @@
+import pytest
+from gql.transport.exceptions import TransportQueryError
+
+import main
+from circuit_breaker import CircuitBreaker
+from graphql_proxy import InvalidOperationError, select_operation, canonical_hash, document_hash, parse_cache_allowlist
+
+
+def test_equivalent_documents_share_a_hash():
+    with_fragment = select_operation("""
+        query MyOrders($limit: Int, $offset: Int) {
+          orders(limit: $limit, offset: $offset) { ...OrderParts status }
+        }
+        fragment OrderParts on orders { id user_id }
+    """)
+    reordered = select_operation(
+        "query MyOrders($offset:Int,$limit:Int){orders(offset:$offset,limit:$limit){status ... on orders{user_id id}}}"
+    )
+
+    assert canonical_hash(with_fragment, {"limit": 5}) == canonical_hash(reordered, {"limit": 5})
+    assert canonical_hash(with_fragment, {"limit": 5}) != canonical_hash(reordered, {"limit": 6})
+
+
+def test_operation_selection():
+    source = "query A { orders { id } } query B { orders { status } }"
+    assert select_operation(source, "B").definitions[0].name.value == "B"
+    with pytest.raises(InvalidOperationError):
+        select_operation(source)
+    with pytest.raises(InvalidOperationError):
+        select_operation("query { orders { ...Missing } }")
+    with pytest.raises(InvalidOperationError):
+        select_operation("query {")
+
+
+def test_allowlist_parsing():
+    policies = parse_cache_allowlist(
+        '{"A": 30, "B": {"ttl": 60, "scope": "role", "tags": ["orders"], "document": "query B { orders { id } }"}}',
+        ("orders",)
+    )
+    assert policies["A"] == {"ttl": 30, "scope": "user", "tags": []}
+    assert policies["B"] == {"ttl": 60, "scope": "role", "tags": ["orders"],
+                             "document_hash": document_hash(select_operation("query B{orders{id}}"))}
+    with pytest.raises(ValueError):
+        parse_cache_allowlist('{"A": {"ttl": 1, "scope": "everyone"}}')
+    with pytest.raises(ValueError):
+        parse_cache_allowlist('{"A": {"ttl": 1, "scope": "role"}}')
+    with pytest.raises(ValueError):
+        parse_cache_allowlist('{"A": {"ttl": 1, "scope": "role", "document": "query Other { orders { id } }"}}')
+
+
+@pytest.fixture
+def proxy(monkeypatch, user_client, redis_cache):
+    calls = []
+
+    async def hasura(query, variables=None, headers=None):
+        calls.append(headers)
+        if "broken" in str(variables):
+            raise TransportQueryError("bad field", errors=[{"message": "bad field"}])
+        return {"orders": [{"id": "1", "user": headers["x-hasura-user-id"]}]}
+
+    monkeypatch.setattr(main, "_execute_graphql", hasura)
+    monkeypatch.setattr(main, "hasura_breaker", CircuitBreaker("hasura"))
+    monkeypatch.setattr(main, "GRAPHQL_CACHE_ALLOWLIST", parse_cache_allowlist('{"MyOrders": 60}'))
+
+    def post(user_id, body):
+        token = main.create_access_token({"sub": user_id, "role": "user"})
+        return user_client.post("/api/graphql", json=body, headers={"Authorization": f"Bearer {token}"})
+
+    return post, calls
+
+
+def test_allowlisted_queries_are_cached_per_user(proxy):
+    post, calls = proxy
+    query = {"query": "query MyOrders { orders { id } }"}
+
+    first = post("alice", query)
+    assert first.headers["X-Cache"] == "MISS"
+    again = post("alice", {"query": "query MyOrders {\n  orders {\n    id\n  }\n}"})
+    assert again.headers["X-Cache"] == "HIT"
+    assert again.json() == first.json() == {"data": {"orders": [{"id": "1", "user": "alice"}]}}
+
+    assert post("bob", query).json()["data"]["orders"][0]["user"] == "bob"
+    assert len(calls) == 2
+    assert calls[1]["x-hasura-role"] == "user"
+
+
+def test_other_operations_pass_through(proxy):
+    post, calls = proxy
+
+    assert "X-Cache" not in post("alice", {"query": "query Other { orders { id } }"}).headers
+    post("alice", {"query": "query Other { orders { id } }"})
+    post("alice", {"query": "mutation MyOrders { delete_orders(where: {}) { affected_rows } }"})
+    assert len(calls) == 3
+
+    errored = post("alice", {"query": "query MyOrders($x: String) { orders { id } }", "variables": {"x": "broken"}})
+    assert errored.json()["errors"] == [{"message": "bad field"}]
+    assert post("alice", {"query": "subscription S { orders { id } }"}).status_code == 400
+
+
+def test_renamed_operation_is_not_shared_across_a_role(proxy, monkeypatch):
+    post, calls = proxy
+    monkeypatch.setattr(main, "GRAPHQL_CACHE_ALLOWLIST", parse_cache_allowlist(
+        '{"Products": {"ttl": 60, "scope": "role", "document": "query Products { products { id } }"}}'))
+
+    # Any other document named after the role-wide entry stays per user
+    query = {"query": "query Products { orders { id } }"}
+    assert post("alice", query).json()["data"]["orders"][0]["user"] == "alice"
+    bob = post("bob", query)
+    assert bob.headers["X-Cache"] == "MISS"
+    assert bob.json()["data"]["orders"][0]["user"] == "bob"
+
+    # The registered document is shared by the role
+    registered = {"query": "query Products {\n  products { id }\n}"}
+    post("alice", registered)
+    assert post("bob", registered).headers["X-Cache"] == "HIT"
+    assert len(calls) == 3
@@ -0,0 +1,101 @@
+import asyncio
+import random
+import pytest
+
+import main
+from circuit_breaker import CircuitBreaker
+from hasura_stand_in import HasuraStandIn, LatencyModel
+from order_queries import INSERT_ORDERS_MUTATION, orders_page_query
+from pagination import ORDERS_ORDER_BY, build_keyset_where, split_page
+
+
+def test_queries_filter_sort_and_scope_by_role():
+    stand_in = HasuraStandIn(seed=1)
+    stand_in.seed_orders(6, users=2)
+
+    mine = stand_in.execute("query { orders { id user_id } }", role="user", user_id="1")
+    assert [row["user_id"] for row in mine["data"]["orders"]] == ["1"] * 3
+
+    result = stand_in.execute(
+        "query Page($where: orders_bool_exp!, $limit: Int!) { first: orders(where: $where, order_by: [{id: asc}], limit: $limit) { id user_id } }",
+        {"where": {"_or": [{"user_id": {"_eq": "0"}}, {"status": {"_eq": "missing"}}]}, "limit": 2}
+    )
+    rows = result["data"]["first"]
+    assert [row["user_id"] for row in rows] == ["0", "0"]
+    assert rows[0]["id"] < rows[1]["id"]
+
+    unknown = stand_in.execute("query { orders { nope } }")
+    assert unknown["errors"][0]["message"] == "field 'nope' not found in type: 'orders'"
+
+
+def test_inserts_apply_defaults_and_permissions():
+    stand_in = HasuraStandIn(seed=1)
+    one = stand_in.execute("mutation { insert_orders_one(object: {details: {}}) { id status user_id } }",
+                           role="user", user_id="7")
+    assert one["data"]["insert_orders_one"]["status"] == "pending"
+    assert one["data"]["insert_orders_one"]["user_id"] == "7"
+
+    denied = stand_in.execute("mutation { insert_orders_one(object: {user_id: \"8\"}) { id } }", role="user", user_id="7")
+    assert denied["errors"][0]["extensions"]["code"] == "permission-error"
+    assert len(stand_in.orders) == 1
+
+
+def test_latency_models():
+    rng = random.Random(0)
+    assert LatencyModel("fixed:20").sample(rng) == 0.02
+    assert all(0.01 <= LatencyModel("uniform:10,30").sample(rng) <= 0.03 for _ in range(100))
+    assert LatencyModel("normal:0,50").sample(rng) >= 0
+    with pytest.raises(ValueError):
+        LatencyModel("bimodal:1")
+
+
+@pytest.fixture
+def served(monkeypatch):
+    """Run coroutines against a stand-in that main.py talks to over HTTP"""
+    monkeypatch.setattr(main, "hasura_breaker", CircuitBreaker("hasura", failure_threshold=100))
+    monkeypatch.setattr(main, "HASURA_RETRY_BASE_DELAY", 0.001)
+
+    def serve(stand_in, coroutine_function):
+        async def run():
+            monkeypatch.setattr(main, "HASURA_ENDPOINT", await stand_in.start())
+            try:
+                return await coroutine_function()
+            finally:
+                await stand_in.stop()
+        return asyncio.run(run())
+
+    return serve
+
+
+def test_api_helpers_run_against_the_stand_in(served):
+    stand_in = HasuraStandIn(seed=1)
+    headers = {"x-hasura-role": "user", "x-hasura-user-id": "42"}
+
+    async def scenario():
+        objects = [{"user_id": "42", "details": {"n": n}} for n in range(5)]
+        inserted = await main.execute_with_retry(INSERT_ORDERS_MUTATION, {"objects": objects}, headers)
+        variables = {"where": build_keyset_where(None), "order_by": ORDERS_ORDER_BY, "limit": 4}
+        page = await main.execute_with_retry(orders_page_query(("id", "details")), variables, headers)
+        return inserted, page
+
+    inserted, page = served(stand_in, scenario)
+    assert inserted["insert_orders"]["affected_rows"] == 5
+    rows, cursor = split_page(page["orders"], 3)
+    assert len(rows) == 3 and cursor is not None
+
+
+def test_injected_faults_are_retried_and_repeatable(served):
+    def run(seed):
+        stand_in = HasuraStandIn(error_rate=0.3, drop_rate=0.2, seed=seed)
+        stand_in.seed_orders(3)
+
+        async def scenario():
+            return [await main.execute_with_retry(main.gql("query { orders { id } }"), max_retries=10) for _ in range(10)]
+
+        results = served(stand_in, scenario)
+        return stand_in.stats, results
+
+    stats, results = run(seed=3)
+    assert all(len(result["orders"]) == 3 for result in results)
+    assert stats["errors"] > 0 and stats["drops"] > 0
+    assert run(seed=3)[0] == stats
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+
+import main
+from health_probes import HealthMonitor
+
+
+async def healthy():
+    return True
+
+
+async def failing():
+    raise ConnectionError("refused")
+
+
+async def hanging():
+    await asyncio.sleep(10)
+
+
+def test_probe_results_are_cached():
+    monitor = HealthMonitor(timeout=0.05)
+    monitor.register("hasura", healthy, required=True)
+    monitor.register("n8n", failing)
+    monitor.register("redis", hanging)
+
+    asyncio.run(monitor.run_once())
+
+    snapshot = monitor.snapshot()
+    assert snapshot["hasura"]["status"] == "healthy"
+    assert snapshot["hasura"]["latency_ms"] is not None
+    assert snapshot["n8n"]["status"] == "unhealthy"
+    assert snapshot["n8n"]["error"] == "refused"
+    assert snapshot["redis"]["status"] == "unhealthy"
+    assert monitor.is_ready() == (True, {})
+
+
+def test_readiness_requires_fresh_healthy_results():
+    monitor = HealthMonitor(interval=1)
+    monitor.register("hasura", healthy, required=True)
+    assert monitor.is_ready() == (False, {"hasura": "unknown"})
+
+    asyncio.run(monitor.run_once())
+    assert monitor.is_ready()[0]
+
+    monitor.results["hasura"]["checked_at"] -= 10
+    assert monitor.is_ready() == (False, {"hasura": "stale"})
+
+
+@pytest.fixture
+def api(monkeypatch, user_client):
+    """Test client whose health monitor probes a scripted Hasura"""
+    monitor = HealthMonitor()
+    monkeypatch.setattr(main, "health_monitor", monitor)
+
+    async def no_live_calls(*args, **kwargs):
+        raise AssertionError("health endpoints must not call Hasura")
+
+    monkeypatch.setattr(main, "_execute_graphql", no_live_calls)
+    return user_client, monitor
+
+
+def test_health_endpoints_answer_from_cache(api):
+    client, monitor = api
+    monitor.register("hasura", failing, required=True)
+    asyncio.run(monitor.run_once())
+
+    assert client.get("/health/live").status_code == 200
+    ready = client.get("/health/ready")
+    assert ready.status_code == 503
+    assert ready.json()["failing"] == {"hasura": "unhealthy"}
+    health = client.get("/health").json()
+    assert health["hasura"] == "unhealthy: refused"
+
+    monitor.probes["hasura"] = healthy
+    asyncio.run(monitor.run_once())
+    assert client.get("/health/ready").status_code == 200
+    assert client.get("/health").json()["hasura"] == "healthy"
@@ -0,0 +1,119 @@
+import asyncio
+import random
+from gql import gql
+
+from hedging import Hedger, HedgeBudget, LatencyTracker, is_read_only
+
+
+def warmed_hedger(latency=0.01, **kwargs):
+    """Hedger whose percentile is already known"""
+    hedger = Hedger(min_delay_ms=1, min_samples=5, **kwargs)
+    for _ in range(100):
+        hedger.tracker.record(latency)
+    return hedger
+
+
+def scripted_call(delays):
+    """Call factory whose n-th invocation sleeps for delays[n]"""
+    calls = []
+
+    async def call():
+        index = len(calls)
+        calls.append(index)
+        await asyncio.sleep(delays[index])
+        return index
+
+    return call, calls
+
+
+def test_is_read_only():
+    assert is_read_only(gql("query { orders { id } }"))
+    assert not is_read_only(gql("mutation { delete_orders(where: {}) { affected_rows } }"))
+
+
+def test_fast_primary_is_not_hedged():
+    hedger = warmed_hedger()
+    call, calls = scripted_call([0])
+
+    assert asyncio.run(hedger.run(call)) == 0
+    assert calls == [0]
+    assert hedger.stats["hedges_fired"] == 0
+
+
+def test_slow_primary_is_hedged_and_hedge_wins():
+    hedger = warmed_hedger()
+    call, calls = scripted_call([1, 0])
+
+    assert asyncio.run(asyncio.wait_for(hedger.run(call), timeout=0.5)) == 1
+    assert calls == [0, 1]
+    assert hedger.stats["hedges_fired"] == 1
+    assert hedger.stats["hedges_won"] == 1
+
+
+def test_cancelled_primary_is_sampled_as_a_lower_bound():
+    hedger = warmed_hedger(latency=0.05)
+    call, calls = scripted_call([1, 0.05])
+
+    asyncio.run(asyncio.wait_for(hedger.run(call), timeout=0.5))
+    # The primary ran for the hedge delay plus the hedge's own time before it was cancelled
+    assert hedger.tracker.ordered[-1] >= 0.1
+
+
+def test_no_hedging_before_enough_samples():
+    hedger = Hedger(min_samples=5)
+    call, calls = scripted_call([0.05])
+
+    asyncio.run(hedger.run(call))
+    assert calls == [0]
+
+
+def test_budget_caps_hedges():
+    hedger = warmed_hedger(budget_ratio=0)
+    hedger.budget.tokens = 1
+
+    async def run():
+        for _ in range(3):
+            call, _ = scripted_call([0.03, 0.03])
+            await hedger.run(call)
+
+    asyncio.run(run())
+    assert hedger.stats["hedges_fired"] == 1
+    assert hedger.stats["budget_exhausted"] == 2
+
+
+def test_hedge_covers_failed_primary():
+    hedger = warmed_hedger()
+
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        if len(attempts) == 1:
+            await asyncio.sleep(0.03)
+            raise ConnectionError("primary dropped")
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    assert asyncio.run(hedger.run(call)) == "ok"
+
+
+def test_budget_refills_per_request():
+    budget = HedgeBudget(ratio=0.5, burst=1)
+    budget.tokens = 0
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+
+
+def test_tracker_percentile_matches_a_sorted_window():
+    rng = random.Random(1)
+    tracker = LatencyTracker(window=50, min_samples=5)
+    samples = []
+    for _ in range(500):
+        sample = round(rng.uniform(0, 1), 2)
+        tracker.record(sample)
+        samples = (samples + [sample])[-50:]
+        ordered = sorted(samples)
+        expected = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if len(ordered) >= 5 else None
+        assert tracker.percentile(95) == expected
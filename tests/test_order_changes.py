@@ -0,0 +1,102 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import main
+from pagination import InvalidCursorError, build_changes_where, decode_change_token, encode_change_token, normalize_since
+from tests.hasura_filters import matches
+
+ROWS = [
+    {"id": f"id-{i:02d}", "status": "created", "user_id": "12345", "updated_at": f"2024-01-01T00:00:{i // 2:02d}"}
+    for i in range(7)
+]
+
+
+@pytest.fixture
+def api(monkeypatch, user_client, redis_cache):
+    """Test client with a valid token and an in-memory orders table"""
+    calls = []
+
+    async def execute_read(query, variables=None, headers=None):
+        calls.append(variables)
+        rows = sorted(ROWS + user_client.recent, key=lambda r: (r["updated_at"], r["id"]))
+        rows = [row for row in rows if matches(row, variables["where"])]
+        return {"orders": rows[:variables["limit"]]}
+
+    monkeypatch.setattr(main, "execute_read", execute_read)
+    user_client.calls = calls
+    user_client.recent = []
+    return user_client
+
+
+def test_change_token_round_trip():
+    assert decode_change_token(encode_change_token("2024-01-01T00:00:01", "id-02")) == ("2024-01-01T00:00:01", "id-02")
+    assert decode_change_token(encode_change_token("2024-01-01T00:00:01")) == ("2024-01-01T00:00:01", None)
+    with pytest.raises(InvalidCursorError):
+        decode_change_token("not-a-token")
+    with pytest.raises(InvalidCursorError):
+        normalize_since("yesterday")
+    assert build_changes_where(None) == {}
+    assert build_changes_where(None, until="2024-01-02") == {"updated_at": {"_lte": "2024-01-02"}}
+
+
+def test_changes_page_through_every_order_once(api):
+    seen = []
+    params = {"limit": 3}
+    while True:
+        delta = api.get("/api/orders/changes", params=params).json()
+        seen.extend(row["id"] for row in delta["orders"])
+        params = {"limit": 3, "token": delta["next_token"]}
+        if not delta["has_more"]:
+            break
+
+    assert seen == [row["id"] for row in ROWS]
+    # Caught up: nothing new, and the position is kept
+    delta = api.get("/api/orders/changes", params=params).json()
+    assert delta["orders"] == []
+    assert delta["next_token"] == params["token"]
+
+
+def test_since_returns_only_later_changes(api):
+    delta = api.get("/api/orders/changes", params={"since": "2024-01-01T00:00:02"}).json()
+    assert [row["id"] for row in delta["orders"]] == ["id-06"]
+    assert api.calls[-1]["where"]["_and"][0] == {"updated_at": {"_gt": "2024-01-01T00:00:02"}}
+    assert api.calls[-1]["order_by"] == [{"updated_at": "asc"}, {"id": "asc"}]
+
+
+def test_repeated_polls_are_cached_until_orders_change(api):
+    params = {"since": "2024-01-01T00:00:02"}
+    api.get("/api/orders/changes", params=params)
+    api.get("/api/orders/changes", params={"since": "2024-01-01T00:00:02.000000"})
+    assert len(api.calls) == 1
+
+    asyncio.run(main.invalidate_cache_tags(main.order_change_tags(["12345"])))
+    api.get("/api/orders/changes", params=params)
+    assert len(api.calls) == 2
+
+
+def test_invalid_parameters(api):
+    assert api.get("/api/orders/changes", params={"since": "soon"}).status_code == 400
+    assert api.get("/api/orders/changes", params={"token": "???"}).status_code == 400
+    assert api.get("/api/orders/changes", params={"since": "2024-01-01", "token": "x"}).status_code == 400
+
+
+def test_token_stays_behind_changes_still_being_committed(api, redis_cache, monkeypatch):
+    monkeypatch.setattr(main, "ORDERS_CHANGES_SAFETY_LAG_SECONDS", 60)
+    delta = api.get("/api/orders/changes").json()
+    # A transaction started before the newest change commits only now
+    now = datetime.now(timezone.utc)
+    api.recent.append({"id": "id-late", "status": "created", "user_id": "12345",
+                       "updated_at": (now - timedelta(seconds=2)).isoformat()})
+    api.recent.append({"id": "id-new", "status": "created", "user_id": "12345",
+                       "updated_at": (now - timedelta(seconds=1)).isoformat()})
+
+    delta = api.get("/api/orders/changes", params={"token": delta["next_token"]}).json()
+    assert delta["orders"] == []
+    assert decode_change_token(delta["next_token"]) == ("2024-01-01T00:00:03", "id-06")
+
+    monkeypatch.setattr(main, "ORDERS_CHANGES_SAFETY_LAG_SECONDS", 0)
+    redis_cache.data.clear()
+    delta = api.get("/api/orders/changes", params={"token": delta["next_token"]}).json()
+    assert [row["id"] for row in delta["orders"]] == ["id-late", "id-new"]
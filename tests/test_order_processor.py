@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from order_processor import OrderProcessor, OrderQueueFull, OrderStatus
+
+DELAYS = {"validate": 0.02, "payment": 0.04, "finalize": 0.02}
+
+
+def order(n=0, total=10.0):
+    return {"order_id": f"ORD-{n}", "items": [{"product_id": "p", "quantity": 1, "price": total}], "total": total}
+
+
+def test_workers_process_orders_concurrently_without_blocking_the_loop():
+    processor = OrderProcessor(workers=4, stage_delays=DELAYS)
+    lags = []
+
+    async def ticker():
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append(time.perf_counter() - start - 0.005)
+
+    async def run():
+        tick = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        for n in range(8):
+            await processor.submit(order(n))
+        await processor.stop(drain_timeout=5)
+        tick.cancel()
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(run())
+    # Two rounds of four orders, each taking 0.08 s
+    assert elapsed < 0.4
+    assert max(lags) < 0.05
+    assert processor.stats["completed"] == 8
+    assert all(processor.store.get(f"ORD-{n}")["status"] == OrderStatus.COMPLETED for n in range(8))
+
+
+def test_queue_is_bounded():
+    processor = OrderProcessor(workers=1, queue_size=2, stage_delays=DELAYS)
+
+    async def run():
+        ids = [await processor.submit(order(n)) for n in range(2)]
+        with pytest.raises(OrderQueueFull):
+            await processor.submit(order(9))
+        assert processor.get_state()["queued"] == 2
+        await processor.stop(drain_timeout=5)
+        return ids
+
+    assert asyncio.run(run()) == ["ORD-0", "ORD-1"]
+    assert processor.stats["rejected"] == 1
+    assert processor.store.get("ORD-9") is None
+
+
+def test_cpu_hooks_run_off_the_loop_and_can_fail_orders():
+    processor = OrderProcessor(workers=2, stage_delays=DELAYS)
+    threads = []
+
+    def check_items(order_id, order_data):
+        threads.append(threading.current_thread())
+        if order_data["total"] > 100:
+            raise ValueError("Order total over the fraud limit")
+
+    processor.add_cpu_hook("validate", check_items)
+
+    async def run():
+        ok = await processor.process_order(order(1))
+        rejected = await processor.process_order(order(2, total=500))
+        return ok, rejected
+
+    ok, rejected = asyncio.run(run())
+    assert ok["status"] == OrderStatus.COMPLETED
+    assert rejected["status"] == OrderStatus.FAILED
+    assert "fraud limit" in rejected["message"]
+    assert threading.main_thread() not in threads
+
+
+def test_orders_endpoint_queues_and_reports_full_queue(monkeypatch):
+    processor = OrderProcessor(workers=1, queue_size=1, stage_delays={"validate": 10})
+    monkeypatch.setattr(main.order_routes, "order_processor", processor)
+    monkeypatch.setattr(main.app, "dependency_overrides", {})
+    token = main.create_access_token({"sub": "12345", "role": "user"})
+    headers = {"Authorization": f"Bearer {token}"}
+    body = {"user_id": "u", "items": [{"product_id": "p", "name": "P", "quantity": 2, "price": 5}]}
+
+    with TestClient(main.app) as client:
+        first = client.post("/orders/", json=body, headers=headers)
+        assert first.status_code == 200
+        assert first.json()["order_id"].startswith("ORD-")
+        second = client.post("/orders/", json=body, headers=headers)
+        third = client.post("/orders/", json=body, headers=headers)
+        assert [second.status_code, third.status_code].count(503) >= 1
+        assert client.get(f"/orders/{first.json()['order_id']}", headers=headers).json()["status"] in ("pending", "processing")
@@ -0,0 +1,29 @@
+import pytest
+from graphql import print_ast
+
+from order_queries import ORDER_FIELDS, InvalidProjectionError, parse_projection, orders_list_query, orders_page_query, project_rows
+
+
+def test_projection_is_canonical():
+    assert parse_projection(None) == ORDER_FIELDS
+    assert parse_projection("created_at, status,status") == ("status", "created_at")
+
+
+def test_projection_rejects_unknown_fields():
+    with pytest.raises(InvalidProjectionError):
+        parse_projection("status,__typename")
+    with pytest.raises(InvalidProjectionError):
+        parse_projection(" , ")
+
+
+def test_documents_are_compiled_once_per_projection():
+    projection = parse_projection("status")
+    assert orders_list_query(projection) is orders_list_query(parse_projection("status"))
+    assert "details" not in print_ast(orders_list_query(projection))
+
+
+def test_page_query_always_selects_keyset_fields():
+    document = print_ast(orders_page_query(("status",)))
+    assert "id" in document and "created_at" in document
+    rows = [{"status": "created", "id": "1", "created_at": "t"}]
+    assert project_rows(rows, ("status",)) == [{"status": "created"}]
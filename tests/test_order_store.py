@@ -0,0 +1,164 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from order_processor import OrderProcessor, OrderStatus
+from order_store import MemoryOrderStore, OrderStore, SQLiteOrderStore
+
+DELAYS = {"validate": 0, "payment": 0, "finalize": 0}
+
+
+def order(n, total=10.0):
+    return {"order_id": f"ORD-{n}", "items": [{"product_id": "p", "quantity": 1, "price": total}], "total": total}
+
+
+def fill(store, finished, open_orders=0, start=1000.0):
+    for n in range(finished + open_orders):
+        store.create(f"ORD-{n}", order(n), "pending", start + n, "Order received")
+        if n < finished:
+            store.transition(f"ORD-{n}", "completed", start + n, "done")
+
+
+def test_memory_store_evicts_oldest_finished_orders_by_count():
+    store = MemoryOrderStore(max_finished=3, finished_ttl=None)
+    fill(store, finished=5, open_orders=2)
+    assert len(store) == 5
+    assert store.get("ORD-0") is None and store.get("ORD-1") is None
+    assert store.get("ORD-2")["status"] == "completed"
+    # Open orders are never evicted
+    assert store.get("ORD-6")["status"] == "pending"
+    assert store.get_state()["evicted"] == 2
+
+
+def test_memory_store_evicts_finished_orders_by_age():
+    store = MemoryOrderStore(max_finished=100, finished_ttl=10)
+    fill(store, finished=3)
+    assert store.prune(now=1011.5) == 2
+    assert "ORD-2" in store and "ORD-1" not in store
+
+
+def test_memory_store_records_are_compact():
+    store = MemoryOrderStore(history_size=4, max_messages=2)
+    store.create("ORD-1", order(1), OrderStatus.PENDING, 1.0, "Order received")
+    for n in range(4):
+        store.transition("ORD-1", OrderStatus.PROCESSING, 2.0 + n, f"step {n}")
+    assert store.get_data("ORD-1") == order(1)
+
+    record = store.orders["ORD-1"]
+    assert not hasattr(record, "__dict__")
+    # The oldest entry is dropped; "step 0" is a shared message, later ones did not fit the table
+    assert record.history == ((1, 2.0, 1), (1, 3.0, "step 1"), (1, 4.0, "step 2"), (1, 5.0, "step 3"))
+    assert store.get("ORD-1") == {
+        "order_id": "ORD-1", "status": OrderStatus.PROCESSING, "created_at": 1.0, "updated_at": 5.0,
+        "history": [{"status": "processing", "timestamp": 2.0, "message": "step 0"},
+                    {"status": "processing", "timestamp": 3.0, "message": "step 1"},
+                    {"status": "processing", "timestamp": 4.0, "message": "step 2"},
+                    {"status": "processing", "timestamp": 5.0, "message": "step 3"}]
+    }
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryOrderStore()
+    return SQLiteOrderStore(str(tmp_path / "orders.db"))
+
+
+def test_processor_reads_through_the_store(store):
+    processor = OrderProcessor(stage_delays=DELAYS, store=store)
+
+    async def run():
+        await processor.process_order(order(1))
+        await processor.process_order(order(2, total=0))
+        return [await processor.get_order_status(f"ORD-{n}") for n in range(1, 4)]
+
+    done, failed, missing = asyncio.run(run())
+    assert done["status"] == OrderStatus.COMPLETED
+    assert [entry["status"] for entry in done["history"]] == ["pending", "processing", "completed"]
+    assert done["history"][0]["message"] == "Order received"
+    assert failed["status"] == OrderStatus.FAILED
+    assert missing is None
+    # The memory store releases the payload of finished orders
+    assert store.get_data("ORD-1") == (order(1) if isinstance(store, SQLiteOrderStore) else None)
+    with pytest.raises(ValueError):
+        asyncio.run(processor._update_order_status("ORD-3", OrderStatus.CANCELLED))
+
+
+def test_sqlite_store_survives_restart_and_prunes(tmp_path):
+    path = str(tmp_path / "orders.db")
+    store = SQLiteOrderStore(path, finished_ttl=10, prune_every=1000)
+    fill(store, finished=3, open_orders=1)
+    assert sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    store.close()
+
+    reopened = SQLiteOrderStore(path, finished_ttl=10)
+    assert len(reopened) == 4
+    assert reopened.get("ORD-3")["history"] == [{"status": "pending", "timestamp": 1003.0, "message": "Order received"}]
+    assert reopened.prune(now=1011.5) == 2
+    assert reopened.get("ORD-0") is None
+    assert [n for n in range(4) if f"ORD-{n}" in reopened] == [2, 3]
+
+
+def test_incomplete_store_cannot_be_created():
+    class NoHistory(OrderStore):
+        def create(self, *args):
+            pass
+
+    with pytest.raises(TypeError):
+        NoHistory()
+
+
+def test_sqlite_store_is_safe_across_threads(tmp_path):
+    store = SQLiteOrderStore(str(tmp_path / "orders.db"), prune_every=7)
+    assert store.blocking
+
+    def work(thread):
+        for n in range(50):
+            order_id = f"ORD-{thread}-{n}"
+            store.create(order_id, order(n), "pending", 1000.0 + n, "Order received")
+            store.transition(order_id, "completed", 1001.0 + n, "Done")
+            assert store.get(order_id)["status"] == "completed"
+
+    threads = [threading.Thread(target=work, args=(t,)) for t in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(store) == 400
+
+
+class RemoteStore(MemoryOrderStore):
+    """Memory store flagged as remote, recording the threads it is called from"""
+
+    blocking = True
+
+    def __init__(self):
+        super().__init__()
+        self.threads = set()
+
+    def create(self, *args):
+        self.threads.add(threading.current_thread())
+        super().create(*args)
+
+    def transition(self, *args):
+        self.threads.add(threading.current_thread())
+        super().transition(*args)
+
+    def get(self, order_id):
+        self.threads.add(threading.current_thread())
+        return super().get(order_id)
+
+
+def test_blocking_store_is_called_off_the_loop():
+    store = RemoteStore()
+    processor = OrderProcessor(stage_delays=DELAYS, store=store)
+
+    async def run():
+        order_id = await processor.submit(order(1))
+        await processor.stop(drain_timeout=5)
+        return await processor.get_order_status(order_id)
+
+    assert asyncio.run(run())["status"] == OrderStatus.COMPLETED
+    assert store.threads and threading.main_thread() not in store.threads
@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+import pytest
+
+from order_processor import OrderProcessor, OrderStatus
+from order_store import MemoryOrderStore
+from order_stream import LocalOrderStream, OrderQueueFull
+
+DELAYS = {"validate": 0.01, "payment": 0.02, "finalize": 0.01}
+
+
+def order(total=10.0):
+    return {"items": [{"product_id": "p", "quantity": 1, "price": total}], "total": total}
+
+
+def test_consumer_group_delivers_each_entry_once():
+    stream = LocalOrderStream(max_backlog=3)
+    for n in range(3):
+        stream.publish(f"ORD-{n}", {"n": n})
+    with pytest.raises(OrderQueueFull):
+        stream.publish("ORD-9", {})
+
+    first = stream.read("a", 2, block_ms=0)
+    second = stream.read("b", 2, block_ms=0)
+    assert [order_id for _, order_id, _ in first + second] == ["ORD-0", "ORD-1", "ORD-2"]
+    assert stream.read("b", 1, block_ms=10) == []
+
+    stream.ack(first[0][0])
+    stream.publish("ORD-3", {"n": 3})
+    assert stream.get_state() == {"backend": "LocalOrderStream", "waiting": 1, "pending": 2}
+
+
+def test_unacknowledged_entries_are_claimed_after_idle_time():
+    stream = LocalOrderStream()
+    stream.publish("ORD-1", {})
+    (entry,) = stream.read("dead", 1, block_ms=0)
+    assert stream.claim_stale("alive", idle_ms=50, count=10) == []
+    time.sleep(0.06)
+    assert stream.claim_stale("alive", idle_ms=50, count=10) == [entry]
+
+
+def test_processors_share_orders_and_status():
+    stream, store = LocalOrderStream(), MemoryOrderStore()
+    processors = [OrderProcessor(workers=2, stage_delays=DELAYS, store=store, stream=stream,
+                                 consumer=f"worker-{n}", read_block_ms=20) for n in range(2)]
+
+    async def run():
+        for processor in processors:
+            processor.start()
+        ids = [await processors[0].submit(order()) for _ in range(8)]
+        for _ in range(100):
+            statuses = [await processors[1].get_order_status(i) for i in ids]
+            if all(status["status"] == OrderStatus.COMPLETED for status in statuses):
+                break
+            await asyncio.sleep(0.02)
+        for processor in processors:
+            await processor.stop()
+        return ids
+
+    ids = asyncio.run(run())
+    # Submitted on one processor, readable and processed on both
+    assert all(processors[1].store.get(i)["status"] == OrderStatus.COMPLETED for i in ids)
+    assert processors[0].stats["completed"] > 0 and processors[1].stats["completed"] > 0
+    assert processors[0].stats["completed"] + processors[1].stats["completed"] == 8
+    assert stream.get_state() == {"backend": "LocalOrderStream", "waiting": 0, "pending": 0}
+
+
+def test_full_stream_cancels_the_order():
+    processor = OrderProcessor(workers=1, stage_delays={"validate": 10}, stream=LocalOrderStream(max_backlog=1))
+
+    async def run():
+        await processor.submit({**order(), "order_id": "ORD-1"})
+        with pytest.raises(OrderQueueFull):
+            await processor.submit({**order(), "order_id": "ORD-2"})
+        await processor.stop()
+
+    asyncio.run(run())
+    assert processor.store.get("ORD-2")["status"] == OrderStatus.CANCELLED
+    assert processor.stats["rejected"] == 1
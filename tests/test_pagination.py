@@ -0,0 +1,118 @@
+import asyncio
+import json
+import pytest
+
+import deadlines
+import main
+from pagination import encode_cursor, decode_cursor, build_keyset_where, split_page, InvalidCursorError
+from tests.hasura_filters import matches
+
+ROWS = [
+    {"id": f"id-{i:02d}", "status": "created", "user_id": "12345", "details": {}, "created_at": f"2024-01-01T00:00:{i // 2:02d}"}
+    for i in range(7)
+]
+
+
+@pytest.fixture
+def api(monkeypatch, user_client):
+    """Test client with a valid token and an in-memory orders table"""
+    calls = []
+
+    async def execute_read(query, variables=None, headers=None):
+        calls.append(variables)
+        rows = sorted(ROWS, key=lambda r: (r["created_at"], r["id"]), reverse=True)
+        rows = [row for row in rows if matches(row, variables["where"])]
+        return {"orders": rows[:variables["limit"]]}
+
+    monkeypatch.setattr(main, "execute_read", execute_read)
+    user_client.calls = calls
+    return user_client
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(ROWS[3])
+    assert decode_cursor(cursor) == (ROWS[3]["created_at"], ROWS[3]["id"])
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("not-a-cursor")
+
+
+def test_first_page_has_no_filter():
+    assert build_keyset_where(None) == {}
+
+
+def test_split_page():
+    assert split_page(ROWS[:2], 2) == (ROWS[:2], None)
+    page, cursor = split_page(ROWS[:3], 2)
+    assert page == ROWS[:2]
+    assert decode_cursor(cursor)[1] == ROWS[1]["id"]
+
+
+def test_pages_cover_all_orders_once(api):
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        response = api.get("/api/orders", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["orders"]) <= 3
+        seen.extend(row["id"] for row in page["orders"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert sorted(seen) == sorted(row["id"] for row in ROWS)
+    assert len(seen) == len(set(seen))
+
+
+def test_invalid_cursor_is_rejected(api):
+    response = api.get("/api/orders", params={"limit": 3, "cursor": "garbage"})
+    assert response.status_code == 400
+
+
+def test_stream_pages_through_hasura(api, monkeypatch):
+    monkeypatch.setattr(main, "ORDERS_STREAM_PAGE_SIZE", 2)
+
+    response = api.get("/api/orders/stream")
+
+    assert response.status_code == 200
+    body = json.loads(response.text)
+    assert [row["id"] for row in body["orders"]] == [row["id"] for row in sorted(ROWS, key=lambda r: (r["created_at"], r["id"]), reverse=True)]
+    assert all(call["limit"] == 3 for call in api.calls)
+    assert len(api.calls) == 4
+
+
+def test_projection_limits_selected_and_returned_fields(api):
+    response = api.get("/api/orders", params={"limit": 2, "fields": "status"})
+
+    assert response.status_code == 200
+    page = response.json()
+    assert all(list(row) == ["status"] for row in page["orders"])
+    assert page["next_cursor"] is not None
+
+
+def test_unknown_projection_field_is_rejected(api):
+    response = api.get("/api/orders", params={"fields": "status,password"})
+    assert response.status_code == 400
+
+
+def test_stream_outlives_request_budget(api, monkeypatch):
+    slow_read = main.execute_read
+
+    async def execute_read(query, variables=None, headers=None):
+        await deadlines.bounded(asyncio.sleep(0.05))
+        return await slow_read(query, variables, headers)
+
+    monkeypatch.setattr(main, "execute_read", execute_read)
+    monkeypatch.setattr(main, "ORDERS_STREAM_PAGE_SIZE", 2)
+    monkeypatch.setitem(main.ROUTE_DEADLINES, "/api/orders/stream", 0.1)
+    monkeypatch.setattr(main, "ORDERS_STREAM_PAGE_DEADLINE_SECONDS", 0.1)
+
+    # Four pages of 50 ms each: twice the request's budget, but each page fits its own
+    response = api.get("/api/orders/stream")
+
+    body = json.loads(response.text)
+    assert "error" not in body
+    assert len(body["orders"]) == len(ROWS)
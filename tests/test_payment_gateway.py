@@ -0,0 +1,123 @@
+import asyncio
+
+from order_processor import OrderProcessor, OrderStatus
+from payment_gateway import HTTPPaymentGateway, PaymentBatcher, PaymentGateway, PaymentGatewayError, PaymentResult
+from payment_gateway_stand_in import PaymentGatewayStandIn
+
+DELAYS = {"validate": 0, "finalize": 0}
+
+
+def order(order_id, total=10.0):
+    return {"order_id": order_id, "items": [{"product_id": "p", "quantity": 1, "price": total}], "total": total}
+
+
+async def with_stand_in(stand_in, run, **gateway_options):
+    url = await stand_in.start()
+    gateway = HTTPPaymentGateway(url, **gateway_options)
+    try:
+        return await run(gateway)
+    finally:
+        await gateway.close()
+        await stand_in.stop()
+
+
+def test_concurrent_payments_share_one_gateway_call():
+    stand_in = PaymentGatewayStandIn(latency="fixed:20", seed=1)
+
+    async def run(gateway):
+        batcher = PaymentBatcher(gateway, window_ms=10)
+        results = await asyncio.gather(*(batcher.authorize(f"ORD-{n}", 5.0) for n in range(20)))
+        return batcher, results
+
+    batcher, results = asyncio.run(with_stand_in(stand_in, run))
+    assert [result.order_id for result in results] == [f"ORD-{n}" for n in range(20)]
+    assert all(result.approved and result.authorization_id for result in results)
+    assert stand_in.stats["requests"] == 1
+    assert batcher.get_state()["avg_batch_size"] == 20
+
+
+def test_batches_flush_at_max_size():
+    stand_in = PaymentGatewayStandIn(seed=1)
+
+    async def run(gateway):
+        batcher = PaymentBatcher(gateway, window_ms=1000, max_batch_size=4)
+        await asyncio.wait_for(asyncio.gather(*(batcher.authorize(f"ORD-{n}", 5.0) for n in range(8))), 1)
+
+    asyncio.run(with_stand_in(stand_in, run))
+    assert stand_in.stats["requests"] == 2
+
+
+def test_declines_fail_only_their_own_payment():
+    stand_in = PaymentGatewayStandIn(seed=1, amount_limit=100)
+
+    async def run(gateway):
+        batcher = PaymentBatcher(gateway, window_ms=10)
+        return await asyncio.gather(batcher.authorize("ORD-1", 5.0), batcher.authorize("ORD-2", 500.0))
+
+    ok, declined = asyncio.run(with_stand_in(stand_in, run))
+    assert ok.approved
+    assert not declined.approved and declined.error == "Amount over limit"
+
+
+def test_rejected_batch_is_retried_payment_by_payment():
+    stand_in = PaymentGatewayStandIn(seed=1)
+
+    async def run(gateway):
+        batcher = PaymentBatcher(gateway, window_ms=10)
+        results = await asyncio.gather(batcher.authorize("ORD-1", 5.0), batcher.authorize("ORD-2", -1),
+                                       batcher.authorize("ORD-3", 5.0), return_exceptions=True)
+        return batcher, results
+
+    batcher, (first, bad, third) = asyncio.run(with_stand_in(stand_in, run))
+    assert first.approved and third.approved
+    assert isinstance(bad, PaymentGatewayError)
+    assert batcher.stats["split_retries"] == 1
+    # The rejected call and the failed retry are not counted as answered batches
+    assert (batcher.stats["batches"], batcher.stats["payments"]) == (2, 2)
+
+
+def test_gateway_errors_fail_the_batch():
+    stand_in = PaymentGatewayStandIn(error_rate=1, seed=1)
+
+    async def run(gateway):
+        batcher = PaymentBatcher(gateway, window_ms=10)
+        return await asyncio.gather(batcher.authorize("ORD-1", 5.0), batcher.authorize("ORD-2", 5.0),
+                                    return_exceptions=True)
+
+    results = asyncio.run(with_stand_in(stand_in, run))
+    assert all(isinstance(result, PaymentGatewayError) for result in results)
+
+
+class ScriptedGateway(PaymentGateway):
+    """Approves payments up to a limit and declines the rest"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.batches = []
+
+    async def authorize(self, payments):
+        self.batches.append(len(payments))
+        return [PaymentResult(p["order_id"], p["amount"] <= self.limit, "AUTH-1", None if p["amount"] <= self.limit else "Card declined")
+                for p in payments]
+
+
+def test_order_processor_authorizes_through_the_batcher():
+    gateway = ScriptedGateway(limit=100)
+    processor = OrderProcessor(workers=8, stage_delays=DELAYS, payments=PaymentBatcher(gateway, window_ms=10))
+
+    async def run():
+        ids = [await processor.submit(order(f"ORD-{n}", 500.0 if n == 3 else 10.0)) for n in range(8)]
+        for _ in range(100):
+            if processor.stats["completed"] + processor.stats["failed"] == len(ids):
+                break
+            await asyncio.sleep(0.01)
+        await processor.stop()
+        return ids
+
+    ids = asyncio.run(run())
+    assert gateway.batches == [8]
+    statuses = {i: processor.store.get(i) for i in ids}
+    assert statuses["ORD-3"]["status"] == OrderStatus.FAILED
+    assert "Payment declined: Card declined" in statuses["ORD-3"]["history"][-1]["message"]
+    assert sum(s["status"] == OrderStatus.COMPLETED for s in statuses.values()) == 7
+    assert processor.get_state()["payments"]["declined"] == 1
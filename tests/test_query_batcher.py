@@ -0,0 +1,187 @@
+import asyncio
+from gql import gql
+from gql.transport.exceptions import TransportQueryError
+from graphql import print_ast
+
+import query_batcher
+from order_queries import INSERT_ORDERS_MUTATION
+from query_batcher import QueryBatcher, InsertBatcher, is_batchable
+
+ORDERS_QUERY = gql('''
+    query GetOrders($status: String) {
+        orders(where: {status: {_eq: $status}}) {
+            id
+            status
+        }
+    }
+''')
+
+PROFILE_QUERY = gql('''
+    query GetProfile {
+        users {
+            id
+        }
+    }
+''')
+
+
+class RecordingExecutor:
+    """Fake Hasura executor that records every call"""
+
+    def __init__(self, fail_on=None):
+        self.calls = []
+        self.fail_on = fail_on
+
+    async def __call__(self, document, variables=None, headers=None):
+        self.calls.append((print_ast(document), variables, headers))
+        text = print_ast(document)
+        if self.fail_on and self.fail_on in text and "Batched" in text:
+            raise TransportQueryError("bad field")
+        result = {}
+        for field in document.definitions[0].selection_set.selections:
+            key = (field.alias or field.name).value
+            result[key] = {"key": key, "variables": variables}
+        return result
+
+
+def test_is_batchable():
+    assert is_batchable(ORDERS_QUERY)
+    assert not is_batchable(gql("mutation { delete_orders(where: {}) { affected_rows } }"))
+    assert not is_batchable(gql("query { ...F } fragment F on query_root { orders { id } }"))
+
+
+def test_concurrent_queries_share_one_round_trip():
+    executor = RecordingExecutor()
+    headers = {"x-hasura-role": "user", "x-hasura-user-id": "1"}
+
+    async def run():
+        batcher = QueryBatcher(executor, window_ms=5)
+        return await asyncio.gather(
+            batcher.load(ORDERS_QUERY, {"status": "created"}, headers),
+            batcher.load(PROFILE_QUERY, None, headers),
+        )
+
+    orders, profile = asyncio.run(run())
+
+    assert len(executor.calls) == 1
+    document, variables, sent_headers = executor.calls[0]
+    assert "b0_orders: orders" in document
+    assert "$b0_status" in document
+    assert variables == {"b0_status": "created"}
+    assert sent_headers == headers
+    assert list(orders) == ["orders"]
+    assert list(profile) == ["users"]
+
+
+def test_batches_are_grouped_per_header_set():
+    executor = RecordingExecutor()
+
+    async def run():
+        batcher = QueryBatcher(executor, window_ms=5)
+        return await asyncio.gather(
+            batcher.load(ORDERS_QUERY, None, {"x-hasura-role": "user", "x-hasura-user-id": "1"}),
+            batcher.load(ORDERS_QUERY, None, {"x-hasura-role": "admin", "x-hasura-user-id": "2"}),
+        )
+
+    asyncio.run(run())
+
+    roles = sorted(call[2]["x-hasura-role"] for call in executor.calls)
+    assert roles == ["admin", "user"]
+
+
+def test_identical_queries_are_deduplicated():
+    query_batcher.reset_metrics()
+    executor = RecordingExecutor()
+
+    async def run():
+        batcher = QueryBatcher(executor, window_ms=5)
+        return await asyncio.gather(*(batcher.load(ORDERS_QUERY, None, {"x-hasura-user-id": "1"}) for _ in range(3)))
+
+    results = asyncio.run(run())
+
+    assert len(executor.calls) == 1
+    assert "Batched" not in executor.calls[0][0]
+    assert all(result == results[0] for result in results)
+    summary = query_batcher.get_summary()
+    assert summary["size_distribution"] == {"3": 1}
+    assert summary["deduplicated"] == 2
+
+
+def test_graphql_error_falls_back_to_individual_queries():
+    executor = RecordingExecutor(fail_on="users")
+
+    async def run():
+        batcher = QueryBatcher(executor, window_ms=5)
+        return await asyncio.gather(
+            batcher.load(ORDERS_QUERY, None, {}),
+            batcher.load(PROFILE_QUERY, None, {}),
+        )
+
+    orders, profile = asyncio.run(run())
+
+    assert len(executor.calls) == 3
+    assert "orders" in orders and "users" in profile
+
+
+def test_max_batch_size_flushes_early():
+    executor = RecordingExecutor()
+
+    async def run():
+        batcher = QueryBatcher(executor, window_ms=1000, max_batch_size=2)
+        return await asyncio.wait_for(asyncio.gather(
+            batcher.load(ORDERS_QUERY, {"status": "a"}, {}),
+            batcher.load(ORDERS_QUERY, {"status": "b"}, {}),
+        ), timeout=0.5)
+
+    first, second = asyncio.run(run())
+
+    assert len(executor.calls) == 1
+    assert first["orders"]["key"] == "b0_orders"
+    assert second["orders"]["key"] == "b1_orders"
+
+
+class InsertExecutor:
+    """Fake Hasura insert that returns one row per object"""
+
+    def __init__(self, reject=None):
+        self.calls = []
+        self.reject = reject
+
+    async def __call__(self, document, variables=None, headers=None):
+        objects = variables["objects"]
+        self.calls.append((objects, headers))
+        if self.reject and any(obj["details"] == self.reject for obj in objects):
+            raise TransportQueryError("check constraint violated")
+        return {"insert_orders": {"returning": [{"id": obj["details"]["n"]} for obj in objects]}}
+
+
+def test_concurrent_inserts_share_one_mutation():
+    executor = InsertExecutor()
+    headers = {"x-hasura-role": "user", "x-hasura-user-id": "1"}
+
+    async def run():
+        batcher = InsertBatcher(executor, INSERT_ORDERS_MUTATION, window_ms=5)
+        return await asyncio.gather(*(batcher.insert({"user_id": "1", "details": {"n": n}}, headers) for n in range(4)))
+
+    rows = asyncio.run(run())
+
+    assert len(executor.calls) == 1
+    assert executor.calls[0][1] == headers
+    assert [row["id"] for row in rows] == [0, 1, 2, 3]
+
+
+def test_rejected_insert_only_fails_its_caller():
+    executor = InsertExecutor(reject={"n": 1})
+
+    async def run():
+        batcher = InsertBatcher(executor, INSERT_ORDERS_MUTATION, window_ms=5)
+        return await asyncio.gather(
+            *(batcher.insert({"user_id": "1", "details": {"n": n}}, {}) for n in range(3)),
+            return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+
+    assert results[0] == {"id": 0} and results[2] == {"id": 2}
+    assert isinstance(results[1], TransportQueryError)
+    assert query_batcher.write_batch_metrics["split_retries"] >= 1
@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+import main
+from rate_limiter import LocalRateLimitBackend, RateLimit, RateLimitMiddleware, RateLimiter, parse_rate, parse_rate_limits
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_parse_rules():
+    assert parse_rate("10/second") == (10, 1)
+    assert parse_rate("30/minutes") == (30, 60)
+    assert parse_rate("5/2.5") == (5, 2.5)
+    rules = parse_rate_limits('{"/a": {"*": "2/second", "admin": {"rate": "60/minute", "burst": 5, "scope": "role"}}}')
+    assert rules["/a"]["*"] == RateLimit(2, 1, 2, "user")
+    assert rules["/a"]["admin"] == RateLimit(60, 60, 5, "role")
+    for raw in ('{"/a": {"*": "0/second"}}', '{"/a": {"*": "1/fortnight"}}', '{"/a": {"*": {"burst": 1}}}',
+                '{"/a": {"*": {"rate": "1/second", "scope": "tenant"}}}'):
+        with pytest.raises(ValueError):
+            parse_rate_limits(raw)
+
+
+def test_bucket_allows_a_burst_then_refills():
+    clock = Clock()
+    backend = LocalRateLimitBackend(clock=clock)
+    rule = RateLimit(limit=2, period=1, burst=3)
+
+    async def run():
+        results = [await backend.hit("k", rule) for _ in range(4)]
+        assert [allowed for allowed, _, _ in results] == [True, True, True, False]
+        assert [remaining for _, _, remaining in results[:3]] == [2, 1, 0]
+        assert results[3][1] == pytest.approx(0.5)
+        clock.now += 0.5
+        assert (await backend.hit("k", rule))[0]
+        assert not (await backend.hit("k", rule))[0]
+        clock.now += 10
+        assert backend.prune() == 1
+
+    asyncio.run(run())
+
+
+def test_rules_by_route_role_and_scope():
+    clock = Clock()
+    rules = parse_rate_limits('{"/api/orders": {"*": "1/second", "admin": "3/second"},'
+                              ' "/api/*": {"*": {"rate": "1/second", "scope": "role"}}}')
+    limiter = RateLimiter(rules, LocalRateLimitBackend(clock=clock))
+
+    async def allowed(path, role, identity):
+        return (await limiter.check(path, role, identity))[0]
+
+    async def run():
+        assert [await allowed("/api/orders", "user", "1") for _ in range(2)] == [True, False]
+        assert await allowed("/api/orders", "user", "2")
+        assert [await allowed("/api/orders", "admin", "3") for _ in range(4)] == [True, True, True, False]
+        # Role scope: users with the same role share one bucket
+        assert await allowed("/api/other", "user", "1")
+        assert not await allowed("/api/other", "user", "2")
+        assert await allowed("/unlisted", "user", "1")
+
+    asyncio.run(run())
+    assert limiter.stats == {"allowed": 6, "limited": 3, "backend_errors": 0}
+
+
+def test_backend_errors_fail_open():
+    class Broken:
+        async def hit(self, key, rule):
+            raise ConnectionError("down")
+
+        def get_state(self):
+            return {}
+
+    limiter = RateLimiter(parse_rate_limits('{"*": {"*": "1/second"}}'), Broken())
+    assert asyncio.run(limiter.check("/x", "user", "1"))[0]
+    assert limiter.stats["backend_errors"] == 1
+
+
+def test_middleware_returns_429_with_retry_after():
+    limiter = RateLimiter(parse_rate_limits('{"/me": {"*": "1/minute"}}'), LocalRateLimitBackend())
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, limiter=lambda: limiter)
+
+    @app.get("/me")
+    async def me(request: Request):
+        return {"ok": True}
+
+    client = TestClient(app)
+    assert client.get("/me").status_code == 200
+    response = client.get("/me")
+    assert response.status_code == 429
+    assert response.json() == {"detail": "Rate limit exceeded"}
+    assert 55 <= int(response.headers["Retry-After"]) <= 60
+    assert response.headers["X-RateLimit-Limit"] == "1;w=60"
+
+
+def test_main_app_limits_per_user(monkeypatch):
+    limiter = RateLimiter(parse_rate_limits('{"/api/user/profile": {"user": "2/minute", "admin": "5/minute"}}'),
+                          LocalRateLimitBackend())
+    monkeypatch.setattr(main, "rate_limiter", limiter)
+    monkeypatch.setattr(main.app, "dependency_overrides", {})
+    client = TestClient(main.app)
+
+    def get(sub, role):
+        token = main.create_access_token({"sub": sub, "role": role})
+        return client.get("/api/user/profile", headers={"Authorization": f"Bearer {token}"}).status_code
+
+    assert [get("1", "user") for _ in range(3)] == [200, 200, 429]
+    assert get("2", "user") == 200
+    assert [get("3", "admin") for _ in range(5)] == [200] * 5
+    # Rejected for authentication before any bucket is touched
+    assert client.get("/api/user/profile").status_code == 401
+    assert limiter.stats["limited"] == 1
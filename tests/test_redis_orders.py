@@ -0,0 +1,163 @@
+"""Redis order store and stream tests
+
+Run against the Redis at REDIS_TEST_URL (default redis://localhost:6379/15) or,
+when none is reachable, fakeredis with Lua support if it is installed; skipped
+otherwise. Consumers running as separate processes need a real server. Every
+test uses its own key prefix and deletes its keys afterwards.
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+import pytest
+import redis
+
+from bench_order_workers import run_processes
+from order_processor import OrderProcessor, OrderStatus
+from order_store import RedisOrderStore
+from order_stream import OrderQueueFull, RedisOrderStream
+
+DELAYS = {"validate": 0.01, "payment": 0.01, "finalize": 0.01}
+
+
+def server_url():
+    """REDIS_TEST_URL if a server answers there, else None"""
+    url = os.getenv("REDIS_TEST_URL", "redis://localhost:6379/15")
+    client = redis.Redis.from_url(url, socket_connect_timeout=0.5)
+    try:
+        client.ping()
+        return url
+    except redis.ConnectionError:
+        return None
+    finally:
+        client.close()
+
+
+def connect():
+    url = server_url()
+    if url:
+        return redis.Redis.from_url(url)
+    try:
+        import fakeredis
+        import lupa  # noqa: F401 (fakeredis runs Lua scripts through lupa)
+    except ImportError:
+        pytest.skip("No Redis server reachable and fakeredis[lua] is not installed")
+    return fakeredis.FakeRedis()
+
+
+@pytest.fixture
+def client():
+    client = connect()
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def prefix(client):
+    prefix = f"test:{uuid.uuid4().hex[:8]}:"
+    yield prefix
+    keys = list(client.scan_iter(match=prefix + "*"))
+    if keys:
+        client.delete(*keys)
+
+
+def order(total=10.0):
+    return {"items": [{"product_id": "p", "quantity": 1, "price": total}], "total": total}
+
+
+def test_store_keeps_bounded_history_and_expires_finished_orders(client, prefix):
+    store = RedisOrderStore(client, prefix=prefix + "order:", finished_ttl=100, history_size=3)
+    store.create("ORD-1", {"n": 1}, OrderStatus.PENDING, 1.5, "Order received")
+    store.transition("ORD-1", OrderStatus.PROCESSING, 2.5, "started")
+    assert client.ttl(prefix + "order:ORD-1") == -1
+    for n in range(3):
+        store.transition("ORD-1", OrderStatus.PROCESSING, 3.0 + n, f"step {n}")
+    store.transition("ORD-1", OrderStatus.COMPLETED, 9.0, "done")
+
+    record = store.get("ORD-1")
+    assert record["status"] == "completed"
+    assert (record["created_at"], record["updated_at"]) == (1.5, 9.0)
+    assert [entry["message"] for entry in record["history"]] == ["step 1", "step 2", "done"]
+    assert store.get_data("ORD-1") == {"n": 1}
+    assert 0 < client.ttl(prefix + "order:ORD-1") <= 100
+    assert 0 < client.ttl(prefix + "order:ORD-1:history") <= 100
+    assert len(store) == 1
+
+
+def test_store_transition_of_unknown_order_fails(client, prefix):
+    store = RedisOrderStore(client, prefix=prefix + "order:")
+    with pytest.raises(KeyError):
+        store.transition("ORD-9", OrderStatus.PROCESSING, 1.0, "started")
+    assert store.get("ORD-9") is None
+    assert not client.exists(prefix + "order:ORD-9:history")
+
+
+def test_stream_caps_backlog_and_deletes_acknowledged_entries(client, prefix):
+    stream = RedisOrderStream(client, stream=prefix + "intake", max_backlog=3)
+    # A second worker joining the same group is fine
+    RedisOrderStream(client, stream=prefix + "intake", max_backlog=3)
+    for n in range(3):
+        stream.publish(f"ORD-{n}", {"n": n})
+    with pytest.raises(OrderQueueFull):
+        stream.publish("ORD-9", {})
+
+    first = stream.read("a", 2, block_ms=10)
+    second = stream.read("b", 2, block_ms=10)
+    assert [(order_id, data) for _, order_id, data in first + second] == [
+        ("ORD-0", {"n": 0}), ("ORD-1", {"n": 1}), ("ORD-2", {"n": 2})]
+    assert stream.read("b", 1, block_ms=10) == []
+
+    stream.ack(first[0][0])
+    assert stream.get_state()["unfinished"] == 2
+    stream.publish("ORD-3", {"n": 3})
+
+
+def test_stream_entries_of_a_dead_consumer_are_claimed(client, prefix):
+    stream = RedisOrderStream(client, stream=prefix + "intake")
+    stream.publish("ORD-1", {"n": 1})
+    (entry,) = stream.read("dead", 1, block_ms=10)
+    assert stream.claim_stale("alive", idle_ms=50, count=10) == []
+    time.sleep(0.06)
+    assert stream.claim_stale("alive", idle_ms=50, count=10) == [entry]
+    stream.ack(entry[0])
+    assert stream.claim_stale("other", idle_ms=0, count=10) == []
+
+
+def test_processors_share_orders_through_redis(client, prefix):
+    processors = [
+        OrderProcessor(workers=2, stage_delays=DELAYS, store=RedisOrderStore(client, prefix=prefix + "order:"),
+                       stream=RedisOrderStream(client, stream=prefix + "intake"), consumer=f"worker-{n}", read_block_ms=20)
+        for n in range(2)
+    ]
+
+    async def run():
+        for processor in processors:
+            processor.start()
+        ids = [await processors[0].submit(order()) for _ in range(8)]
+        for _ in range(100):
+            statuses = [await processors[1].get_order_status(i) for i in ids]
+            if all(status["status"] == OrderStatus.COMPLETED for status in statuses):
+                break
+            await asyncio.sleep(0.02)
+        for processor in processors:
+            await processor.stop()
+        return statuses
+
+    statuses = asyncio.run(run())
+    assert all(status["status"] == OrderStatus.COMPLETED for status in statuses)
+    assert processors[0].stats["completed"] + processors[1].stats["completed"] == 8
+    assert client.xlen(prefix + "intake") == 0
+
+
+def test_consumer_processes_share_the_stream():
+    url = server_url()
+    if not url:
+        pytest.skip("Consumer processes need a Redis server at REDIS_TEST_URL")
+    args = argparse.Namespace(orders=40, workers=4, scale=0.02)
+
+    split = asyncio.run(run_processes(2, args, url))
+
+    assert sum(split) == 40
+    assert all(split)
@@ -0,0 +1,78 @@
+import time
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import token_cache
+from token_cache import VerifiedTokenCache
+
+SECRET = "secret"
+
+
+def make_token(sub="1", ttl=60):
+    return jwt.encode({"sub": sub, "exp": time.time() + ttl}, SECRET, algorithm="HS256")
+
+
+def test_cached_until_expiry(monkeypatch):
+    cache = VerifiedTokenCache(SECRET, ["HS256"])
+    token = make_token(ttl=60)
+
+    assert cache.verify(token)["sub"] == "1"
+    assert cache.verify(token)["sub"] == "1"
+    assert (cache.stats["hits"], cache.stats["misses"]) == (1, 1)
+
+    # Past the token's exp the entry is dropped and the token verified again
+    now = time.time()
+    monkeypatch.setattr(token_cache.time, "time", lambda: now + 61)
+
+    def expired(*args, **kwargs):
+        raise jwt.ExpiredSignatureError("Signature has expired")
+
+    monkeypatch.setattr(token_cache.jwt, "decode", expired)
+    with pytest.raises(jwt.ExpiredSignatureError):
+        cache.verify(token)
+    assert cache.get_summary()["size"] == 0
+
+
+def test_invalid_tokens_are_not_cached():
+    cache = VerifiedTokenCache(SECRET, ["HS256"])
+    forged = jwt.encode({"sub": "1", "exp": time.time() + 60}, "other", algorithm="HS256")
+    for _ in range(2):
+        with pytest.raises(jwt.InvalidSignatureError):
+            cache.verify(forged)
+    assert cache.stats["misses"] == 2
+
+
+def test_cache_is_bounded():
+    cache = VerifiedTokenCache(SECRET, ["HS256"], max_size=2)
+    tokens = [make_token(sub=str(n)) for n in range(3)]
+    for token in tokens:
+        cache.verify(token)
+    assert cache.get_summary()["size"] == 2
+    assert cache.stats["evictions"] == 1
+
+    cache.verify(tokens[0])
+    assert cache.stats["misses"] == 4
+
+
+def test_token_decoded_once_across_requests(monkeypatch):
+    decodes = []
+    real_decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        decodes.append(args[0])
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(token_cache.jwt, "decode", counting_decode)
+    monkeypatch.setattr(main, "token_cache", VerifiedTokenCache(main.JWT_SECRET, [main.JWT_ALGORITHM]))
+    monkeypatch.setattr(main.app, "dependency_overrides", {})
+    token = main.create_access_token({"sub": "12345", "role": "user"})
+    client = TestClient(main.app)
+
+    for _ in range(3):
+        response = client.get("/api/user/profile", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+        assert response.json()["user_id"] == "12345"
+
+    assert len(decodes) == 1
@@ -0,0 +1,100 @@
+import asyncio
+import time
+import jwt
+import pytest
+
+import main
+from token_revocation import RevocationList, TokenRevoked
+
+
+class StreamRedis:
+    """In-memory Redis stream subset shared by several revocation lists"""
+
+    def __init__(self):
+        self.entries = []
+        self.sequence = 0
+
+    def xadd(self, name, fields):
+        self.sequence += 1
+        entry_id = f"{int(time.time() * 1000)}-{self.sequence}"
+        self.entries.append((entry_id, {k.encode(): str(v).encode() for k, v in fields.items()}))
+        return entry_id
+
+    def xread(self, streams, count=None):
+        ((name, last_id),) = streams.items()
+        seq = int(last_id.split("-")[1])
+        newer = [(entry_id.encode(), fields) for entry_id, fields in self.entries if int(entry_id.split("-")[1]) > seq]
+        newer = newer[:count]
+        return [[name.encode(), newer]] if newer else []
+
+    def xtrim(self, name, minid=None, approximate=True):
+        self.entries = [(entry_id, fields) for entry_id, fields in self.entries if int(entry_id.split("-")[0]) >= int(minid)]
+
+
+def test_revocations_reach_other_instances_on_sync():
+    store = StreamRedis()
+    here, there = RevocationList(store, batch_size=2), RevocationList(store, batch_size=2)
+    claims = {"sub": "1", "jti": "abc"}
+
+    async def run():
+        for n in range(3):
+            await here.revoke(f"old-{n}", time.time() + 60)
+        await here.revoke("abc", time.time() + 60)
+        with pytest.raises(TokenRevoked):
+            here.check(claims)
+
+        there.check(claims)
+        await there.sync()
+        with pytest.raises(TokenRevoked):
+            there.check(claims)
+
+    asyncio.run(run())
+    assert there.get_state()["revoked_tokens"] == 4
+    assert there.last_id.endswith("-4")
+    there.check({"sub": "1"})
+
+
+def test_expired_revocations_are_pruned():
+    revocations = RevocationList(StreamRedis())
+    revocations.apply([("1-1", "gone", time.time() - 1), ("1-2", "kept", time.time() + 60)])
+    assert revocations.prune() == 1
+    assert list(revocations.revoked) == ["kept"]
+
+
+def test_sync_failures_keep_the_local_list():
+    class BrokenRedis(StreamRedis):
+        def xread(self, streams, count=None):
+            raise ConnectionError("down")
+
+    revocations = RevocationList(BrokenRedis())
+    revocations.apply([("1-1", "abc", time.time() + 60)])
+    asyncio.run(revocations.sync())
+    assert "abc" in revocations.revoked
+    assert revocations.stats["sync_errors"] == 1
+
+
+@pytest.fixture
+def api(monkeypatch, user_client):
+    revocations = RevocationList(StreamRedis())
+    monkeypatch.setattr(main, "token_revocations", revocations)
+    return user_client, revocations
+
+
+def test_admin_revokes_a_token(api):
+    client, revocations = api
+    admin = {"Authorization": f"Bearer {main.create_access_token({'sub': '1', 'role': 'admin'})}"}
+    user_token = main.create_access_token({"sub": "12345", "role": "user"})
+    user = {"Authorization": f"Bearer {user_token}"}
+
+    assert client.get("/api/user/profile", headers=user).status_code == 200
+    assert client.post("/api/auth/revoke", json={"token": user_token}, headers=user).status_code == 403
+
+    response = client.post("/api/auth/revoke", json={"token": user_token}, headers=admin)
+    assert response.status_code == 200
+    assert response.json()["revoked"] == jwt.decode(user_token, options={"verify_signature": False})["jti"]
+
+    assert client.get("/api/user/profile", headers=user).status_code == 401
+    assert client.get("/api/auth/revocations", headers=admin).json()["revoked_tokens"] == 1
+    assert client.post("/api/auth/revoke", json={"jti": "other"}, headers=admin).status_code == 200
+    assert client.post("/api/auth/revoke", json={"token": "garbage"}, headers=admin).status_code == 400
+    assert client.post("/api/auth/revoke", json={}, headers=admin).status_code == 400
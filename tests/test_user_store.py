@@ -0,0 +1,110 @@
+import asyncio
+import json
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import user_store
+from user_store import LoginVerifier, UserRecord, UserStore, hash_password, verify_password
+
+ITERATIONS = 1000
+
+
+def make_verifier(**kwargs):
+    store = UserStore([UserRecord("7", "alice", "user", hash_password("secret", ITERATIONS))])
+    return LoginVerifier(store, workers=2, iterations=ITERATIONS, **kwargs)
+
+
+def test_hash_and_verify():
+    encoded = hash_password("secret", ITERATIONS)
+    assert encoded.startswith(f"pbkdf2_sha256${ITERATIONS}$")
+    assert encoded != hash_password("secret", ITERATIONS)
+    assert verify_password("secret", encoded)
+    assert not verify_password("Secret", encoded)
+    assert not verify_password("secret", "md5$1$abc$def")
+    assert not verify_password("secret", "garbage")
+
+
+def test_demo_hashes_match_their_password():
+    for user in user_store.DEMO_USERS:
+        assert verify_password("password", user.password_hash)
+
+
+def test_users_file(tmp_path):
+    path = tmp_path / "users.json"
+    path.write_text(json.dumps([{"username": "bob", "user_id": 9, "password_hash": "x"}]))
+    assert UserStore.from_file(str(path)).get("bob") == UserRecord("9", "bob", "user", "x")
+
+
+def test_successful_logins_are_cached():
+    verifier = make_verifier()
+
+    async def run():
+        assert (await verifier.authenticate("alice", "secret")).user_id == "7"
+        assert (await verifier.authenticate("alice", "secret")).user_id == "7"
+        assert await verifier.authenticate("alice", "wrong") is None
+        assert await verifier.authenticate("alice", "wrong") is None
+
+    asyncio.run(run())
+    assert verifier.stats["hashes"] == 3
+    assert verifier.stats["cache_hits"] == 1
+    assert verifier.stats["failures"] == 2
+    assert verifier.get_summary()["cached_logins"] == 1
+
+
+def test_changed_password_invalidates_cached_login():
+    verifier = make_verifier()
+
+    async def run():
+        assert await verifier.authenticate("alice", "secret") is not None
+        verifier.store.add(UserRecord("7", "alice", "user", hash_password("new", ITERATIONS)))
+        assert await verifier.authenticate("alice", "secret") is None
+        assert await verifier.authenticate("alice", "new") is not None
+
+    asyncio.run(run())
+    assert verifier.stats["cache_hits"] == 0
+
+
+def test_concurrent_identical_logins_share_one_check():
+    verifier = make_verifier(cache_ttl=0)
+
+    async def run():
+        return await asyncio.gather(*(verifier.authenticate("alice", "secret") for _ in range(5)))
+
+    users = asyncio.run(run())
+    assert all(user.username == "alice" for user in users)
+    assert verifier.stats["hashes"] == 1
+    assert verifier.stats["coalesced"] == 4
+    assert verifier.get_summary()["cached_logins"] == 0
+
+
+def test_unknown_users_still_pay_for_a_hash(monkeypatch):
+    verifier = make_verifier()
+    checked = []
+    monkeypatch.setattr(user_store, "verify_password", lambda password, encoded: checked.append(encoded) or True)
+
+    assert asyncio.run(verifier.authenticate("mallory", "secret")) is None
+    assert checked and checked[0].startswith(f"pbkdf2_sha256${ITERATIONS}$")
+    verifier.shutdown()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "login_verifier", make_verifier())
+    monkeypatch.setattr(main.app, "dependency_overrides", {})
+    return TestClient(main.app)
+
+
+def test_token_endpoint_checks_credentials(client):
+    assert client.post("/token", data={"username": "alice", "password": "wrong"}).status_code == 401
+    response = client.post("/token", data={"username": "nobody", "password": "secret"})
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Incorrect username or password"}
+    assert response.headers["WWW-Authenticate"] == "Bearer"
+
+    response = client.post("/token", data={"username": "alice", "password": "secret"})
+    assert response.status_code == 200
+    claims = jwt.decode(response.json()["access_token"], main.JWT_SECRET, algorithms=[main.JWT_ALGORITHM])
+    assert (claims["sub"], claims["role"]) == ("7", "user")
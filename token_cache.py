@@ -0,0 +1,68 @@
+"""
+Cache of verified JWTs.
+
+Verifying a token means base64-decoding it, checking its HMAC and parsing its
+claims. Clients send the same token on every request until it expires, so the
+verified claims are kept in a bounded LRU keyed by a digest of the token and
+served until the token's own `exp`.
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List
+
+import jwt
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of verified token claims, each entry expiring with its token"""
+
+    def __init__(self, secret: str, algorithms: List[str], max_size: int = 10000):
+        """Initialize the cache
+
+        Args:
+            secret: Key tokens are verified with
+            algorithms: Accepted signing algorithms
+            max_size: Maximum number of cached tokens; 0 disables caching
+        """
+        self.secret = secret
+        self.algorithms = algorithms
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Return the claims of a valid token, raising jwt.InvalidTokenError otherwise"""
+        key = hashlib.sha256(token.encode()).digest()
+        entry = self._entries.get(key)
+        if entry is not None:
+            claims, expires_at = entry
+            if time.time() < expires_at:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return claims
+            del self._entries[key]
+
+        self.stats["misses"] += 1
+        claims = jwt.decode(token, self.secret, algorithms=self.algorithms)
+        expires_at = claims.get("exp")
+        # Tokens without an expiry are verified every time rather than cached forever
+        if self.max_size > 0 and isinstance(expires_at, (int, float)):
+            # PyJWT compares whole seconds, so expire the entry when it would
+            self._entries[key] = (claims, int(expires_at))
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+        return claims
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get_summary(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            **self.stats
+        }
@@ -0,0 +1,143 @@
+"""
+Revocation of access tokens before their expiry.
+
+Revoked token IDs (`jti`) are appended to a Redis stream shared by every
+instance. Each instance keeps an in-memory map of revoked IDs and pulls new
+stream entries in the background, so the per-request check is a local dict
+lookup and never a Redis round-trip. Entries are dropped once the token they
+refer to has expired anyway.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import jwt
+
+# Setup logging
+logger = logging.getLogger("fastapi-hasura")
+
+
+class TokenRevoked(jwt.InvalidTokenError):
+    """Raised for a token that was revoked before its expiry"""
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class RevocationList:
+    """Local copy of the shared revocation stream"""
+
+    def __init__(self, store, stream: str = "auth:revoked_tokens", max_token_lifetime: float = 1800,
+                 sync_interval: float = 1.0, batch_size: int = 1000):
+        """Initialize the list
+
+        Args:
+            store: Redis client holding the shared stream
+            stream: Stream key
+            max_token_lifetime: Longest token lifetime in seconds; older stream entries are trimmed
+            sync_interval: Seconds between pulls of new revocations
+            batch_size: Stream entries read per call
+        """
+        self.store = store
+        self.stream = stream
+        self.max_token_lifetime = max_token_lifetime
+        self.sync_interval = sync_interval
+        self.batch_size = batch_size
+        self.revoked: Dict[str, float] = {}
+        self.last_id = "0-0"
+        self.last_sync: Optional[float] = None
+        self.stats = {"revoked": 0, "synced": 0, "rejected": 0, "sync_errors": 0}
+        self._task: Optional[asyncio.Task] = None
+
+    def check(self, claims: Dict[str, Any]) -> None:
+        """Raise TokenRevoked if the token with these claims was revoked"""
+        jti = claims.get("jti")
+        if jti is not None and jti in self.revoked:
+            self.stats["rejected"] += 1
+            raise TokenRevoked("Token has been revoked")
+
+    async def revoke(self, jti: str, expires_at: float) -> None:
+        """Revoke a token here at once and publish it to every other instance"""
+        self.revoked[jti] = expires_at
+        self.stats["revoked"] += 1
+        await asyncio.to_thread(self._publish, jti, expires_at)
+
+    def _publish(self, jti: str, expires_at: float) -> None:
+        self.store.xadd(self.stream, {"jti": jti, "exp": str(expires_at)})
+        # Older entries only name tokens that have expired by now
+        oldest = int((time.time() - self.max_token_lifetime) * 1000)
+        self.store.xtrim(self.stream, minid=str(oldest), approximate=True)
+
+    def fetch(self) -> List[Tuple[str, str, float]]:
+        """Read stream entries newer than the last one applied (blocking)"""
+        entries = []
+        last_id = self.last_id
+        while True:
+            response = self.store.xread({self.stream: last_id}, count=self.batch_size)
+            if not response:
+                break
+            batch = response[0][1]
+            for entry_id, fields in batch:
+                fields = {_text(k): _text(v) for k, v in fields.items()}
+                last_id = _text(entry_id)
+                entries.append((last_id, fields["jti"], float(fields["exp"])))
+            if len(batch) < self.batch_size:
+                break
+        return entries
+
+    def apply(self, entries: List[Tuple[str, str, float]]) -> None:
+        for entry_id, jti, expires_at in entries:
+            self.revoked[jti] = expires_at
+            self.last_id = entry_id
+        self.stats["synced"] += len(entries)
+        self.last_sync = time.time()
+
+    def prune(self) -> int:
+        """Forget revocations of tokens that have expired"""
+        now = time.time()
+        expired = [jti for jti, expires_at in self.revoked.items() if expires_at <= now]
+        for jti in expired:
+            del self.revoked[jti]
+        return len(expired)
+
+    async def sync(self) -> None:
+        """Pull new revocations from the shared stream"""
+        try:
+            entries = await asyncio.to_thread(self.fetch)
+        except Exception as e:
+            self.stats["sync_errors"] += 1
+            logger.warning(f"Token revocation sync failed: {e}")
+            return
+        self.apply(entries)
+        self.prune()
+
+    async def run(self) -> None:
+        while True:
+            await self.sync()
+            await asyncio.sleep(self.sync_interval)
+
+    def start(self) -> None:
+        """Start the background sync task"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop the background sync task"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get_state(self) -> Dict[str, Any]:
+        return {
+            "revoked_tokens": len(self.revoked),
+            "last_id": self.last_id,
+            "last_sync": self.last_sync,
+            **self.stats
+        }
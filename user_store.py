@@ -0,0 +1,190 @@
+"""
+User accounts with hashed passwords, and login verification off the event loop.
+
+Passwords are stored as PBKDF2-SHA256 hashes. Checking one costs a few hundred
+milliseconds of CPU by design, so LoginVerifier runs checks in a bounded
+thread pool (hashlib releases the GIL while hashing), collapses concurrent
+identical logins into one check and remembers recent successful logins for a
+short time so bursts of re-logins do not each pay for a hash.
+
+Users are loaded from the JSON file named by USERS_FILE: a list of objects with
+"username", "user_id", "role" and "password_hash". To hash a password:
+
+    python user_store.py hash <password>
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterable, NamedTuple, Optional
+
+# Setup logging
+logger = logging.getLogger("fastapi-hasura")
+
+PASSWORD_HASH_ALGORITHM = "pbkdf2_sha256"
+DEFAULT_ITERATIONS = 600000
+
+
+def hash_password(password: str, iterations: int = DEFAULT_ITERATIONS, salt: Optional[bytes] = None) -> str:
+    """Hash a password as "pbkdf2_sha256$<iterations>$<salt>$<digest>" """
+    salt = salt or os.urandom(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return "$".join([PASSWORD_HASH_ALGORITHM, str(iterations),
+                     base64.b64encode(salt).decode(), base64.b64encode(digest).decode()])
+
+
+def verify_password(password: str, encoded: str) -> bool:
+    """Check a password against a stored hash in constant time"""
+    try:
+        algorithm, iterations, salt, expected = encoded.split("$")
+        if algorithm != PASSWORD_HASH_ALGORITHM:
+            return False
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), base64.b64decode(salt), int(iterations))
+    except ValueError:
+        return False
+    return hmac.compare_digest(digest, base64.b64decode(expected))
+
+
+class UserRecord(NamedTuple):
+    user_id: str
+    username: str
+    role: str
+    password_hash: str
+
+
+# Demo accounts used when no USERS_FILE is configured; both have the password "password"
+DEMO_USERS = (
+    UserRecord("12345", "admin", "admin",
+               "pbkdf2_sha256$600000$ZGVtby1hZG1pbi1zYWx0IQ==$cPTh+Dgx81kmaHKYHmVGsmNxv7CGA9f2EMIfQljHDIo="),
+    UserRecord("12346", "user", "user",
+               "pbkdf2_sha256$600000$ZGVtby11c2VyLXNhbHQhIQ==$hWJ7W7pkeurY2EdIkTAJdmRQiNkiSfk/7b3D/EQEaCo="),
+)
+
+
+class UserStore:
+    """Users by username"""
+
+    def __init__(self, users: Iterable[UserRecord] = ()):
+        self.users: Dict[str, UserRecord] = {user.username: user for user in users}
+
+    @classmethod
+    def from_file(cls, path: str) -> "UserStore":
+        with open(path) as f:
+            return cls(UserRecord(str(u["user_id"]), u["username"], u.get("role", "user"), u["password_hash"])
+                       for u in json.load(f))
+
+    def get(self, username: str) -> Optional[UserRecord]:
+        return self.users.get(username)
+
+    def add(self, user: UserRecord) -> None:
+        self.users[user.username] = user
+
+
+class LoginVerifier:
+    """Verifies credentials in a bounded worker pool with a short-lived success cache"""
+
+    def __init__(self, store: UserStore, workers: int = 4, cache_ttl: float = 60, cache_size: int = 10000,
+                 iterations: int = DEFAULT_ITERATIONS):
+        """Initialize the verifier
+
+        Args:
+            store: Where users are looked up
+            workers: Threads hashing passwords concurrently
+            cache_ttl: Seconds a successful login is remembered; 0 disables the cache
+            cache_size: Maximum number of remembered logins
+            iterations: Cost of the dummy hash checked for unknown users, so they take as long as known ones
+        """
+        self.store = store
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.iterations = iterations
+        # Cache keys are keyed digests of the credentials; plaintext passwords are never kept
+        self._key = os.urandom(32)
+        self._cache: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._inflight: Dict[bytes, asyncio.Future] = {}
+        self._dummy_hash: Optional[str] = None
+        self.stats = {"logins": 0, "failures": 0, "cache_hits": 0, "coalesced": 0, "hashes": 0}
+
+    def _cache_key(self, username: str, password: str) -> bytes:
+        return hmac.new(self._key, f"{username}\0{password}".encode(), hashlib.sha256).digest()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Created on first use so the verifier survives an app restart after shutdown()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def _verify(self, password: str, encoded: Optional[str]) -> bool:
+        loop = asyncio.get_running_loop()
+        if encoded is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = await loop.run_in_executor(self.executor, hash_password, os.urandom(16).hex(), self.iterations)
+            encoded = self._dummy_hash
+            self.stats["hashes"] += 1
+            await loop.run_in_executor(self.executor, verify_password, password, encoded)
+            return False
+        self.stats["hashes"] += 1
+        return await loop.run_in_executor(self.executor, verify_password, password, encoded)
+
+    async def authenticate(self, username: str, password: str) -> Optional[UserRecord]:
+        """Return the user for valid credentials, None otherwise"""
+        self.stats["logins"] += 1
+        user = self.store.get(username)
+        key = self._cache_key(username, password)
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            password_hash, expires_at = cached
+            # A changed password invalidates remembered logins
+            if user is not None and password_hash == user.password_hash and time.monotonic() < expires_at:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                return user
+            del self._cache[key]
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats["coalesced"] += 1
+            valid = await asyncio.shield(pending)
+        else:
+            pending = asyncio.ensure_future(self._verify(password, user.password_hash if user else None))
+            self._inflight[key] = pending
+            try:
+                valid = await asyncio.shield(pending)
+            finally:
+                if self._inflight.get(key) is pending:
+                    del self._inflight[key]
+
+        if not valid or user is None:
+            self.stats["failures"] += 1
+            return None
+
+        if self.cache_ttl > 0:
+            self._cache[key] = (user.password_hash, time.monotonic() + self.cache_ttl)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return user
+
+    def get_summary(self) -> Dict[str, Any]:
+        return {"cached_logins": len(self._cache), **self.stats}
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "hash":
+        sys.exit("Usage: python user_store.py hash <password>")
+    print(hash_password(sys.argv[2]))
@@ -1,10 +1,14 @@
 import logging
 import json
+import aiohttp
 import requests
 from typing import Dict, Any, List, Optional
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Header
 from pydantic import BaseModel
 
+import deadlines
+from deadlines import DeadlineExceeded
+
 # Setup logging
 logger = logging.getLogger("fastapi-n8n")
 
@@ -61,7 +65,7 @@ async def trigger_workflow(workflow_id: str, data: Dict[str, Any]) -> Dict[str,
             url=url,
             headers=headers,
             json=data,
-            timeout=10  # 10 second timeout
+            timeout=deadlines.timeout(10)  # 10 second timeout, bounded by the request deadline
         )
         
         # Check response
@@ -82,7 +86,12 @@ async def trigger_workflow(workflow_id: str, data: Dict[str, Any]) -> Dict[str,
                 "message": error_msg,
                 "data": None
             }
+    except DeadlineExceeded:
+        raise
     except Exception as e:
+        if isinstance(e, requests.Timeout) and deadlines.expired():
+            # The call was cut short by the request deadline, not by n8n
+            raise DeadlineExceeded() from e
         error_msg = f"Error triggering workflow: {str(e)}"
         logger.error(error_msg)
         return {
@@ -104,7 +113,7 @@ async def get_workflow_status(execution_id: str) -> Dict[str, Any]:
         response = requests.get(
             url=url,
             headers=headers,
-            timeout=5
+            timeout=deadlines.timeout(5)
         )
         
         if response.status_code == 200:
@@ -126,7 +135,11 @@ async def get_workflow_status(execution_id: str) -> Dict[str, Any]:
                 "finished": False,
                 "data": None
             }
+    except DeadlineExceeded:
+        raise
     except Exception as e:
+        if isinstance(e, requests.Timeout) and deadlines.expired():
+            raise DeadlineExceeded() from e
         error_msg = f"Error getting workflow status: {str(e)}"
         logger.error(error_msg)
         return {
@@ -138,6 +151,14 @@ async def get_workflow_status(execution_id: str) -> Dict[str, Any]:
         }
 
 
+async def check_n8n_health() -> None:
+    """Probe n8n's health endpoint, raising if it is not reachable and healthy"""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{N8N_BASE_URL}/healthz") as response:
+            if response.status != 200:
+                raise RuntimeError(f"n8n health check returned status code: {response.status}")
+
+
 # API Routes
 @router.post("/trigger", response_model=WorkflowResponse)
 async def trigger_workflow_endpoint(request: WorkflowTriggerRequest, background_tasks: BackgroundTasks):